@@ -0,0 +1,251 @@
+"""
+Formats des réponses tabulaires : JSON (orjson si installé), NDJSON, Arrow IPC
+et Parquet (pyarrow requis), choisis d'après l'en-tête Accept ou un paramètre
+explicite.
+"""
+
+import io
+import json
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+JSON_MEDIA_TYPE = "application/json"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+
+# Format -> type MIME de la réponse
+RESPONSE_FORMATS = {
+    "json": JSON_MEDIA_TYPE,
+    "ndjson": NDJSON_MEDIA_TYPE,
+    "arrow": ARROW_MEDIA_TYPE,
+    "parquet": PARQUET_MEDIA_TYPE,
+}
+
+# Types MIME acceptés dans l'en-tête Accept
+ACCEPTED_MEDIA_TYPES = {
+    JSON_MEDIA_TYPE: "json",
+    NDJSON_MEDIA_TYPE: "ndjson",
+    "application/jsonl": "ndjson",
+    ARROW_MEDIA_TYPE: "arrow",
+    "application/vnd.apache.arrow.file": "arrow",
+    PARQUET_MEDIA_TYPE: "parquet",
+    "application/x-parquet": "parquet",
+}
+
+# Formats nécessitant pyarrow
+COLUMNAR_FORMATS = ("arrow", "parquet")
+
+
+def available_formats():
+    if pa is None:
+        return [name for name in RESPONSE_FORMATS if name not in COLUMNAR_FORMATS]
+    return list(RESPONSE_FORMATS)
+
+
+def negotiate(accept=None, requested=None):
+    """
+    Choisit le format de la réponse.
+
+    Un format demandé explicitement (`requested`) l'emporte sur l'en-tête
+    Accept, dont les types sont examinés par qualité décroissante ; sans
+    en-tête, ou avec */*, la réponse est en JSON.
+
+    Returns:
+        str: nom du format, ou None si aucun format acceptable n'est disponible
+    """
+    available = available_formats()
+    if requested:
+        return requested if requested in available else None
+    if not accept:
+        return "json"
+
+    candidates = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            candidates.append((-quality, position, media_type.lower()))
+
+    for _, _, media_type in sorted(candidates):
+        if media_type in ("*/*", "application/*"):
+            return "json"
+        name = ACCEPTED_MEDIA_TYPES.get(media_type)
+        if name in available:
+            return name
+    return None
+
+
+def not_acceptable(requested=None):
+    message = (
+        f"Format non disponible: {requested}"
+        if requested
+        else "Aucun format acceptable"
+    )
+    if pa is None:
+        message += " (Arrow et Parquet nécessitent pyarrow)"
+    return JSONResponse(
+        {"error": message, "available_formats": available_formats()},
+        status_code=406,
+    )
+
+
+def _iso_timestamps(frame):
+    """Colonnes datetime converties en chaînes ISO (NaT -> None), en une opération."""
+    converted = {}
+    for col in frame.columns:
+        if pd.api.types.is_datetime64_any_dtype(frame[col]):
+            values = frame[col].to_numpy().astype("datetime64[s]")
+            converted[col] = np.where(
+                pd.isna(values), None, np.datetime_as_string(values)
+            )
+    return frame.assign(**converted) if converted else frame
+
+
+def _json_records(frame):
+    frame = _iso_timestamps(frame)
+    if orjson is not None:
+        # orjson écrit NaN en null
+        return orjson.dumps(
+            frame.to_dict(orient="records"), option=orjson.OPT_SERIALIZE_NUMPY
+        )
+    frame = frame.astype(object).where(frame.notna(), None)
+    return json.dumps(frame.to_dict(orient="records")).encode()
+
+
+def _json_chunks(frames):
+    yield b"["
+    first = True
+    for frame in frames:
+        if frame.empty:
+            continue
+        records = _json_records(frame)[1:-1]
+        yield records if first else b"," + records
+        first = False
+    yield b"]"
+
+
+def _ndjson_chunks(frames):
+    for frame in frames:
+        if not frame.empty:
+            yield _iso_timestamps(frame).to_json(
+                orient="records", lines=True, double_precision=15
+            ).encode()
+
+
+class _Drain(io.RawIOBase):
+    """Fichier en écriture dont on récupère le contenu au fur et à mesure."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer.extend(data)
+        return len(data)
+
+    def take(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def _arrow_schema(frame, dtypes):
+    """Schéma du flux : types déclarés dans `dtypes`, les autres inférés de `frame`."""
+    inferred = pa.Schema.from_pandas(frame, preserve_index=False)
+    return pa.schema(
+        [
+            (
+                pa.field(field.name, pa.from_numpy_dtype(np.dtype(dtypes[field.name])))
+                if field.name in dtypes
+                else field
+            )
+            for field in inferred
+        ]
+    )
+
+
+def _columnar_chunks(frames, response_format, dtypes=None):
+    """Flux Arrow IPC (un lot par DataFrame) ou Parquet (un groupe de lignes par DataFrame)."""
+    sink = _Drain()
+    writer = schema = None
+    for frame in frames:
+        # Schéma fixé au premier bloc et imposé aux suivants
+        if schema is None:
+            schema = _arrow_schema(frame, dtypes or {})
+        table = pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+        if writer is None:
+            writer = (
+                pa.ipc.new_stream(sink, schema)
+                if response_format == "arrow"
+                else pq.ParquetWriter(sink, schema)
+            )
+        writer.write_table(table)
+        yield sink.take()
+
+    if writer is None:
+        # Aucune ligne : flux valide mais sans colonnes
+        writer = (
+            pa.ipc.new_stream(sink, pa.schema([]))
+            if response_format == "arrow"
+            else pq.ParquetWriter(sink, pa.schema([]))
+        )
+    writer.close()
+    yield sink.take()
+
+
+def frames_response(frames, response_format, dtypes=None):
+    """
+    Réponse en flux à partir d'un itérateur de DataFrames (lus par blocs) :
+    aucune liste de dicts n'est construite pour l'ensemble de la période.
+
+    `dtypes` (colonne -> type numpy) fixe le schéma Arrow et Parquet des
+    colonnes dont un bloc peut être vide ou entièrement NULL.
+    """
+    if response_format == "json":
+        chunks = _json_chunks(frames)
+    elif response_format == "ndjson":
+        chunks = _ndjson_chunks(frames)
+    else:
+        chunks = _columnar_chunks(frames, response_format, dtypes)
+    return StreamingResponse(chunks, media_type=RESPONSE_FORMATS[response_format])
+
+
+def json_response(content):
+    """Réponse JSON d'un objet (dicts, listes, scalaires numpy), par orjson si installé."""
+    if orjson is not None:
+        return Response(
+            orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY),
+            media_type=JSON_MEDIA_TYPE,
+        )
+    return JSONResponse(jsonable_encoder(content))
+
+
+def frame_response(frame, response_format):
+    """Réponse pour un DataFrame déjà en mémoire (même contenu que to_dict en JSON)."""
+    if response_format == "json":
+        return StreamingResponse(
+            iter([_json_records(frame)]), media_type=JSON_MEDIA_TYPE
+        )
+    return frames_response(iter([frame]), response_format)
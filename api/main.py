@@ -1,33 +1,159 @@
 import os
 import sys
-import numpy as np
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
+from contextlib import asynccontextmanager
+from anyio import to_thread
+from typing import List, Optional
 from pydantic import BaseModel
 from http.client import HTTPException
 from sqlalchemy.orm import sessionmaker
-from fastapi import FastAPI, Query, Body
-from sklearn.metrics import mean_squared_error
+from fastapi import FastAPI, Query, Body, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from data.data_ingestion import fetch_weather_data, save_weather_data_to_db
-from model.predict_series import predict, training_pipeline
+from data.data_ingestion import (
+    PARIS_LATITUDE,
+    PARIS_LONGITUDE,
+    fetch_weather_data,
+    fetch_locations_weather,
+    save_weather_data_to_db,
+    location_key,
+)
+from data.archive_cache import archive_cache
+from data.weather_backfill import BACKFILL_MAX_WORKERS
+from data.backfill_jobs import (
+    submit_backfill_job,
+    get_backfill_job,
+    shutdown_executor as shutdown_backfill_executor,
+)
+from model.predict_series import (
+    TRAINING_BACKENDS,
+    predict,
+    predict_models,
+    save_predictions_to_db,
+    save_batch_predictions,
+    build_prediction_frame,
+)
+from model.incremental_features import update_stream
+from model.model_cache import model_cache
+from model.artifacts import ARTIFACT_FORMATS, INFERENCE_ENGINES, INFERENCE_ENGINE
+from model.training_jobs import (
+    JOB_QUEUED,
+    create_training_job,
+    submit_training_job,
+    get_training_job,
+    recover_training_jobs,
+    shutdown_executor,
+)
+from model.fusion import FusionEngine, evaluate_split, search_text_weight
+from model.feature_store import feature_store, SPLITS
+from model.similarity_index import INDEX_KINDS, get_similarity_index
+from model.text_classification import (
+    TEXT_LABELS,
+    get_text_classifier,
+    get_text_batcher,
+    shutdown_text_batcher,
+)
 from data.db_init import engine, get_engine
-from data.db_class import Model, RealTemperature, Prediction
-
-
-# Création des tables dans la base de données
-models = [Model, RealTemperature, Prediction]
+from data.db_class import (
+    Model,
+    RealTemperature,
+    RealTemperature3h,
+    RealTemperatureDaily,
+    Prediction,
+    TrainingJob,
+)
+from data.aggregates import needs_rebuild, rebuild_aggregates
+from data.data_access import (
+    PREDICTION_FIELDS,
+    PREDICTION_DTYPES,
+    HISTORY_RESOLUTIONS,
+    list_locations,
+    prediction_metrics,
+    load_predictions_page,
+    iter_prediction_frames,
+    iter_history_frames,
+)
+from api.formats import (
+    RESPONSE_FORMATS,
+    negotiate,
+    not_acceptable,
+    frame_response,
+    frames_response,
+    json_response,
+)
+from data.db_migrate import migrate_database
+
+# Conversion des bases existantes vers le schéma typé, puis création des tables
+migration_report = migrate_database(engine)
+if migration_report:
+    print(f"Migration du schéma effectuée: {migration_report}")
+
+models = [
+    Model,
+    RealTemperature,
+    RealTemperature3h,
+    RealTemperatureDaily,
+    Prediction,
+    TrainingJob,
+]
 for model in models:
     model.metadata.create_all(bind=engine)
 
+# Base antérieure aux tables agrégées : calcul initial à partir des relevés horaires
+if needs_rebuild(engine):
+    print(f"{rebuild_aggregates(engine)} créneaux de 3h agrégés")
+
+# Nombre maximal de requêtes bloquantes traitées simultanément
+API_THREADPOOL_SIZE = int(os.environ.get("API_THREADPOOL_SIZE", "40"))
+
+# Fichier de reprise des imports historiques (/backfill)
+BACKFILL_CHECKPOINT = os.environ.get(
+    "BACKFILL_CHECKPOINT",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "backfill.json"),
+)
+
+
+def warmup_model_cache():
+    engine = get_engine()
+    Session = sessionmaker(bind=engine)
+    session = Session()
+
+    try:
+        registered = [(model.id, model.path) for model in session.query(Model).all()]
+    finally:
+        session.close()
+
+    loaded = model_cache.warmup(registered)
+    print(f"{loaded} modèle(s) préchargé(s) dans le cache")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Les routes bloquantes (HTTP, SQLite, scikit-learn) sont des fonctions
+    # synchrones exécutées par FastAPI dans ce pool de threads borné
+    to_thread.current_default_thread_limiter().total_tokens = API_THREADPOOL_SIZE
+
+    # Préchargement optionnel de tous les modèles enregistrés au démarrage
+    if os.environ.get("MODEL_CACHE_WARMUP", "0") == "1":
+        warmup_model_cache()
+
+    # Reprise des entraînements en attente lors d'un redémarrage
+    recover_training_jobs()
+    yield
+    shutdown_executor()
+    shutdown_backfill_executor()
+    shutdown_text_batcher()
+
+
 app = FastAPI(
     title="API Time series",
     description="API pour la prediction de séries temporelles",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configuration CORS pour permettre les requêtes depuis le frontend
@@ -45,13 +171,33 @@ async def root():
     return {"message": "Bienvenue sur l'API de prévision de séries temporelles"}
 
 
+class Location(BaseModel):
+    latitude: float
+    longitude: float
+
+
+def model_location(model):
+    """Site des prédictions d'un modèle : celui de son entraînement, sinon Paris."""
+    if model.latitude is None or model.longitude is None:
+        return (PARIS_LATITUDE, PARIS_LONGITUDE)
+    return location_key(model.latitude, model.longitude)
+
+
+def requested_locations(locations):
+    return [(location.latitude, location.longitude) for location in locations]
+
+
 class DateRange(BaseModel):
     start_date: str
     end_date: str
+    # False : ignore le cache disque des réponses de l'API d'archive
+    use_cache: bool = True
+    # Sites à récupérer en parallèle (Paris par défaut)
+    locations: List[Location] = None
 
 
 @app.post("/fetch_data")
-async def api_fetch_data(date_range: DateRange = Body(...)):
+def api_fetch_data(date_range: DateRange = Body(...)):
     start_date = date_range.start_date
     end_date = date_range.end_date
     if end_date is None:
@@ -65,20 +211,96 @@ async def api_fetch_data(date_range: DateRange = Body(...)):
             status_code=400, detail="Format de date invalide. Utiliser YYYY-MM-DD"
         )
 
-    df = fetch_weather_data(start_date, end_date)
-    msg = save_weather_data_to_db(df)
+    if not date_range.locations:
+        df = fetch_weather_data(start_date, end_date, use_cache=date_range.use_cache)
+        msg = save_weather_data_to_db(df, bulk=True)
+        return {"message": msg}
+
+    frames = fetch_locations_weather(
+        requested_locations(date_range.locations),
+        start_date,
+        end_date,
+        use_cache=date_range.use_cache,
+    )
+    fetched = [frame for frame in frames.values() if not frame.empty]
+    # Tous les sites dans une seule transaction
+    df = pd.concat(fetched, ignore_index=True) if fetched else pd.DataFrame()
+    msg = save_weather_data_to_db(df, bulk=True)
+
+    return {
+        "message": msg,
+        "locations": [
+            {"latitude": latitude, "longitude": longitude, "rows": len(frame)}
+            for (latitude, longitude), frame in frames.items()
+        ],
+    }
+
+
+class BackfillRequest(BaseModel):
+    start_date: str
+    end_date: str = None
+    chunk: str = "month"
+    # Requêtes simultanées, au plus BACKFILL_MAX_WORKERS
+    max_workers: int = BACKFILL_MAX_WORKERS
+    use_cache: bool = True
+    locations: List[Location] = None
+
+
+@app.post("/backfill")
+def api_backfill(params: BackfillRequest = Body(...)):
+    # L'import est exécuté en tâche de fond : la réponse est immédiate
+    try:
+        job_id = submit_backfill_job(
+            params.start_date,
+            params.end_date,
+            chunk=params.chunk,
+            max_workers=params.max_workers,
+            checkpoint_path=BACKFILL_CHECKPOINT,
+            use_cache=params.use_cache,
+            locations=(
+                requested_locations(params.locations) if params.locations else None
+            ),
+        )
+    except ValueError as e:
+        return {"error": str(e)}
+
+    job = get_backfill_job(job_id)
+    return {
+        "message": "Import historique mis en file d'attente",
+        "job_id": job_id,
+        "status": job["status"],
+        "progress": job["progress"],
+    }
+
 
-    return {"message": msg}
+@app.get("/backfill/{job_id}")
+def get_backfill(job_id: str):
+    job = get_backfill_job(job_id)
+    if job is None:
+        return {"error": "Import historique non trouvé"}
+    return job
 
 
 class TrainingParams(BaseModel):
     version: str
     start_date: str = None
     end_date: str = None
+    # "random_forest" ou "hist_gradient_boosting" (TRAINING_BACKEND par défaut)
+    backend: str = None
+    n_jobs: int = None
+    # Ajoute add_estimators arbres à un modèle existant au lieu de tout réentraîner
+    warm_start_model_id: int = None
+    add_estimators: int = 50
+    # "pickle", "compressed" ou "compact" (MODEL_ARTIFACT_FORMAT par défaut)
+    artifact_format: str = None
+    # "sklearn" ou "compiled" (INFERENCE_ENGINE par défaut)
+    inference_engine: str = None
+    # Un modèle par site, entraîné sur ses seules données (tous les sites par défaut)
+    locations: List[Location] = None
 
 
 @app.post("/train_model")
-async def train_model(params: TrainingParams = Body(...)):
+def train_model(params: TrainingParams = Body(...)):
     version = params.version
     start_date = params.start_date
     end_date = params.end_date
@@ -90,58 +312,101 @@ async def train_model(params: TrainingParams = Body(...)):
         except ValueError:
             return {"error": "Format de date invalide"}
 
-    engine = get_engine()
-    Session = sessionmaker(bind=engine)
-    session = Session()
+    if params.backend is not None and params.backend not in TRAINING_BACKENDS:
+        return {"error": f"Backend inconnu: {params.backend}"}
+    if (
+        params.artifact_format is not None
+        and params.artifact_format not in ARTIFACT_FORMATS
+    ):
+        return {"error": f"Format de modèle inconnu: {params.artifact_format}"}
+    if (
+        params.inference_engine is not None
+        and params.inference_engine not in INFERENCE_ENGINES
+    ):
+        return {"error": f"Moteur de prédiction inconnu: {params.inference_engine}"}
+
+    options = {
+        key: value
+        for key, value in {
+            "backend": params.backend,
+            "n_jobs": params.n_jobs,
+            "warm_start_model_id": params.warm_start_model_id,
+            "artifact_format": params.artifact_format,
+            "inference_engine": params.inference_engine,
+        }.items()
+        if value is not None
+    }
+    if params.warm_start_model_id is not None:
+        options["add_estimators"] = params.add_estimators
+
+    bounds = (
+        start_date.strftime("%Y-%m-%d") if start_date and end_date else None,
+        end_date.strftime("%Y-%m-%d") if start_date and end_date else None,
+    )
 
-    try:
-        query = session.query(RealTemperature)
-        if start_date and end_date:
-            query = query.filter(
-                RealTemperature.timestamp >= start_date.strftime("%Y-%m-%d"),
-                RealTemperature.timestamp <= end_date.strftime("%Y-%m-%d"),
+    # L'entraînement est exécuté dans un processus séparé : la réponse est immédiate
+    if params.locations:
+        jobs = []
+        for latitude, longitude in dict.fromkeys(
+            location_key(*location)
+            for location in requested_locations(params.locations)
+        ):
+            job_id = create_training_job(
+                version, *bounds, {**options, "location": [latitude, longitude]}
             )
+            submit_training_job(job_id)
+            jobs.append(
+                {"job_id": job_id, "latitude": latitude, "longitude": longitude}
+            )
+        return {
+            "message": f"{len(jobs)} entraînement(s) mis en file d'attente",
+            "version": version,
+            "jobs": jobs,
+            "status": JOB_QUEUED,
+        }
 
-        results = query.all()
-
-        # Convertir les résultats en DataFrame
-        df = pd.DataFrame(
-            [
-                {
-                    "timestamp": item.timestamp,
-                    "temperature_2m": float(item.temperature_2m),
-                    "relative_humidity": float(item.relative_humidity),
-                    "precipitation": float(item.precipitation),
-                    "surface_pressure": float(item.surface_pressure),
-                    "latitude": float(item.latitude),
-                    "longitude": float(item.longitude),
-                }
-                for item in results
-            ]
-        )
-
-    finally:
-        session.close()
+    job_id = create_training_job(version, *bounds, options)
+    submit_training_job(job_id)
 
-    if df.empty:
-        return {"error": "Aucune donnée disponible pour ces dates"}
+    return {
+        "message": "Entraînement du modèle mis en file d'attente",
+        "version": version,
+        "job_id": job_id,
+        "status": JOB_QUEUED,
+    }
 
-    msg = training_pipeline(df, version)
 
-    if msg:
-        return {"message": "Modèle entraîné avec succès", "version": version}
-    else:
-        return {"error": "Erreur lors de l'entraînement du modèle"}
+@app.get("/jobs/{job_id}")
+def get_job(job_id: int):
+    job = get_training_job(job_id)
+    if job is None:
+        return {"error": "Tâche d'entraînement non trouvée"}
+    return job
 
 
 class PredictionRequest(BaseModel):
     model_id: int
     start_date: str
     end_date: str
+    # Écriture des prédictions en tâche de fond, après l'envoi de la réponse
+    background_write: bool = False
+    use_cache: bool = True
+    # Site des prédictions (par défaut celui du modèle)
+    latitude: float = None
+    longitude: float = None
 
 
 @app.post("/predict")
-async def prediction(request: PredictionRequest = Body(...)):
+def prediction(
+    background_tasks: BackgroundTasks,
+    http_request: Request,
+    request: PredictionRequest = Body(...),
+):
+    # Format de la réponse d'après l'en-tête Accept (JSON, NDJSON, Arrow, Parquet)
+    response_format = negotiate(http_request.headers.get("accept"))
+    if response_format is None:
+        return not_acceptable()
+
     model_id = request.model_id
     start_date = request.start_date
     end_date = request.end_date
@@ -161,9 +426,17 @@ async def prediction(request: PredictionRequest = Body(...)):
         session.close()
         return {"error": "Modèle non trouvé"}
 
-    query = session.query(RealTemperature).filter(
-        RealTemperature.timestamp >= start_date.strftime("%Y-%m-%d"),
-        RealTemperature.timestamp <= end_date.strftime("%Y-%m-%d"),
+    if request.latitude is not None and request.longitude is not None:
+        latitude, longitude = location_key(request.latitude, request.longitude)
+    else:
+        latitude, longitude = model_location(model)
+
+    # Relevés du site sur la période : lecture par l'index (latitude, longitude, timestamp)
+    query = session.query(RealTemperature.id).filter(
+        RealTemperature.latitude == latitude,
+        RealTemperature.longitude == longitude,
+        RealTemperature.timestamp >= start_date.normalize(),
+        RealTemperature.timestamp < end_date.normalize(),
     )
     results = query.all()
     session.close()
@@ -173,16 +446,390 @@ async def prediction(request: PredictionRequest = Body(...)):
         }
 
     data = fetch_weather_data(
-        start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+        start_date.strftime("%Y-%m-%d"),
+        end_date.strftime("%Y-%m-%d"),
+        use_cache=request.use_cache,
+        latitude=latitude,
+        longitude=longitude,
     )
 
-    results = predict(model.path, data)
+    if request.background_write:
+        results = predict(
+            model.path,
+            data,
+            model_id=model.id,
+            persist=False,
+            inference_engine=model.inference_engine,
+        )
+        background_tasks.add_task(save_predictions_to_db, results, model.id)
+    else:
+        results = predict(
+            model.path,
+            data,
+            model_id=model.id,
+            inference_engine=model.inference_engine,
+        )
+
+    return frame_response(results, response_format)
+
+
+class PredictionWindow(BaseModel):
+    start_date: str
+    end_date: str
+
+
+class BatchPredictionRequest(BaseModel):
+    model_ids: List[int]
+    windows: List[PredictionWindow]
+    persist: bool = True
+    background_write: bool = False
+    use_cache: bool = True
+    # Tous les modèles sur chacun de ces sites ; par défaut, chaque modèle sur le sien
+    locations: List[Location] = None
+
+
+@app.post("/predict/batch")
+def batch_prediction(
+    background_tasks: BackgroundTasks, request: BatchPredictionRequest = Body(...)
+):
+    """
+    Prédictions de plusieurs modèles sur plusieurs périodes.
+
+    Chaque couple (période, site) distinct est récupéré et transformé en
+    features une seule fois, la matrice étant partagée par tous les modèles de
+    ce site ; les sites d'une période sont récupérés en parallèle et toutes les
+    prédictions sont enregistrées dans une seule transaction.
+    """
+    if not request.model_ids or not request.windows:
+        return {"error": "Au moins un modèle et une période sont nécessaires"}
+
+    windows = []
+    try:
+        for window in request.windows:
+            bounds = (
+                pd.to_datetime(window.start_date).normalize(),
+                pd.to_datetime(window.end_date).normalize(),
+            )
+            if bounds not in windows:
+                windows.append(bounds)
+    except ValueError:
+        return {"error": "Format de date invalide"}
+    model_ids = list(dict.fromkeys(request.model_ids))
+
+    engine = get_engine()
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    try:
+        models = session.query(Model).filter(Model.id.in_(model_ids)).all()
+        missing = sorted(set(model_ids) - {model.id for model in models})
+        if missing:
+            return {"error": f"Modèles non trouvés: {missing}"}
+
+        models_by_id = {model.id: model for model in models}
+        models = [models_by_id[model_id] for model_id in model_ids]
+        models_by_location = {}
+        if request.locations:
+            for location in requested_locations(request.locations):
+                models_by_location[location_key(*location)] = models
+        else:
+            for model in models:
+                models_by_location.setdefault(model_location(model), []).append(model)
+
+        # Même garde que /predict : pas de prédiction sur des données d'entraînement
+        overlapping = {
+            (start, end, location)
+            for start, end in windows
+            for location in models_by_location
+            if session.query(RealTemperature.id)
+            .filter(
+                RealTemperature.latitude == location[0],
+                RealTemperature.longitude == location[1],
+                RealTemperature.timestamp >= start,
+                RealTemperature.timestamp < end,
+            )
+            .first()
+            is not None
+        }
+    finally:
+        session.close()
+
+    results, to_save = [], []
+    for start, end in windows:
+        window = {
+            "start_date": start.strftime("%Y-%m-%d"),
+            "end_date": end.strftime("%Y-%m-%d"),
+        }
+        pending = [
+            location
+            for location in models_by_location
+            if (start, end, location) not in overlapping
+        ]
+        frames = (
+            fetch_locations_weather(
+                pending,
+                window["start_date"],
+                window["end_date"],
+                use_cache=request.use_cache,
+            )
+            if pending
+            else {}
+        )
+
+        for location, site_models in models_by_location.items():
+            site = {**window, "latitude": location[0], "longitude": location[1]}
+            if (start, end, location) in overlapping:
+                results.append(
+                    {
+                        **site,
+                        "error": "Les données sont déjà présentes dans la base de données",
+                    }
+                )
+                continue
+
+            data = frames[location]
+            if data.empty:
+                results.append({**site, "error": "Aucune donnée pour cette période"})
+                continue
+
+            entries = [
+                (model.id, model.path, model.inference_engine) for model in site_models
+            ]
+            for model_id, frame in predict_models(entries, data).items():
+                to_save.append((frame, model_id))
+                results.append(
+                    {
+                        **site,
+                        "model_id": model_id,
+                        "predictions": frame.to_dict(orient="records"),
+                    }
+                )
+
+    if request.persist and to_save:
+        if request.background_write:
+            background_tasks.add_task(save_batch_predictions, to_save)
+        else:
+            save_batch_predictions(to_save)
+
+    return results
+
+
+class Observation(BaseModel):
+    timestamp: str
+    temperature_2m: Optional[float] = None
+    relative_humidity: Optional[float] = None
+    precipitation: Optional[float] = None
+    surface_pressure: Optional[float] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+
+class IncrementalPredictionRequest(BaseModel):
+    model_id: int
+    # Nom du flux : un état de features est conservé par flux
+    stream: str = "default"
+    observations: List[Observation]
+    flush: bool = False
+    reset: bool = False
+    persist: bool = True
+
+
+@app.post("/predict/incremental")
+def incremental_prediction(request: IncrementalPredictionRequest = Body(...)):
+    engine = get_engine()
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    try:
+        model = session.query(Model).filter(Model.id == request.model_id).first()
+    finally:
+        session.close()
+    if not model:
+        return {"error": "Modèle non trouvé"}
+
+    data = pd.DataFrame([obs.model_dump() for obs in request.observations])
+    if data.empty:
+        return []
+    data = data.astype({col: float for col in data.columns if col != "timestamp"})
+
+    # Seuls les créneaux de 3h terminés par ces relevés sont calculés et prédits
+    try:
+        X, y = update_stream(
+            request.stream, data, flush=request.flush, reset=request.reset
+        )
+    except ValueError as e:
+        return {"error": str(e)}
+
+    if X.empty:
+        return []
+
+    compiled = (model.inference_engine or INFERENCE_ENGINE) == "compiled"
+    y_pred = model_cache.get(model.path, model_id=model.id, compiled=compiled).predict(
+        X
+    )
+    results = build_prediction_frame(
+        X, y, y_pred, data["latitude"].iloc[0], data["longitude"].iloc[0]
+    )
+    if request.persist:
+        save_predictions_to_db(results, model.id)
 
     return results.to_dict(orient="records")
 
 
+class TextClassificationRequest(BaseModel):
+    captions: List[str]
+    # Étiquettes retenues : probabilité >= threshold
+    threshold: float = 0.5
+
+
+@app.post("/classify/text")
+def classify_text(request: TextClassificationRequest = Body(...)):
+    if not request.captions:
+        return []
+    try:
+        batcher = get_text_batcher()
+    except FileNotFoundError as e:
+        return {"error": str(e)}
+
+    # Les légendes des requêtes concurrentes sont évaluées ensemble
+    scores = batcher(request.captions)
+    return [
+        {
+            "caption": caption,
+            "scores": {
+                str(label): float(score) for label, score in zip(TEXT_LABELS, row)
+            },
+            "labels": [
+                label
+                for label, score in zip(TEXT_LABELS, row)
+                if score >= request.threshold
+            ],
+        }
+        for caption, row in zip(request.captions, scores)
+    ]
+
+
+@app.get("/classify/text/stats")
+def get_text_classification_stats():
+    try:
+        return get_text_batcher().stats()
+    except FileNotFoundError as e:
+        return {"error": str(e)}
+
+
+class FusionRequest(BaseModel):
+    image_ids: List[str]
+    mode: str = "average"
+    # Poids du texte (mode average), FUSION_TEXT_WEIGHT par défaut
+    text_weight: Optional[float] = None
+    threshold: float = 0.5
+
+
+@app.post("/classify/fusion")
+def classify_fusion(request: FusionRequest = Body(...)):
+    try:
+        engine = FusionEngine(request.mode, request.text_weight)
+        scores, found = engine.predict_images(request.image_ids)
+    except (ValueError, FileNotFoundError) as e:
+        return {"error": str(e)}
+
+    results = []
+    for image_id, row, known in zip(request.image_ids, scores, found):
+        if not known:
+            results.append({"image_id": image_id, "error": "ImageID inconnu"})
+            continue
+        results.append(
+            {
+                "image_id": image_id,
+                "scores": {
+                    str(label): float(score) for label, score in zip(TEXT_LABELS, row)
+                },
+                "labels": [
+                    label
+                    for label, score in zip(TEXT_LABELS, row)
+                    if score >= request.threshold
+                ],
+            }
+        )
+    return results
+
+
+@app.get("/fusion/evaluate")
+def evaluate_fusion(
+    split: str = "test",
+    mode: str = "average",
+    text_weight: Optional[float] = None,
+    threshold: float = 0.5,
+):
+    if split not in SPLITS:
+        return {"error": f"Split inconnu: {split} ({', '.join(SPLITS)})"}
+    try:
+        engine = FusionEngine(mode, text_weight)
+        evaluation = evaluate_split(engine, split, threshold)
+        # Poids du texte retenu sur la validation, pour information
+        evaluation["best_text_weight"], _ = search_text_weight(
+            feature_store, threshold=threshold
+        )
+    except (ValueError, FileNotFoundError) as e:
+        return {"error": str(e)}
+    return evaluation
+
+
+class SimilarityRequest(BaseModel):
+    # Requête : une image du magasin de features ou une légende
+    image_id: Optional[str] = None
+    caption: Optional[str] = None
+    # Espace de recherche : features "text" ou "image" d'un split
+    modality: str = "text"
+    split: str = "train"
+    index: str = "exact"
+    k: int = 10
+    n_probe: Optional[int] = None
+
+
+@app.post("/similar")
+def find_similar(request: SimilarityRequest = Body(...)):
+    if (request.image_id is None) == (request.caption is None):
+        return {"error": "Indiquer image_id ou caption"}
+    if request.index not in INDEX_KINDS:
+        return {"error": f"Index inconnu: {request.index} ({', '.join(INDEX_KINDS)})"}
+    if request.k <= 0:
+        return {"error": "k doit être strictement positif"}
+    if request.n_probe is not None and request.n_probe <= 0:
+        return {"error": "n_probe doit être strictement positif"}
+
+    try:
+        if request.image_id is not None:
+            query, found = feature_store.lookup([request.image_id], request.modality)
+            if not found[0]:
+                return {"error": f"ImageID inconnu: {request.image_id}"}
+        else:
+            # Probabilités des étiquettes de la légende (même espace que les features)
+            query = get_text_classifier().predict_proba([request.caption])
+        index = get_similarity_index(request.split, request.modality, request.index)
+    except (ValueError, FileNotFoundError) as e:
+        return {"error": str(e)}
+
+    options = (
+        {"n_probe": request.n_probe}
+        if request.index == "ivf" and request.n_probe
+        else {}
+    )
+    # Un voisin de plus : l'image de la requête est retirée des résultats
+    scores, rows = index.search(query, request.k + 1, **options)
+    results = [
+        {"image_id": str(index.ids[row]), "score": float(score)}
+        for score, row in zip(scores[0], rows[0])
+        if row >= 0 and index.ids[row] != request.image_id
+    ]
+    return {
+        "index": request.index,
+        "split": request.split,
+        "modality": request.modality,
+        "results": results[: request.k],
+    }
+
+
 @app.get("/models", response_model=list)
-async def get_models():
+def get_models():
     engine = get_engine()
     Session = sessionmaker(bind=engine)
     session = Session()
@@ -198,6 +845,18 @@ async def get_models():
                 "version": model.version,
                 "created_at": model.created_at,
                 "path": model.path,
+                "backend": model.backend,
+                "n_jobs": model.n_jobs,
+                "n_estimators": model.n_estimators,
+                "parent_model_id": model.parent_model_id,
+                "fit_seconds": model.fit_seconds,
+                "training_rows": model.training_rows,
+                "artifact_format": model.artifact_format,
+                "artifact_bytes": model.artifact_bytes,
+                "load_seconds": model.load_seconds,
+                "latitude": model.latitude,
+                "longitude": model.longitude,
+                "inference_engine": model.inference_engine or INFERENCE_ENGINE,
             }
             for model in models
         ]
@@ -211,89 +870,139 @@ async def get_models():
         session.close()
 
 
+class ModelSettings(BaseModel):
+    inference_engine: str
+
+
+@app.patch("/models/{model_id}")
+def update_model_settings(model_id: int, settings: ModelSettings = Body(...)):
+    if settings.inference_engine not in INFERENCE_ENGINES:
+        return {"error": f"Moteur de prédiction inconnu: {settings.inference_engine}"}
+
+    engine = get_engine()
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    try:
+        model = session.query(Model).filter(Model.id == model_id).first()
+        if not model:
+            return {"error": "Modèle non trouvé"}
+        model.inference_engine = settings.inference_engine
+        session.commit()
+        return {"id": model_id, "inference_engine": settings.inference_engine}
+    finally:
+        session.close()
+
+
+@app.get("/models/cache")
+async def get_model_cache_stats():
+    return model_cache.stats()
+
+
+@app.get("/archive/cache")
+async def get_archive_cache_stats():
+    return archive_cache.stats()
+
+
+# Taille par défaut et maximale d'une page de /predictions
+PREDICTIONS_PAGE_SIZE = int(os.environ.get("PREDICTIONS_PAGE_SIZE", "1000"))
+PREDICTIONS_MAX_PAGE_SIZE = int(os.environ.get("PREDICTIONS_MAX_PAGE_SIZE", "10000"))
+
+
 class PredictionDateRange(BaseModel):
     start_date: str
     end_date: str
     model_id: int = None  # Optionnel, permet de filtrer par modèle spécifique
+    # Pagination : next_cursor de la page précédente ; limit=0 : métriques seules
+    cursor: int = None
+    limit: int = PREDICTIONS_PAGE_SIZE
+    # Champs renvoyés pour chaque prédiction (tous par défaut)
+    fields: List[str] = None
+    # Métriques (RMSE, MAE, nombre) par modèle en plus des métriques globales
+    group_by_model: bool = False
+    # Prédictions d'un seul site (tous par défaut)
+    latitude: float = None
+    longitude: float = None
+    # "json" (page + métriques) ; "ndjson", "arrow" ou "parquet" : toutes les
+    # prédictions en flux. Sans format, choisi d'après l'en-tête Accept
+    format: str = None
 
 
 @app.post("/predictions")
-async def get_predictions(date_range: PredictionDateRange = Body(...)):
+def get_predictions(http_request: Request, date_range: PredictionDateRange = Body(...)):
     try:
-        start_date = pd.to_datetime(date_range.start_date)
-        end_date = pd.to_datetime(date_range.end_date)
+        start_date = pd.to_datetime(date_range.start_date).normalize()
+        end_date = pd.to_datetime(date_range.end_date).normalize()
     except ValueError:
         return {"error": "Format de date invalide. Utilisez YYYY-MM-DD."}
 
-    engine = get_engine()
-    Session = sessionmaker(bind=engine)
-    session = Session()
+    unknown = sorted(set(date_range.fields or []) - set(PREDICTION_FIELDS))
+    if unknown:
+        return {"error": f"Champs inconnus: {unknown}"}
+    if not 0 <= date_range.limit <= PREDICTIONS_MAX_PAGE_SIZE:
+        return {
+            "error": f"limit doit être compris entre 0 et {PREDICTIONS_MAX_PAGE_SIZE}"
+        }
+    if date_range.format and date_range.format not in RESPONSE_FORMATS:
+        return {"error": f"Format inconnu: {date_range.format}"}
+    response_format = negotiate(http_request.headers.get("accept"), date_range.format)
+    if response_format is None:
+        return not_acceptable(date_range.format)
+
+    query = (start_date, end_date, date_range.model_id)
+    location = (
+        location_key(date_range.latitude, date_range.longitude)
+        if date_range.latitude is not None and date_range.longitude is not None
+        else None
+    )
 
-    try:
-        query = session.query(Prediction).filter(
-            Prediction.timestamp >= start_date.strftime("%Y-%m-%d"),
-            Prediction.timestamp <= end_date.strftime("%Y-%m-%d"),
+    # Flux : lecture par pages, mémoire constante quelle que soit la période
+    if response_format != "json":
+        frames = iter_prediction_frames(
+            *query,
+            fields=date_range.fields,
+            cursor=date_range.cursor,
+            iso_timestamps=response_format == "ndjson",
+            location=location,
         )
+        return frames_response(frames, response_format, PREDICTION_DTYPES)
 
-        if date_range.model_id:
-            query = query.filter(Prediction.model_id == date_range.model_id)
-
-        predictions = query.all()
-
-        if not predictions:
+    try:
+        metrics = prediction_metrics(*query, location=location)[0]
+        if not metrics["count"]:
             return {
                 "message": "Aucune prédiction n'est disponible pour cette période",
             }
 
-        real_values = []
-        pred_values = []
-        predictions_list = []
-
-        for pred in predictions:
-            real = float(pred.real) if pred.real else None
-            prediction = float(pred.prediction) if pred.prediction else None
-
-            if real is not None and prediction is not None:
-                real_values.append(real)
-                pred_values.append(prediction)
-
-            predictions_list.append(
-                {
-                    "id": pred.id,
-                    "model_id": pred.model_id,
-                    "timestamp": pred.timestamp,
-                    "valeur_reelle": real,
-                    "valeur_prevue": prediction,
-                    "relative_humidity": (
-                        float(pred.relative_humidity)
-                        if pred.relative_humidity
-                        else None
-                    ),
-                    "precipitation": (
-                        float(pred.precipitation) if pred.precipitation else None
-                    ),
-                    "surface_pressure": (
-                        float(pred.surface_pressure) if pred.surface_pressure else None
-                    ),
-                    "latitude": float(pred.latitude) if pred.latitude else None,
-                    "longitude": float(pred.longitude) if pred.longitude else None,
-                }
-            )
-
-        rmse = None
-        if real_values and pred_values:
-            rmse = float(np.sqrt(mean_squared_error(real_values, pred_values)))
-
         result = {}
+        if metrics["rmse"] is not None:
+            result["rmse"] = metrics["rmse"]
+            result["mae"] = metrics["mae"]
+        result["predictions_count"] = metrics["count"]
+
+        if date_range.group_by_model:
+            result["metrics_by_model"] = prediction_metrics(
+                *query, group_by_model=True, location=location
+            )
 
-        if rmse is not None:
-            result["rmse"] = rmse
-
-        result["predictions_count"] = len(predictions_list)
-        result["predictions"] = predictions_list
+        if date_range.limit:
+            result["predictions"], result["next_cursor"] = load_predictions_page(
+                *query,
+                fields=date_range.fields,
+                cursor=date_range.cursor,
+                limit=date_range.limit,
+                location=location,
+            )
 
-        if date_range.model_id and predictions:
-            model = session.query(Model).filter(Model.id == date_range.model_id).first()
+        if date_range.model_id:
+            engine = get_engine()
+            Session = sessionmaker(bind=engine)
+            session = Session()
+            try:
+                model = (
+                    session.query(Model).filter(Model.id == date_range.model_id).first()
+                )
+            finally:
+                session.close()
             if model:
                 result["model_info"] = {
                     "id": model.id,
@@ -302,13 +1011,59 @@ async def get_predictions(date_range: PredictionDateRange = Body(...)):
                     "created_at": model.created_at,
                 }
 
-        return result
+        # Page sérialisée par orjson, comme les réponses de /predict et /history
+        return json_response(result)
 
     except Exception as e:
         return {"error": f"Erreur lors de la récupération des prédictions: {str(e)}"}
 
-    finally:
-        session.close()
+
+@app.get("/history")
+def get_history(
+    request: Request,
+    start_date: str = Query(...),
+    end_date: str = Query(...),
+    resolution: str = Query("hourly"),
+    format: Optional[str] = Query(None),
+    latitude: Optional[float] = Query(None),
+    longitude: Optional[float] = Query(None),
+):
+    """
+    Relevés bruts [start_date, end_date[ (horaires, par créneau de 3h ou journaliers),
+    d'un site ou de tous, en flux JSON, NDJSON, Arrow IPC ou Parquet selon
+    `format` ou l'en-tête Accept.
+    """
+    try:
+        start_date = pd.to_datetime(start_date).normalize()
+        end_date = pd.to_datetime(end_date).normalize()
+    except ValueError:
+        return {"error": "Format de date invalide. Utilisez YYYY-MM-DD."}
+
+    if resolution not in HISTORY_RESOLUTIONS:
+        return {
+            "error": f"Résolution inconnue: {resolution} ({', '.join(HISTORY_RESOLUTIONS)})"
+        }
+    if format and format not in RESPONSE_FORMATS:
+        return {"error": f"Format inconnu: {format}"}
+    response_format = negotiate(request.headers.get("accept"), format)
+    if response_format is None:
+        return not_acceptable(format)
+
+    location = (
+        location_key(latitude, longitude)
+        if latitude is not None and longitude is not None
+        else None
+    )
+    return frames_response(
+        iter_history_frames(start_date, end_date, resolution, location=location),
+        response_format,
+    )
+
+
+@app.get("/locations")
+def get_locations():
+    """Sites présents en base, avec le nombre de relevés et la période couverte."""
+    return list_locations()
 
 
 import os
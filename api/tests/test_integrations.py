@@ -1,6 +1,12 @@
+import os
 import sys
 import json
+import time
+import threading
+import tempfile
 import unittest
+import pytest
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from datetime import datetime, timedelta
@@ -9,7 +15,15 @@ from unittest.mock import patch, MagicMock
 
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
 from api.main import app
+from data.db_init import Base
+from model.predict_series import save_predictions_to_db
+from data.data_ingestion import bulk_save_weather_data
+from api.formats import pa
+from model.micro_batch import MicroBatcher
+from model.similarity_index import current_version
 
 
 class TestAPI(unittest.TestCase):
@@ -52,43 +66,132 @@ class TestAPI(unittest.TestCase):
             {"message": "24 enregistrements ajoutés à la base de données"},
         )
 
-    @patch("api.main.get_engine")
-    @patch("api.main.training_pipeline")
-    def test_train_model_endpoint(self, mock_training, mock_get_engine):
-        mock_session = MagicMock()
-        mock_results = [
-            MagicMock(
-                timestamp="2023-01-01 00:00:00",
-                temperature_2m="20.0",
-                relative_humidity="75.0",
-                precipitation="0.0",
-                surface_pressure="1010.0",
-                latitude="48.8566",
-                longitude="2.3522",
+    @patch("data.backfill_jobs.backfill_weather_data")
+    def test_backfill_endpoint(self, mock_backfill):
+        mock_backfill.return_value = {
+            "chunks": 12,
+            "resumed": 2,
+            "completed": 10,
+            "failed": [],
+            "inserted": 7300,
+            "skipped": 0,
+        }
+
+        with tempfile.TemporaryDirectory() as tmp_dir, patch(
+            "api.main.BACKFILL_CHECKPOINT", os.path.join(tmp_dir, "backfill.json")
+        ):
+            response = self.client.post(
+                "/backfill", json={"start_date": "2020-01-01", "end_date": "2020-12-31"}
             )
-        ]
-        mock_session.query.return_value.filter.return_value.all.return_value = (
-            mock_results
+            self.assertEqual(response.status_code, 200)
+            job_id = response.json()["job_id"]
+            self.assertEqual(
+                response.json()["progress"], {"chunks": 12, "completed": 0}
+            )
+
+            # Réponse immédiate, import exécuté en tâche de fond
+            for _ in range(100):
+                job = self.client.get(f"/backfill/{job_id}").json()
+                if job["status"] in ("done", "failed"):
+                    break
+                time.sleep(0.05)
+
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["report"]["completed"], 10)
+        self.assertEqual(mock_backfill.call_args.kwargs["chunk"], "month")
+        self.assertIn(
+            "error",
+            self.client.post(
+                "/backfill", json={"start_date": "2020-01-01", "chunk": "week"}
+            ).json(),
         )
-        mock_session_maker = MagicMock(return_value=mock_session)
-        mock_get_engine.return_value = MagicMock()
+        self.assertIn("error", self.client.get("/backfill/inconnu").json())
 
-        with patch("api.main.sessionmaker", return_value=mock_session_maker):
-            mock_training.return_value = True
+    @patch("api.main.submit_training_job")
+    @patch("api.main.create_training_job")
+    def test_train_model_endpoint(self, mock_create, mock_submit):
+        mock_create.return_value = 7
 
-            request_data = {
-                "version": "1.0.0",
-                "start_date": "2023-01-01",
-                "end_date": "2023-01-02",
-            }
+        request_data = {
+            "version": "1.0.0",
+            "start_date": "2023-01-01",
+            "end_date": "2023-01-02",
+        }
 
-            response = self.client.post("/train_model", json=request_data)
+        response = self.client.post("/train_model", json=request_data)
 
-            self.assertEqual(response.status_code, 200)
-            self.assertEqual(
-                response.json(),
-                {"message": "Modèle entraîné avec succès", "version": "1.0.0"},
-            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["job_id"], 7)
+        self.assertEqual(response.json()["status"], "queued")
+        self.assertEqual(response.json()["version"], "1.0.0")
+        mock_create.assert_called_once_with("1.0.0", "2023-01-01", "2023-01-02", {})
+        mock_submit.assert_called_once_with(7)
+
+    @patch("api.main.submit_training_job")
+    @patch("api.main.create_training_job", return_value=8)
+    def test_train_model_options(self, mock_create, mock_submit):
+        response = self.client.post(
+            "/train_model",
+            json={"version": "1.1.0", "artifact_format": "compact", "n_jobs": -1},
+        )
+        self.assertEqual(response.json()["job_id"], 8)
+        self.assertEqual(
+            mock_create.call_args.args[3], {"artifact_format": "compact", "n_jobs": -1}
+        )
+
+        response = self.client.post(
+            "/train_model", json={"version": "1.1.0", "artifact_format": "zip"}
+        )
+        self.assertIn("error", response.json())
+        mock_submit.assert_called_once_with(8)
+
+    @patch("api.main.submit_training_job")
+    @patch("api.main.create_training_job", side_effect=[11, 12])
+    def test_train_model_per_location(self, mock_create, mock_submit):
+        response = self.client.post(
+            "/train_model",
+            json={
+                "version": "2.0.0",
+                "backend": "hist_gradient_boosting",
+                "locations": [
+                    {"latitude": 48.8566, "longitude": 2.3522},
+                    {"latitude": 45.764043, "longitude": 4.835659},
+                ],
+            },
+        )
+
+        self.assertEqual(
+            response.json()["jobs"],
+            [
+                {"job_id": 11, "latitude": 48.8566, "longitude": 2.3522},
+                {"job_id": 12, "latitude": 45.764, "longitude": 4.8357},
+            ],
+        )
+        self.assertEqual(
+            mock_create.call_args.args[3],
+            {"backend": "hist_gradient_boosting", "location": [45.764, 4.8357]},
+        )
+        self.assertEqual(mock_submit.call_count, 2)
+
+    @patch("api.main.list_locations")
+    def test_locations_endpoint(self, mock_list):
+        mock_list.return_value = [
+            {"latitude": 48.8566, "longitude": 2.3522, "observations": 24}
+        ]
+        response = self.client.get("/locations")
+        self.assertEqual(response.json()[0]["observations"], 24)
+
+    @patch("api.main.get_training_job")
+    def test_get_job_endpoint(self, mock_get_job):
+        mock_get_job.side_effect = lambda job_id: (
+            {"id": 7, "status": "running"} if job_id == 7 else None
+        )
+
+        response = self.client.get("/jobs/7")
+        self.assertEqual(response.json(), {"id": 7, "status": "running"})
+
+        response = self.client.get("/jobs/8")
+        self.assertIn("error", response.json())
 
     @patch("api.main.get_engine")
     @patch("api.main.fetch_weather_data")
@@ -137,6 +240,439 @@ class TestAPI(unittest.TestCase):
             self.assertIsInstance(response.json(), list)
             self.assertEqual(len(response.json()), 24)
 
+    @patch("api.main.get_engine")
+    @patch("api.main.fetch_weather_data")
+    @patch("api.main.predict")
+    @patch("api.main.save_predictions_to_db")
+    def test_predict_endpoint_background_write(
+        self, mock_save, mock_predict, mock_fetch, mock_get_engine
+    ):
+        mock_session = MagicMock()
+        mock_model = MagicMock(id=1, path="model/registry/model_1.0.0.pkl")
+        mock_session.query.return_value.filter.return_value.first.return_value = (
+            mock_model
+        )
+        mock_session.query.return_value.filter.return_value.all.return_value = []
+        mock_session_maker = MagicMock(return_value=mock_session)
+
+        mock_predict_df = pd.DataFrame(
+            {
+                "timestamp": pd.date_range(start="2023-02-01", periods=8, freq="3h"),
+                "prediction": [21.5] * 8,
+            }
+        )
+        mock_predict.return_value = mock_predict_df
+
+        with patch("api.main.sessionmaker", return_value=mock_session_maker):
+            request_data = {
+                "model_id": 1,
+                "start_date": "2023-02-01",
+                "end_date": "2023-02-02",
+                "background_write": True,
+            }
+
+            response = self.client.post("/predict", json=request_data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 8)
+        self.assertFalse(mock_predict.call_args.kwargs["persist"])
+        mock_save.assert_called_once_with(mock_predict_df, 1)
+
+    @patch("api.main.get_engine")
+    @patch("api.main.model_cache")
+    @patch("api.main.save_predictions_to_db")
+    def test_predict_incremental_endpoint(
+        self, mock_save, mock_model_cache, mock_get_engine
+    ):
+        mock_session = MagicMock()
+        mock_model = MagicMock(id=1, path="model/registry/model_1.0.0.pkl")
+        mock_session.query.return_value.filter.return_value.first.return_value = (
+            mock_model
+        )
+        mock_model_cache.get.return_value.predict.side_effect = lambda X: [20.0] * len(
+            X
+        )
+
+        timestamps = pd.date_range(start="2023-02-01", periods=24 * 4, freq="h")
+        observations = [
+            {
+                "timestamp": ts.strftime("%Y-%m-%d %H:%M:%S"),
+                "temperature_2m": 10.0 + (i % 7),
+                "relative_humidity": 75.0,
+                "precipitation": 0.0,
+                "surface_pressure": 1010.0,
+                "latitude": 48.8566,
+                "longitude": 2.3522,
+            }
+            for i, ts in enumerate(timestamps)
+        ]
+
+        with tempfile.TemporaryDirectory() as tmp_dir, patch(
+            "model.incremental_features.FEATURE_STATE_DIR", tmp_dir
+        ), patch(
+            "api.main.sessionmaker", return_value=MagicMock(return_value=mock_session)
+        ):
+            body = {"model_id": 1, "stream": "paris", "reset": True}
+            # 19 créneaux de préchauffage (lags), puis un créneau par appel
+            warmup = self.client.post(
+                "/predict/incremental",
+                json={**body, "observations": observations[: 3 * 19]},
+            )
+            step = self.client.post(
+                "/predict/incremental",
+                json={
+                    "model_id": 1,
+                    "stream": "paris",
+                    "observations": observations[3 * 19 : 3 * 20],
+                },
+            )
+
+        self.assertEqual(warmup.json(), [])
+        self.assertEqual(len(step.json()), 1)
+        self.assertEqual(step.json()[0]["timestamp"], "2023-02-03T09:00:00")
+        self.assertEqual(step.json()[0]["prediction"], 20.0)
+        self.assertEqual(mock_save.call_count, 1)
+
+    @patch("api.main.save_batch_predictions")
+    @patch("api.main.predict_models")
+    @patch("api.main.fetch_locations_weather")
+    @patch("api.main.get_engine")
+    def test_predict_batch_endpoint(
+        self, mock_get_engine, mock_fetch, mock_predict_models, mock_save
+    ):
+        site = {"latitude": None, "longitude": None}
+        models = [
+            MagicMock(id=1, path="model/registry/a.pkl", inference_engine=None, **site),
+            MagicMock(
+                id=2, path="model/registry/b.pkl", inference_engine="compiled", **site
+            ),
+        ]
+
+        def query(entity):
+            result = MagicMock()
+            result.filter.return_value.all.return_value = models
+            result.filter.return_value.first.return_value = None
+            return result
+
+        mock_session = MagicMock()
+        mock_session.query.side_effect = query
+        mock_fetch.side_effect = lambda locations, *args, **kwargs: {
+            location: pd.DataFrame({"temperature_2m": [20.0]}) for location in locations
+        }
+        frame = pd.DataFrame(
+            {"timestamp": ["2025-01-01 00:00:00"], "prediction": [20.5]}
+        )
+        mock_predict_models.side_effect = lambda models, data: {
+            model_id: frame for model_id, _, _ in models
+        }
+
+        window = {"start_date": "2025-01-01", "end_date": "2025-01-08"}
+        with patch(
+            "api.main.sessionmaker", return_value=MagicMock(return_value=mock_session)
+        ):
+            response = self.client.post(
+                "/predict/batch",
+                json={
+                    "model_ids": [2, 1, 2],
+                    "windows": [
+                        window,
+                        window,
+                        {"start_date": "2025-02-01", "end_date": "2025-02-08"},
+                    ],
+                },
+            )
+
+        results = response.json()
+        self.assertEqual(len(results), 4)
+        self.assertEqual([r["model_id"] for r in results], [2, 1, 2, 1])
+        self.assertEqual(results[0]["predictions"][0]["prediction"], 20.5)
+        # Modèles sans site : prédictions sur Paris
+        self.assertEqual(results[0]["latitude"], 48.8566)
+        # Une récupération et un calcul de features par période distincte
+        self.assertEqual(mock_fetch.call_count, 2)
+        self.assertEqual(mock_predict_models.call_count, 2)
+        self.assertEqual(
+            mock_predict_models.call_args.args[0],
+            [
+                (2, "model/registry/b.pkl", "compiled"),
+                (1, "model/registry/a.pkl", None),
+            ],
+        )
+        # Une seule écriture pour toutes les prédictions
+        mock_save.assert_called_once()
+        self.assertEqual(len(mock_save.call_args.args[0]), 4)
+
+    def test_predictions_endpoint_pages(self):
+        engine = create_engine(
+            "sqlite://",
+            poolclass=StaticPool,
+            connect_args={"check_same_thread": False},
+        )
+        Base.metadata.create_all(bind=engine)
+        frame = pd.DataFrame(
+            {
+                "timestamp": pd.date_range("2023-01-01", periods=24, freq="3h"),
+                "prediction": [20.0] * 24,
+                "real": [18.0] * 24,
+                "latitude": 48.8566,
+                "longitude": 2.3522,
+            }
+        )
+        save_predictions_to_db(frame, 1, engine=engine)
+        save_predictions_to_db(frame.assign(prediction=19.0), 2, engine=engine)
+
+        body = {"start_date": "2023-01-01", "end_date": "2023-01-04"}
+        with patch("data.data_access.get_engine", return_value=engine):
+            first = self.client.post(
+                "/predictions", json={**body, "limit": 30, "group_by_model": True}
+            ).json()
+            second = self.client.post(
+                "/predictions",
+                json={**body, "cursor": first["next_cursor"], "fields": ["id"]},
+            ).json()
+            stream = self.client.post("/predictions", json={**body, "format": "ndjson"})
+            invalid = self.client.post("/predictions", json={**body, "fields": ["x"]})
+
+        self.assertEqual(first["predictions_count"], 48)
+        self.assertAlmostEqual(first["mae"], 1.5)
+        self.assertEqual(
+            [(m["model_id"], m["rmse"]) for m in first["metrics_by_model"]],
+            [(1, 2.0), (2, 1.0)],
+        )
+        self.assertEqual(len(first["predictions"]), 30)
+        self.assertEqual(len(second["predictions"]), 18)
+        self.assertEqual(second["predictions"][0], {"id": 31})
+        self.assertIsNone(second["next_cursor"])
+
+        self.assertEqual(stream.headers["content-type"], "application/x-ndjson")
+        lines = [json.loads(line) for line in stream.text.splitlines()]
+        self.assertEqual(len(lines), 48)
+        self.assertEqual(lines[0]["timestamp"], "2023-01-01T00:00:00")
+        self.assertIn("error", invalid.json())
+
+    def test_history_endpoint_formats(self):
+        engine = create_engine(
+            "sqlite://",
+            poolclass=StaticPool,
+            connect_args={"check_same_thread": False},
+        )
+        Base.metadata.create_all(bind=engine)
+        hours = 24 * 40
+        bulk_save_weather_data(
+            pd.DataFrame(
+                {
+                    "timestamp": pd.date_range("2023-01-01", periods=hours, freq="h"),
+                    "temperature_2m": [15.0] * hours,
+                    "relative_humidity": [70.0] * hours,
+                    "precipitation": [0.0] * hours,
+                    "surface_pressure": [1013.0] * hours,
+                    "latitude": 48.8566,
+                    "longitude": 2.3522,
+                }
+            ),
+            engine=engine,
+        )
+
+        params = {"start_date": "2023-01-01", "end_date": "2023-02-05"}
+        with patch("data.data_access.get_engine", return_value=engine):
+            hourly = self.client.get("/history", params=params)
+            daily = self.client.get(
+                "/history",
+                params={**params, "resolution": "daily"},
+                headers={"Accept": "application/x-ndjson"},
+            )
+            invalid = self.client.get("/history", params={**params, "resolution": "x"})
+            refused = self.client.get(
+                "/history", params=params, headers={"Accept": "text/html"}
+            )
+            if pa is not None:
+                arrow = self.client.get(
+                    "/history",
+                    params=params,
+                    headers={"Accept": "application/vnd.apache.arrow.stream"},
+                )
+
+        records = hourly.json()
+        self.assertEqual(len(records), 35 * 24)
+        self.assertEqual(records[0]["timestamp"], "2023-01-01T00:00:00")
+        self.assertEqual(records[-1]["timestamp"], "2023-02-04T23:00:00")
+        self.assertEqual(daily.headers["content-type"], "application/x-ndjson")
+        self.assertEqual(len(daily.text.splitlines()), 35)
+        self.assertIn("error", invalid.json())
+        self.assertEqual(refused.status_code, 406)
+        if pa is not None:
+            table = pa.ipc.open_stream(arrow.content).read_all()
+            self.assertEqual(table.num_rows, 35 * 24)
+            self.assertTrue(pa.types.is_timestamp(table.schema.field("timestamp").type))
+
+    def test_update_model_inference_engine(self):
+        mock_model = MagicMock(inference_engine=None)
+        mock_session = MagicMock()
+        mock_session.query.return_value.filter.return_value.first.return_value = (
+            mock_model
+        )
+
+        with patch("api.main.get_engine"), patch(
+            "api.main.sessionmaker", return_value=MagicMock(return_value=mock_session)
+        ):
+            response = self.client.patch(
+                "/models/1", json={"inference_engine": "compiled"}
+            )
+            invalid = self.client.patch("/models/1", json={"inference_engine": "gpu"})
+
+        self.assertEqual(response.json(), {"id": 1, "inference_engine": "compiled"})
+        self.assertEqual(mock_model.inference_engine, "compiled")
+        mock_session.commit.assert_called_once()
+        self.assertIn("error", invalid.json())
+
+    @patch("api.main.save_weather_data_to_db")
+    @patch("api.main.fetch_weather_data")
+    def test_models_not_blocked_by_slow_fetch(self, mock_fetch, mock_save):
+        def slow_fetch(start_date, end_date, **kwargs):
+            time.sleep(1.0)
+            return pd.DataFrame()
+
+        mock_fetch.side_effect = slow_fetch
+        mock_save.return_value = "0 enregistrements ajoutés à la base de données"
+
+        with TestClient(app) as client:
+            request_data = {"start_date": "2023-01-01", "end_date": "2023-01-02"}
+            slow_call = threading.Thread(
+                target=client.post, args=("/fetch_data",), kwargs={"json": request_data}
+            )
+            slow_call.start()
+            time.sleep(0.2)
+
+            start = time.perf_counter()
+            response = client.get("/models")
+            elapsed = time.perf_counter() - start
+
+            slow_call.join()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(elapsed, 0.5)
+
+    def test_model_cache_endpoint(self):
+        response = self.client.get("/models/cache")
+
+        self.assertEqual(response.status_code, 200)
+        for key in ["hits", "misses", "resident_bytes", "total_load_seconds"]:
+            self.assertIn(key, response.json())
+
+    def test_archive_cache_endpoint(self):
+        response = self.client.get("/archive/cache")
+
+        self.assertEqual(response.status_code, 200)
+        for key in ["hits", "misses", "hit_rate", "bypassed", "size_bytes"]:
+            self.assertIn(key, response.json())
+
+    def test_classify_text_endpoint(self):
+        batches = []
+
+        def predict_proba(captions):
+            batches.append(len(captions))
+            scores = np.full((len(captions), 18), 0.1)
+            scores[:, 0] = 0.9
+            return scores
+
+        batcher = MicroBatcher(predict_proba, max_batch_size=64, max_wait=0.001)
+        with patch("api.main.get_text_batcher", return_value=batcher):
+            response = self.client.post(
+                "/classify/text",
+                json={"captions": ["a man riding a horse", "a dog"], "threshold": 0.5},
+            )
+            stats = self.client.get("/classify/text/stats").json()
+        batcher.close()
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0]["labels"], [1])
+        self.assertEqual(len(results[0]["scores"]), 18)
+        self.assertNotIn("12", results[0]["scores"])
+        self.assertEqual(batches, [2])
+        self.assertEqual(stats["items"], 2)
+
+    @patch(
+        "api.main.get_text_batcher",
+        side_effect=FileNotFoundError("Embeddings GloVe introuvables"),
+    )
+    def test_classify_text_without_glove(self, mock_batcher):
+        response = self.client.post("/classify/text", json={"captions": ["a dog"]})
+
+        self.assertIn("error", response.json())
+
+    def test_classify_fusion_endpoint(self):
+        response = self.client.post(
+            "/classify/fusion",
+            json={"image_ids": ["1.jpg", "unknown.jpg"], "text_weight": 1.0},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        known, unknown = response.json()
+        self.assertEqual(known["image_id"], "1.jpg")
+        self.assertEqual(len(known["scores"]), 18)
+        self.assertIn(1, known["labels"])
+        self.assertIn("error", unknown)
+
+        response = self.client.post(
+            "/classify/fusion", json={"image_ids": ["1.jpg"], "mode": "vote"}
+        )
+        self.assertIn("error", response.json())
+
+    def test_fusion_evaluate_endpoint(self):
+        response = self.client.get("/fusion/evaluate?split=val&text_weight=0.7")
+
+        self.assertEqual(response.status_code, 200)
+        evaluation = response.json()
+        self.assertEqual(evaluation["rows"], 4501)
+        for source in ["text", "image", "fusion"]:
+            self.assertGreater(evaluation["scores"][source]["micro_f1"], 0)
+        self.assertIn("best_text_weight", evaluation)
+
+        self.assertIn("error", self.client.get("/fusion/evaluate?split=dev").json())
+
+    def test_similar_endpoint(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, patch(
+            "model.similarity_index.SIMILARITY_INDEX_DIR", tmp_dir
+        ), patch.dict("model.similarity_index._indexes", clear=True):
+            exact = self.client.post(
+                "/similar", json={"image_id": "1.jpg", "split": "test", "k": 5}
+            ).json()
+            ivf = self.client.post(
+                "/similar",
+                json={
+                    "image_id": "1.jpg",
+                    "split": "test",
+                    "k": 5,
+                    "index": "ivf",
+                    "n_probe": 100,
+                },
+            ).json()
+            version = current_version(os.path.join(tmp_dir, "test_text_ivf"))
+            self.assertTrue(os.path.exists(os.path.join(version, "vectors.npy")))
+
+        self.assertEqual(len(exact["results"]), 5)
+        self.assertNotIn("1.jpg", [r["image_id"] for r in exact["results"]])
+        scores = [r["score"] for r in exact["results"]]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertEqual(
+            [r["score"] for r in ivf["results"]],
+            pytest.approx(scores, abs=1e-6),
+        )
+
+        self.assertIn("error", self.client.post("/similar", json={}).json())
+        for options in [{"k": 0}, {"k": -3}, {"index": "ivf", "n_probe": -1}]:
+            self.assertIn(
+                "error",
+                self.client.post(
+                    "/similar", json={"image_id": "1.jpg", **options}
+                ).json(),
+            )
+        self.assertIn(
+            "error", self.client.post("/similar", json={"image_id": "x.jpg"}).json()
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,8 +1,16 @@
+import asyncio
 import unittest
 import pandas as pd
 import numpy as np
 import os
+import joblib
+import json
 import tempfile
+import threading
+import time
+import warnings
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
 from datetime import datetime, timedelta
 from unittest.mock import patch, MagicMock
 
@@ -17,12 +25,118 @@ from model.predict_series import (
     training_pipeline,
     predict,
     create_features,
+    save_predictions_to_db,
+    build_prediction_frame,
+    preprocess_data_pandas,
 )
-from data.data_ingestion import fetch_weather_data, save_weather_data_to_db
+from model.feature_engine import build_features, build_features_from_aggregates
+from model.incremental_features import IncrementalFeatureBuilder
+from model.micro_batch import MicroBatcher
+from model.feature_store import FeatureStore
+from model.similarity_index import (
+    ExactIndex,
+    IVFIndex,
+    current_version,
+    get_similarity_index,
+    normalize,
+    save_index,
+    top_k,
+)
+from model.fusion import (
+    ConcatHead,
+    FusionEngine,
+    evaluate_split,
+    f1_scores,
+    load_concat_head,
+    search_text_weight,
+    train_concat_head,
+    weighted_average,
+)
+from model.text_classification import (
+    TEXT_LABELS,
+    TextClassifier,
+    load_glove,
+    preprocess_caption,
+    _nltk_tools,
+)
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from data.db_init import Base
+from data.db_class import RealTemperature, RealTemperature3h, Prediction
+from data.db_migrate import migrate_database, needs_migration
+from data.image_labels import (
+    check_labels,
+    load_labels,
+    parse_label_strings,
+    read_train_labels,
+)
+from data.data_access import (
+    load_real_temperature,
+    load_aggregates_3h,
+    load_aggregates_daily,
+    prediction_metrics,
+    load_predictions_page,
+    iter_prediction_frames,
+    list_locations,
+    PREDICTION_DTYPES,
+)
+from data.aggregates import needs_rebuild, rebuild_aggregates
+from data.db_bulk import frame_to_records
+from api.formats import negotiate, frames_response, json_response, orjson, pa
+from data.data_ingestion import (
+    fetch_weather_data,
+    fetch_locations_weather,
+    save_weather_data_to_db,
+    bulk_save_weather_data,
+)
+from data.archive_cache import ArchiveCache
+from data.weather_backfill import split_date_range, backfill_weather_data
+from data.backfill_jobs import submit_backfill_job, get_backfill_job
+from model.model_cache import ModelCache
+from model.artifacts import (
+    CompactForest,
+    CompiledForest,
+    compile_model,
+    float32_thresholds,
+    save_artifact,
+    load_artifact,
+    describe_artifact,
+    model_nbytes,
+)
+from sklearn.ensemble import RandomForestRegressor
+from model.training_jobs import (
+    JOB_QUEUED,
+    JOB_RUNNING,
+    JOB_DONE,
+    JOB_FAILED,
+    create_training_job,
+    get_training_job,
+    update_training_job,
+    run_training_job,
+    recover_training_jobs,
+    get_executor,
+    shutdown_executor,
+)
+from model.predict_series import train_model, predict_models, save_batch_predictions
+from data.db_class import Model
+
+
+def use_temporary_archive_cache(test):
+    """Remplace le cache disque de l'API d'archive par un cache temporaire."""
+    tmp_dir = tempfile.TemporaryDirectory()
+    test.addCleanup(tmp_dir.cleanup)
+    cache = ArchiveCache(cache_dir=tmp_dir.name, enabled=True)
+    patcher = patch("data.archive_cache.archive_cache", cache)
+    patcher.start()
+    test.addCleanup(patcher.stop)
+    return cache
 
 
 class TestDataIngestion(unittest.TestCase):
 
+    def setUp(self):
+        self.archive_cache = use_temporary_archive_cache(self)
+
     @patch("data.data_ingestion.requests.get")
     def test_fetch_weather_data_success(self, mock_get):
         mock_response = MagicMock()
@@ -62,6 +176,104 @@ class TestDataIngestion(unittest.TestCase):
         with self.assertRaises(Exception):
             fetch_weather_data("invalid_date", "2023-01-01")
 
+    @patch("data.data_ingestion.requests.get")
+    def test_fetch_weather_data_uses_archive_cache(self, mock_get):
+        def archive_response(url, params):
+            times = pd.date_range(
+                params["start_date"],
+                pd.Timestamp(params["end_date"]) + pd.Timedelta(hours=23),
+                freq="h",
+            )
+            response = MagicMock()
+            response.json.return_value = {
+                "hourly": {
+                    "time": times.strftime("%Y-%m-%dT%H:%M").tolist(),
+                    "temperature_2m": [12.5] * len(times),
+                    "relative_humidity_2m": [80] * len(times),
+                    "precipitation": [0.0] * len(times),
+                    "surface_pressure": [1013.0] * len(times),
+                }
+            }
+            return response
+
+        mock_get.side_effect = archive_response
+
+        first = fetch_weather_data("2023-01-10", "2023-02-05")
+        # Les mois manquants consécutifs sont demandés en une requête, aux bornes des mois
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(
+            mock_get.call_args.kwargs["params"]["start_date"], "2023-01-01"
+        )
+        self.assertEqual(mock_get.call_args.kwargs["params"]["end_date"], "2023-02-28")
+
+        second = fetch_weather_data("2023-01-20", "2023-01-25")
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(len(first), 27 * 24)
+        self.assertEqual(len(second), 6 * 24)
+        self.assertEqual(second["timestamp"].iloc[0], pd.Timestamp("2023-01-20"))
+
+        stats = self.archive_cache.stats()
+        self.assertEqual(stats["entries"], 2)
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 2)
+
+        fetch_weather_data("2023-01-20", "2023-01-25", use_cache=False)
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(self.archive_cache.stats()["bypassed"], 1)
+
+    @patch("data.data_ingestion.requests.get")
+    def test_fetch_locations_weather(self, mock_get):
+        def archive_response(url, params):
+            response = MagicMock()
+            response.json.return_value = {
+                "hourly": {
+                    "time": ["2023-01-01T00:00", "2023-01-01T01:00"],
+                    "temperature_2m": [params["latitude"]] * 2,
+                    "relative_humidity_2m": [80] * 2,
+                    "precipitation": [0.0] * 2,
+                    "surface_pressure": [1013.0] * 2,
+                }
+            }
+            return response
+
+        mock_get.side_effect = archive_response
+
+        frames = fetch_locations_weather(
+            [(48.8566, 2.3522), (45.764043, 4.835659), (48.85661, 2.35219)],
+            "2023-01-01",
+            "2023-01-01",
+            use_cache=False,
+            max_workers=4,
+        )
+
+        # Coordonnées arrondies : le 3e site est le même que le premier
+        self.assertEqual(list(frames), [(48.8566, 2.3522), (45.764, 4.8357)])
+        self.assertEqual(mock_get.call_count, 2)
+        lyon = frames[(45.764, 4.8357)]
+        self.assertEqual(lyon["temperature_2m"].tolist(), [45.764, 45.764])
+        self.assertTrue((lyon["longitude"] == 4.8357).all())
+
+    def test_archive_cache_eviction(self):
+        hourly = {
+            "time": ["2023-01-01T00:00"] * 1000,
+            "temperature_2m": np.arange(1000.0),
+        }
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = ArchiveCache(cache_dir=tmp_dir, max_bytes=10**9)
+            cache.put("a" * 64, hourly, ["temperature_2m"])
+            entry_size = cache.stats()["size_bytes"]
+
+            cache = ArchiveCache(cache_dir=tmp_dir, max_bytes=int(entry_size * 2.5))
+            cache.put("b" * 64, hourly, ["temperature_2m"])
+            os.utime(cache._path("a" * 64), (0, 0))
+            cache.put("c" * 64, hourly, ["temperature_2m"])
+
+            self.assertIsNone(cache.get("a" * 64, ["temperature_2m"]))
+            self.assertEqual(
+                cache.get("c" * 64, ["temperature_2m"])["temperature_2m"][999], 999.0
+            )
+            self.assertEqual(cache.stats()["evictions"], 1)
+
     @patch("data.data_ingestion.get_engine")
     def test_save_weather_data_to_db(self, mock_get_engine):
         df = pd.DataFrame(
@@ -88,6 +300,601 @@ class TestDataIngestion(unittest.TestCase):
         self.assertTrue(mock_session.add.called)
         self.assertTrue(mock_session.commit.called)
 
+    def test_bulk_save_weather_data_counts(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+
+        df = pd.DataFrame(
+            {
+                "timestamp": pd.date_range(start="2023-01-01", periods=10, freq="h"),
+                "temperature_2m": np.linspace(5, 10, 10),
+                "relative_humidity": [75] * 10,
+                "precipitation": [0.0] * 10,
+                "surface_pressure": [1010.0] * 10,
+                "latitude": [48.8566] * 10,
+                "longitude": [2.3522] * 10,
+            }
+        )
+
+        first = bulk_save_weather_data(df.iloc[:6], engine=engine)
+        second = bulk_save_weather_data(df, engine=engine, batch_size=3)
+
+        self.assertEqual(first, {"inserted": 6, "skipped": 0})
+        self.assertEqual(second, {"inserted": 4, "skipped": 6})
+
+        with engine.connect() as connection:
+            row = connection.execute(RealTemperature.__table__.select()).first()
+        self.assertEqual(row.timestamp, datetime(2023, 1, 1))
+        self.assertEqual(row.relative_humidity, 75.0)
+
+    def test_load_real_temperature(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+
+        df = pd.DataFrame(
+            {
+                "timestamp": pd.date_range(start="2023-01-01", periods=48, freq="h"),
+                "temperature_2m": np.arange(48, dtype=float),
+                "relative_humidity": [75] * 48,
+                "precipitation": [0.0] * 48,
+                "surface_pressure": [1010.0] * 48,
+                "latitude": [48.8566] * 48,
+                "longitude": [2.3522] * 48,
+            }
+        )
+        bulk_save_weather_data(df, engine=engine)
+
+        loaded = load_real_temperature(
+            pd.Timestamp("2023-01-01"), pd.Timestamp("2023-01-02"), engine=engine
+        )
+        chunked = load_real_temperature(
+            pd.Timestamp("2023-01-01"),
+            pd.Timestamp("2023-01-02"),
+            chunksize=5,
+            engine=engine,
+        )
+
+        self.assertEqual(len(loaded), 24)
+        self.assertEqual(loaded["timestamp"].iloc[0], pd.Timestamp("2023-01-01"))
+        self.assertEqual(loaded["relative_humidity"].dtype, np.float64)
+        pd.testing.assert_frame_equal(loaded, chunked)
+
+
+class TestAggregates(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=self.engine)
+
+        rows = 24 * 3
+        rng = np.random.default_rng(2)
+        self.df = pd.DataFrame(
+            {
+                "timestamp": pd.date_range(start="2023-01-01", periods=rows, freq="h"),
+                "temperature_2m": rng.normal(12, 6, rows),
+                "relative_humidity": rng.normal(75, 10, rows),
+                "precipitation": rng.exponential(0.5, rows),
+                "surface_pressure": rng.normal(1010, 5, rows),
+                "latitude": [48.8566] * rows,
+                "longitude": [2.3522] * rows,
+            }
+        )
+
+    def test_aggregates_updated_on_insert(self):
+        # Créneau 09h-12h du 2e jour coupé entre deux insertions
+        bulk_save_weather_data(self.df.iloc[:34], engine=self.engine)
+        bulk_save_weather_data(self.df.iloc[34:], engine=self.engine)
+
+        aggregates = load_aggregates_3h(engine=self.engine)
+        expected = (
+            self.df.set_index("timestamp")[
+                ["temperature_2m", "relative_humidity", "precipitation"]
+            ]
+            .resample("3h")
+            .mean()
+        )
+
+        self.assertEqual(len(aggregates), 24)
+        self.assertTrue((aggregates["n_observations"] == 3).all())
+        np.testing.assert_allclose(
+            aggregates["temperature_2m"], expected["temperature_2m"], rtol=1e-12
+        )
+        np.testing.assert_allclose(
+            aggregates["precipitation"], expected["precipitation"], rtol=1e-12
+        )
+
+        daily = load_aggregates_daily(engine=self.engine)
+        first_day = self.df.iloc[:24]
+        self.assertEqual(len(daily), 3)
+        self.assertEqual(
+            daily["temperature_2m_max"].iloc[0], first_day["temperature_2m"].max()
+        )
+        self.assertAlmostEqual(
+            daily["precipitation"].iloc[0], first_day["precipitation"].sum()
+        )
+
+    def test_features_from_aggregates_match_hourly(self):
+        bulk_save_weather_data(self.df, engine=self.engine)
+
+        X, y = build_features_from_aggregates(load_aggregates_3h(engine=self.engine))
+        X_ref, y_ref = build_features(load_real_temperature(engine=self.engine))
+
+        pd.testing.assert_frame_equal(X, X_ref, check_exact=True, check_freq=False)
+        pd.testing.assert_series_equal(y, y_ref, check_exact=True, check_freq=False)
+
+    def test_location_filters(self):
+        lyon = self.df.assign(latitude=45.764, longitude=4.8357, temperature_2m=5.0)
+        bulk_save_weather_data(pd.concat([self.df, lyon]), engine=self.engine)
+
+        paris = load_real_temperature(engine=self.engine, location=(48.8566, 2.3522))
+        self.assertEqual(len(paris), len(self.df))
+        self.assertTrue((paris["latitude"] == 48.8566).all())
+
+        aggregates = load_aggregates_3h(engine=self.engine, location=(45.764, 4.8357))
+        self.assertEqual(len(aggregates), 24)
+        self.assertTrue((aggregates["temperature_2m"] == 5.0).all())
+        self.assertEqual(
+            len(load_aggregates_daily(engine=self.engine, location=(45.764, 4.8357))),
+            3,
+        )
+
+        locations = list_locations(engine=self.engine)
+        self.assertEqual(
+            [(site["latitude"], site["observations"]) for site in locations],
+            [(45.764, 72), (48.8566, 72)],
+        )
+        self.assertEqual(locations[0]["start_date"], "2023-01-01 00:00:00")
+
+        # Requête d'un site : plage sur l'index (latitude, longitude, timestamp)
+        with self.engine.connect() as connection:
+            plan = connection.exec_driver_sql(
+                "EXPLAIN QUERY PLAN SELECT * FROM RealTemperature "
+                "WHERE latitude = 45.764 AND longitude = 4.8357 AND timestamp >= 0"
+            ).all()
+        self.assertIn("(latitude=? AND longitude=? AND timestamp>?)", plan[0][-1])
+
+    def test_rebuild_aggregates(self):
+        bulk_save_weather_data(self.df, engine=self.engine)
+        expected = load_aggregates_3h(engine=self.engine)
+
+        with self.engine.begin() as connection:
+            connection.execute(RealTemperature3h.__table__.delete())
+        self.assertTrue(needs_rebuild(self.engine))
+
+        rebuild_aggregates(self.engine, chunksize=10)
+
+        self.assertFalse(needs_rebuild(self.engine))
+        pd.testing.assert_frame_equal(load_aggregates_3h(engine=self.engine), expected)
+
+
+class ArchiveStub(BaseHTTPRequestHandler):
+    """Bouchon local de l'API d'archive Open-Meteo (données horaires générées)."""
+
+    requests_seen = []
+    # Réponses forcées par date de début : liste de codes HTTP consommés un à un
+    failures = {}
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        start_date = query["start_date"][0]
+        end_date = query["end_date"][0]
+        ArchiveStub.requests_seen.append(start_date)
+
+        codes = ArchiveStub.failures.get(start_date)
+        if codes:
+            self.send_response(codes.pop(0))
+            self.end_headers()
+            return
+
+        times = pd.date_range(
+            start_date, pd.Timestamp(end_date) + pd.Timedelta(hours=23), freq="h"
+        )
+        body = json.dumps(
+            {
+                "hourly": {
+                    "time": times.strftime("%Y-%m-%dT%H:%M").tolist(),
+                    "temperature_2m": [10.0] * len(times),
+                    "relative_humidity_2m": [80] * len(times),
+                    "precipitation": [0.0] * len(times),
+                    "surface_pressure": [1013.0] * len(times),
+                }
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestWeatherBackfill(unittest.TestCase):
+
+    def setUp(self):
+        self.archive_cache = use_temporary_archive_cache(self)
+        ArchiveStub.requests_seen = []
+        ArchiveStub.failures = {}
+        self.server = HTTPServer(("127.0.0.1", 0), ArchiveStub)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.api_url = f"http://127.0.0.1:{self.server.server_port}/v1/archive"
+
+        self.engine = create_engine(
+            "sqlite://",
+            poolclass=StaticPool,
+            connect_args={"check_same_thread": False},
+        )
+        Base.metadata.create_all(bind=self.engine)
+
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.checkpoint = os.path.join(tmp_dir.name, "backfill.json")
+
+    def backfill(self, **kwargs):
+        return backfill_weather_data(
+            "2023-01-15",
+            "2023-04-10",
+            max_workers=2,
+            backoff=0,
+            checkpoint_path=self.checkpoint,
+            api_url=self.api_url,
+            engine=self.engine,
+            **kwargs,
+        )
+
+    def test_split_date_range(self):
+        self.assertEqual(
+            split_date_range("2023-01-15", "2023-03-10"),
+            [
+                ("2023-01-15", "2023-01-31"),
+                ("2023-02-01", "2023-02-28"),
+                ("2023-03-01", "2023-03-10"),
+            ],
+        )
+        self.assertEqual(
+            split_date_range("2022-06-01", "2023-02-01", chunk="year"),
+            [("2022-06-01", "2022-12-31"), ("2023-01-01", "2023-02-01")],
+        )
+
+    def test_backfill_retries_and_saves_chunks(self):
+        # Deux erreurs temporaires sur février : réessayées par la session
+        ArchiveStub.failures = {"2023-02-01": [503, 429]}
+
+        report = self.backfill()
+
+        days = (pd.Timestamp("2023-04-10") - pd.Timestamp("2023-01-15")).days + 1
+        self.assertEqual(report["chunks"], 4)
+        self.assertEqual(report["completed"], 4)
+        self.assertEqual(report["failed"], [])
+        self.assertEqual(report["inserted"], days * 24)
+        self.assertEqual(ArchiveStub.requests_seen.count("2023-02-01"), 3)
+        self.assertEqual(len(load_real_temperature(engine=self.engine)), days * 24)
+
+    def test_backfill_multiple_locations(self):
+        locations = [(48.8566, 2.3522), (45.764, 4.8357)]
+
+        report = self.backfill(locations=locations)
+
+        days = (pd.Timestamp("2023-04-10") - pd.Timestamp("2023-01-15")).days + 1
+        self.assertEqual(report["chunks"], 8)
+        self.assertEqual(report["completed"], 8)
+        self.assertEqual(report["inserted"], 2 * days * 24)
+        for location in locations:
+            self.assertEqual(
+                len(load_real_temperature(engine=self.engine, location=location)),
+                days * 24,
+            )
+
+        # Reprise : un site ajouté, seuls ses intervalles sont importés
+        report = self.backfill(locations=locations + [(43.6047, 1.4442)])
+        self.assertEqual(report["resumed"], 8)
+        self.assertEqual(report["completed"], 4)
+
+    def test_backfill_resumes_from_checkpoint(self):
+        # Erreur définitive sur mars : les autres intervalles sont enregistrés
+        ArchiveStub.failures = {"2023-03-01": [404]}
+        first = self.backfill()
+
+        self.assertEqual(first["completed"], 3)
+        self.assertEqual(first["failed"][0]["start_date"], "2023-03-01")
+
+        ArchiveStub.requests_seen = []
+        second = self.backfill()
+
+        self.assertEqual(second["resumed"], 3)
+        self.assertEqual(second["completed"], 1)
+        self.assertEqual(ArchiveStub.requests_seen, ["2023-03-01"])
+        self.assertEqual(second["skipped"], 0)
+
+    def test_backfill_stops_when_requested(self):
+        stop = threading.Event()
+        stop.set()
+
+        report = self.backfill(stop=stop)
+
+        self.assertEqual(report["chunks"], 4)
+        self.assertEqual(report["completed"], 0)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_backfill_job_progress_from_checkpoint(self):
+        started, release = threading.Event(), threading.Event()
+
+        def run(*args, **kwargs):
+            started.set()
+            release.wait(timeout=60)
+            return backfill_weather_data(
+                *args, api_url=self.api_url, engine=self.engine, backoff=0, **kwargs
+            )
+
+        with patch(
+            "data.backfill_jobs.backfill_weather_data", side_effect=run
+        ) as mock_run, patch("data.backfill_jobs.BACKFILL_MAX_WORKERS", 2):
+            # Parallélisme demandé borné par BACKFILL_MAX_WORKERS
+            job_id = submit_backfill_job(
+                "2023-01-15",
+                "2023-04-10",
+                max_workers=500,
+                checkpoint_path=self.checkpoint,
+            )
+            started.wait(timeout=60)
+            job = get_backfill_job(job_id)
+            self.assertEqual(job["status"], "running")
+            self.assertEqual(job["progress"], {"chunks": 4, "completed": 0})
+
+            release.set()
+            for _ in range(200):
+                job = get_backfill_job(job_id)
+                if job["status"] == "done":
+                    break
+                time.sleep(0.05)
+
+        self.assertEqual(job["progress"], {"chunks": 4, "completed": 4})
+        self.assertEqual(job["report"]["completed"], 4)
+        self.assertEqual(mock_run.call_args.kwargs["max_workers"], 2)
+        with self.assertRaises(ValueError):
+            submit_backfill_job("2023-01-15", "2023-04-10", chunk="week")
+
+    def test_backfill_reads_archive_cache(self):
+        self.backfill()
+        os.remove(self.checkpoint)
+        ArchiveStub.requests_seen = []
+
+        # Sans fichier de reprise, les mois terminés sont relus depuis le cache
+        report = self.backfill()
+
+        self.assertEqual(ArchiveStub.requests_seen, [])
+        self.assertEqual(report["completed"], 4)
+        self.assertEqual(report["inserted"], 0)
+
+
+class TestSchemaMigration(unittest.TestCase):
+
+    def test_migrate_legacy_tables(self):
+        engine = create_engine("sqlite://")
+        with engine.begin() as connection:
+            connection.exec_driver_sql(
+                "CREATE TABLE RealTemperature (id INTEGER PRIMARY KEY, "
+                "timestamp VARCHAR, temperature_2m VARCHAR, "
+                "relative_humidity VARCHAR, precipitation VARCHAR, "
+                "surface_pressure VARCHAR, latitude VARCHAR, longitude VARCHAR)"
+            )
+            connection.exec_driver_sql(
+                "INSERT INTO RealTemperature VALUES "
+                "(1, '2023-01-01 00:00:00', '10.5', '80.0', '0.0', '1010.0', "
+                "'48.8566', '2.3522'), "
+                "(2, '2023-01-01 01:00:00', 'nan', '81', '0.1', '1011', "
+                "'48.8566', '2.3522')"
+            )
+
+        self.assertTrue(needs_migration(engine))
+        report = migrate_database(engine)
+
+        self.assertEqual(report, {"RealTemperature": {"copied": 2, "dropped": 0}})
+        self.assertFalse(needs_migration(engine))
+        with engine.connect() as connection:
+            rows = connection.execute(RealTemperature.__table__.select()).fetchall()
+        self.assertEqual(rows[0].timestamp, datetime(2023, 1, 1))
+        self.assertEqual(rows[0].temperature_2m, 10.5)
+        self.assertIsNone(rows[1].temperature_2m)
+        self.assertEqual(rows[1].relative_humidity, 81.0)
+
+    def test_migrate_adds_model_columns(self):
+        engine = create_engine("sqlite://")
+        with engine.begin() as connection:
+            connection.exec_driver_sql(
+                "CREATE TABLE Model (id INTEGER PRIMARY KEY, name VARCHAR, "
+                "version VARCHAR, created_at VARCHAR, path VARCHAR)"
+            )
+            connection.exec_driver_sql(
+                "INSERT INTO Model VALUES (1, 'RandomForestRegressor', '1.0.0', "
+                "'2023-01-01 00:00:00', 'model/registry/model1.0.0.pkl')"
+            )
+
+        report = migrate_database(engine)
+
+        self.assertIn("fit_seconds", report["Model"]["added_columns"])
+        with engine.connect() as connection:
+            row = connection.execute(Model.__table__.select()).one()
+        self.assertEqual(row.version, "1.0.0")
+        self.assertIsNone(row.backend)
+
+
+class TestPredictionQueries(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=self.engine)
+        rng = np.random.default_rng(0)
+        self.frames = {}
+        for model_id in (1, 2):
+            frame = pd.DataFrame(
+                {
+                    "timestamp": pd.date_range("2023-01-01", periods=40, freq="3h"),
+                    "prediction": rng.normal(10, 2, 40),
+                    "real": rng.normal(10, 2, 40),
+                    "relative_humidity": 80.0,
+                    "precipitation": 0.0,
+                    "surface_pressure": 1010.0,
+                    "latitude": 48.8566,
+                    "longitude": 2.3522,
+                }
+            )
+            frame.loc[::10, "real"] = np.nan
+            save_predictions_to_db(frame, model_id, engine=self.engine)
+            self.frames[model_id] = frame
+        self.window = (pd.Timestamp("2023-01-01"), pd.Timestamp("2023-01-06"))
+
+    def test_metrics_computed_in_sql(self):
+        frame = self.frames[1]
+        frame = frame[frame["timestamp"] < self.window[1]].dropna(subset=["real"])
+        error = frame["prediction"] - frame["real"]
+
+        (metrics,) = prediction_metrics(*self.window, model_id=1, engine=self.engine)
+        self.assertEqual(metrics["paired_count"], len(frame))
+        self.assertAlmostEqual(metrics["rmse"], np.sqrt((error**2).mean()))
+        self.assertAlmostEqual(metrics["mae"], error.abs().mean())
+
+        by_model = prediction_metrics(
+            *self.window, group_by_model=True, engine=self.engine
+        )
+        self.assertEqual([m["model_id"] for m in by_model], [1, 2])
+        self.assertEqual(by_model[0]["count"], metrics["count"])
+
+    def test_keyset_pages_and_projection(self):
+        first, cursor = load_predictions_page(
+            *self.window,
+            fields=["timestamp", "valeur_prevue"],
+            limit=15,
+            engine=self.engine,
+        )
+        self.assertEqual(len(first), 15)
+        self.assertEqual(list(first[0]), ["timestamp", "valeur_prevue"])
+        self.assertEqual(first[0]["timestamp"], "2023-01-01T00:00:00")
+        self.assertEqual(first[0]["valeur_prevue"], self.frames[1]["prediction"][0])
+
+        frames = list(
+            iter_prediction_frames(
+                *self.window, cursor=cursor, chunksize=7, engine=self.engine
+            )
+        )
+        self.assertEqual(len(frames[0]), 7)
+        rest = frame_to_records(pd.concat(frames, ignore_index=True))
+        (metrics,) = prediction_metrics(*self.window, engine=self.engine)
+        self.assertEqual(len(first) + len(rest), metrics["count"])
+        # 21e prédiction du modèle 1 : valeur réelle manquante (NaN -> null)
+        self.assertIsNone(rest[5]["valeur_reelle"])
+        ids = [record["id"] for record in rest]
+        self.assertEqual(ids, sorted(ids))
+        self.assertGreater(ids[0], cursor)
+
+    @unittest.skipIf(pa is None, "pyarrow non installé")
+    def test_arrow_stream_with_empty_first_page(self):
+        # Modèle 3 : aucune valeur réelle sur la première page du flux
+        frame = self.frames[1].copy()
+        frame.loc[:9, "real"] = np.nan
+        save_predictions_to_db(frame, 3, engine=self.engine)
+
+        # Lecture ici : la base en mémoire n'est pas visible du thread du flux
+        frames = list(
+            iter_prediction_frames(
+                *self.window, 3, chunksize=10, engine=self.engine, iso_timestamps=False
+            )
+        )
+        self.assertTrue(frames[0]["valeur_reelle"].isna().all())
+        response = frames_response(iter(frames), "arrow", PREDICTION_DTYPES)
+
+        async def read():
+            return b"".join([chunk async for chunk in response.body_iterator])
+
+        table = pa.ipc.open_stream(asyncio.run(read())).read_all()
+        self.assertEqual(table.schema.field("valeur_reelle").type, pa.float64())
+        self.assertEqual(table.schema.field("timestamp").type, pa.timestamp("ns"))
+        real = table.column("valeur_reelle").to_pandas()
+        self.assertTrue(real[:10].isna().all())
+        self.assertEqual(real[11], frame["real"][11])
+
+
+class TestResponseFormats(unittest.TestCase):
+
+    def setUp(self):
+        self.frame = pd.DataFrame(
+            {
+                "timestamp": pd.date_range("2023-01-01", periods=4, freq="3h"),
+                "prediction": [20.5, np.nan, 19.25, 18.0],
+                "model_id": [1, 1, 2, 2],
+            }
+        )
+
+    def body(self, response_format):
+        response = frames_response(
+            iter([self.frame.iloc[:2], self.frame.iloc[2:]]), response_format
+        )
+
+        async def read():
+            return b"".join([chunk async for chunk in response.body_iterator])
+
+        return asyncio.run(read())
+
+    def test_negotiate(self):
+        self.assertEqual(negotiate(None), "json")
+        self.assertEqual(negotiate("*/*"), "json")
+        self.assertEqual(negotiate("application/x-ndjson, */*;q=0.1"), "ndjson")
+        self.assertEqual(negotiate("text/html;q=0.9, application/json"), "json")
+        self.assertEqual(negotiate("application/json", requested="ndjson"), "ndjson")
+        self.assertIsNone(negotiate("text/html"))
+        columnar = "parquet" if pa is not None else None
+        self.assertEqual(negotiate("application/vnd.apache.parquet"), columnar)
+
+    def test_json_chunks(self):
+        records = json.loads(self.body("json"))
+        self.assertEqual(len(records), 4)
+        self.assertEqual(records[0]["timestamp"], "2023-01-01T00:00:00")
+        self.assertIsNone(records[1]["prediction"])
+        self.assertEqual(records[2]["prediction"], 19.25)
+
+        lines = self.body("ndjson").decode().splitlines()
+        self.assertEqual(json.loads(lines[3])["timestamp"], "2023-01-01T09:00:00")
+
+    def test_json_response(self):
+        content = {
+            "rmse": np.float64(1.5),
+            "predictions": [{"id": 1, "valeur_reelle": None}],
+            "created_at": datetime(2023, 1, 1, 12),
+        }
+        response = json_response(content)
+
+        self.assertEqual(response.media_type, "application/json")
+        self.assertEqual(
+            json.loads(response.body),
+            {
+                "rmse": 1.5,
+                "predictions": [{"id": 1, "valeur_reelle": None}],
+                "created_at": "2023-01-01T12:00:00",
+            },
+        )
+        if orjson is not None:
+            self.assertEqual(
+                response.body,
+                orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY),
+            )
+
+    @unittest.skipIf(pa is None, "pyarrow non installé")
+    def test_columnar_streams(self):
+        import io
+        import pyarrow.parquet as pq
+
+        table = pa.ipc.open_stream(self.body("arrow")).read_all()
+        pd.testing.assert_frame_equal(table.to_pandas(), self.frame, check_dtype=False)
+
+        table = pq.read_table(io.BytesIO(self.body("parquet")))
+        self.assertEqual(table.num_rows, 4)
+        self.assertEqual(
+            pq.ParquetFile(io.BytesIO(self.body("parquet"))).num_row_groups, 2
+        )
+
 
 class TestPredictSeries(unittest.TestCase):
 
@@ -164,6 +971,53 @@ class TestPredictSeries(unittest.TestCase):
                         self.assertTrue(mock_session.commit.called)
                         self.assertTrue(result)
 
+    def test_predict_models_shares_features(self):
+        rows = 24 * 10
+        df = pd.DataFrame(
+            {
+                "timestamp": pd.date_range(start="2023-01-01", periods=rows, freq="h"),
+                "temperature_2m": np.random.normal(12, 6, rows),
+                "relative_humidity": np.random.normal(75, 10, rows),
+                "precipitation": np.random.exponential(0.5, rows),
+                "surface_pressure": np.random.normal(1010, 5, rows),
+                "latitude": [48.8566] * rows,
+                "longitude": [2.3522] * rows,
+            }
+        )
+        X, y = build_features(df)
+
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        models = []
+        for model_id, seed in ((1, 0), (2, 1)):
+            path = os.path.join(tmp_dir.name, f"model{model_id}.pkl")
+            joblib.dump(
+                RandomForestRegressor(n_estimators=5, random_state=seed).fit(X, y),
+                path,
+            )
+            models.append((model_id, path, None))
+
+        with patch(
+            "model.predict_series.preprocess_data", wraps=preprocess_data
+        ) as mock_preprocess:
+            results = predict_models(models, df)
+
+        mock_preprocess.assert_called_once()
+        self.assertEqual(list(results), [1, 2])
+        for model_id, path, _ in models:
+            expected = predict(path, df, model_id=model_id, persist=False)
+            pd.testing.assert_frame_equal(
+                results[model_id].drop(columns="created_at"),
+                expected.drop(columns="created_at"),
+            )
+
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        counts = save_batch_predictions(
+            [(results[1], 1), (results[2], 2), (pd.DataFrame(), 3)], engine=engine
+        )
+        self.assertEqual(counts, {"inserted": 2 * len(X), "skipped": 0})
+
     @patch("model.predict_series.joblib.load")
     def test_predict(self, mock_load):
         mock_model = MagicMock()
@@ -206,6 +1060,1022 @@ class TestPredictSeries(unittest.TestCase):
                         self.assertIn("prediction", results.columns)
                         self.assertEqual(len(results), 2)  # 2 prédictions
 
+    def test_feature_engine_matches_pandas(self):
+        rng = np.random.default_rng(0)
+        rows = 24 * 30
+        df = pd.DataFrame(
+            {
+                "timestamp": pd.date_range(start="2023-01-01", periods=rows, freq="h"),
+                "temperature_2m": rng.normal(12, 6, rows),
+                "relative_humidity": rng.normal(75, 10, rows),
+                "precipitation": rng.exponential(0.5, rows),
+                "surface_pressure": rng.normal(1010, 5, rows),
+            }
+        )
+        df.loc[[5, 6, 7, 300], "temperature_2m"] = np.nan
+        # Relevés non triés : l'agrégation 3h ne dépend pas de l'ordre
+        df = df.sample(frac=1, random_state=0)
+
+        X_ref, y_ref = preprocess_data_pandas(df)
+        X, y = build_features(df)
+
+        self.assertEqual(list(X.columns), list(X_ref.columns))
+        self.assertEqual(len(X), len(X_ref))
+        pd.testing.assert_series_equal(y, y_ref, check_exact=True, check_freq=False)
+        pd.testing.assert_frame_equal(
+            X, X_ref, check_exact=False, rtol=1e-12, atol=1e-12, check_freq=False
+        )
+
+        X32, _ = build_features(df, dtype=np.float32)
+        self.assertEqual(X32["temp_lag_1"].dtype, np.float32)
+        self.assertEqual(X32["hour"].dtype, X_ref["hour"].dtype)
+
+    def test_incremental_features_match_batch(self):
+        rng = np.random.default_rng(1)
+        rows = 24 * 20
+        df = pd.DataFrame(
+            {
+                "timestamp": pd.date_range(start="2023-01-01", periods=rows, freq="h"),
+                "temperature_2m": rng.normal(12, 6, rows),
+                "relative_humidity": rng.normal(75, 10, rows),
+                "precipitation": rng.exponential(0.5, rows),
+                "surface_pressure": rng.normal(1010, 5, rows),
+            }
+        )
+        df.loc[[100, 250], "temperature_2m"] = np.nan
+        X_ref, y_ref = build_features(df)
+
+        # Flux découpé arbitrairement, avec sauvegarde/restauration de l'état
+        builder = IncrementalFeatureBuilder()
+        X_parts, y_parts = [], []
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "stream.json")
+            for start in range(0, rows, 7):
+                X_new, y_new = builder.update(df.iloc[start : start + 7])
+                X_parts.append(X_new)
+                y_parts.append(y_new)
+                builder.save(path)
+                builder = IncrementalFeatureBuilder.load(path)
+
+        pd.testing.assert_frame_equal(
+            pd.concat(X_parts), X_ref, check_exact=True, check_freq=False
+        )
+        pd.testing.assert_series_equal(
+            pd.concat(y_parts), y_ref, check_exact=True, check_freq=False
+        )
+
+        with self.assertRaises(ValueError):
+            builder.update(df.iloc[:1])
+
+    def test_build_prediction_frame(self):
+        index = pd.date_range(start="2023-01-01", periods=3, freq="3h")
+        X = pd.DataFrame(
+            {
+                "hour": [0, 3, 6],
+                "relative_humidity": [80.0, 75.0, 70.0],
+                "precipitation": [0.1, 0.0, 0.2],
+                "surface_pressure": [1010.0, 1012.0, 1015.0],
+            },
+            index=index,
+        )
+        y = pd.Series([20.0, 21.0, 22.0], index=index)
+
+        results = build_prediction_frame(
+            X, y, np.array([20.5, 21.0, 21.5]), np.float64(48.8566), np.float64(2.3522)
+        )
+
+        self.assertEqual(
+            list(results.columns),
+            [
+                "prediction",
+                "timestamp",
+                "created_at",
+                "relative_humidity",
+                "precipitation",
+                "surface_pressure",
+                "latitude",
+                "longitude",
+                "real",
+            ],
+        )
+        self.assertEqual(results["timestamp"].iloc[2], pd.Timestamp("2023-01-01 06:00"))
+        self.assertEqual(results["created_at"].nunique(), 1)
+        self.assertEqual(results["real"].tolist(), [20.0, 21.0, 22.0])
+        self.assertEqual(results["latitude"].dtype, np.float64)
+
+        # Sans coordonnées, ni cible alignée : colonnes à None, pas de "real"
+        partial = build_prediction_frame(X, y.iloc[:1], np.zeros(3), None, None)
+        self.assertTrue(partial["latitude"].isna().all())
+        self.assertNotIn("real", partial.columns)
+        self.assertTrue(build_prediction_frame(X, y, np.array([]), None, None).empty)
+
+    def test_save_predictions_to_db(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+
+        result_df = pd.DataFrame(
+            {
+                "prediction": [20.5, 21.0, 21.5],
+                "timestamp": pd.date_range(start="2023-01-01", periods=3, freq="3h"),
+                "created_at": ["2023-01-02 00:00:00"] * 3,
+                "relative_humidity": [80.0, 75.0, 70.0],
+                "precipitation": [0.1, 0.0, 0.2],
+                "surface_pressure": [1010.0, 1012.0, 1015.0],
+                "latitude": [48.8566] * 3,
+                "longitude": [2.3522] * 3,
+                "real": [20.0, 21.0, 22.0],
+            }
+        )
+
+        first = save_predictions_to_db(result_df.iloc[:2], 1, engine=engine)
+        second = save_predictions_to_db(result_df, 1, engine=engine)
+
+        self.assertEqual(first, {"inserted": 2, "skipped": 0})
+        self.assertEqual(second, {"inserted": 1, "skipped": 2})
+
+        with engine.connect() as connection:
+            rows = connection.execute(Prediction.__table__.select()).fetchall()
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0].timestamp, datetime(2023, 1, 1))
+        self.assertEqual(rows[0].prediction, 20.5)
+
+
+class TestTrainingJobs(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine(
+            "sqlite://",
+            poolclass=StaticPool,
+            connect_args={"check_same_thread": False},
+        )
+        Base.metadata.create_all(bind=self.engine)
+        patcher = patch("model.training_jobs.get_engine", return_value=self.engine)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch("model.training_jobs.TRAINING_SOURCE", "hourly")
+    @patch("model.training_jobs.get_model_id", return_value=3)
+    @patch("model.training_jobs.train_model", return_value="model/registry/m.pkl")
+    @patch("model.training_jobs.preprocess_data")
+    @patch("model.training_jobs.load_real_temperature")
+    def test_run_training_job_success(
+        self, mock_load, mock_preprocess, mock_train, mock_model_id
+    ):
+        mock_load.return_value = pd.DataFrame({"temperature_2m": [20.0]})
+        mock_preprocess.return_value = (pd.DataFrame(), pd.Series(dtype=float))
+
+        job_id = create_training_job("1.0.0", "2023-01-01", "2023-01-31")
+        self.assertEqual(get_training_job(job_id)["status"], JOB_QUEUED)
+
+        run_training_job(job_id)
+
+        job = get_training_job(job_id)
+        self.assertEqual(job["status"], JOB_DONE)
+        self.assertEqual(job["model_id"], 3)
+        self.assertIsNotNone(job["finished_at"])
+        self.assertEqual(mock_load.call_args.args[0], pd.Timestamp("2023-01-01"))
+
+    @patch("model.training_jobs.TRAINING_SOURCE", "hourly")
+    @patch("model.training_jobs.load_real_temperature")
+    def test_run_training_job_without_data(self, mock_load):
+        mock_load.return_value = pd.DataFrame()
+
+        job_id = create_training_job("1.0.0")
+        run_training_job(job_id)
+
+        job = get_training_job(job_id)
+        self.assertEqual(job["status"], JOB_FAILED)
+        self.assertIn("Aucune donnée", job["message"])
+
+    @patch("model.training_jobs.get_model_id", return_value=3)
+    @patch("model.training_jobs.train_model", return_value="model/registry/m.pkl")
+    def test_run_training_job_from_aggregates(self, mock_train, mock_model_id):
+        rows = 24 * 10
+        df = pd.DataFrame(
+            {
+                "timestamp": pd.date_range(start="2023-01-01", periods=rows, freq="h"),
+                "temperature_2m": np.random.normal(12, 6, rows),
+                "relative_humidity": np.random.normal(75, 10, rows),
+                "precipitation": np.random.exponential(0.5, rows),
+                "surface_pressure": np.random.normal(1010, 5, rows),
+                "latitude": [48.8566] * rows,
+                "longitude": [2.3522] * rows,
+            }
+        )
+        bulk_save_weather_data(df, engine=self.engine)
+
+        job_id = create_training_job("1.0.0", "2023-01-01", "2023-01-08")
+        with patch("data.data_access.get_engine", return_value=self.engine):
+            run_training_job(job_id)
+
+        self.assertEqual(get_training_job(job_id)["status"], JOB_DONE)
+        X, y = mock_train.call_args.args[:2]
+        X_ref, y_ref = build_features(df[df["timestamp"] < "2023-01-08"])
+        pd.testing.assert_frame_equal(X, X_ref, check_freq=False)
+        pd.testing.assert_series_equal(y, y_ref, check_freq=False)
+
+    @patch("model.training_jobs.TRAINING_CORES_PER_WORKER", 4)
+    @patch("model.training_jobs.TRAINING_SOURCE", "hourly")
+    @patch("model.training_jobs.get_model_id", return_value=3)
+    @patch("model.training_jobs.train_model", return_value="model/registry/m.pkl")
+    @patch("model.training_jobs.preprocess_data")
+    @patch("model.training_jobs.load_real_temperature")
+    def test_run_training_job_options(
+        self, mock_load, mock_preprocess, mock_train, mock_model_id
+    ):
+        mock_load.return_value = pd.DataFrame({"temperature_2m": [20.0]})
+        mock_preprocess.return_value = (pd.DataFrame(), pd.Series(dtype=float))
+
+        options = {"backend": "hist_gradient_boosting", "n_jobs": 2}
+        job_id = create_training_job("1.0.0", options=options)
+        self.assertEqual(get_training_job(job_id)["options"], options)
+
+        run_training_job(job_id)
+
+        self.assertEqual(mock_train.call_args.kwargs, options)
+
+    @patch("model.training_jobs.get_model_id", return_value=3)
+    @patch("model.training_jobs.train_model", return_value="model/registry/m.pkl")
+    @patch("model.training_jobs.build_features_from_aggregates")
+    @patch("model.training_jobs.load_aggregates_3h")
+    def test_run_training_job_location(
+        self, mock_load, mock_features, mock_train, mock_model_id
+    ):
+        mock_load.return_value = pd.DataFrame({"temperature_2m": [20.0]})
+        mock_features.return_value = (pd.DataFrame(), pd.Series(dtype=float))
+
+        job_id = create_training_job("1.0.0", options={"location": [45.764, 4.8357]})
+        run_training_job(job_id)
+
+        self.assertEqual(mock_load.call_args.kwargs["location"], (45.764, 4.8357))
+        self.assertEqual(mock_train.call_args.kwargs["location"], [45.764, 4.8357])
+
+    @patch("model.training_jobs.get_model_id", return_value=3)
+    @patch("model.training_jobs.train_model", return_value="model/registry/m.pkl")
+    @patch("model.training_jobs.load_aggregates_3h")
+    def test_run_training_job_all_sites(self, mock_load, mock_train, mock_model_id):
+        # Deux sites entrelacés dans l'ordre des timestamps, comme load_aggregates_3h
+        slots = 30
+        timestamps = pd.date_range(start="2023-01-01", periods=slots, freq="3h")
+        sites = [
+            pd.DataFrame(
+                {
+                    "timestamp": timestamps,
+                    "temperature_2m": temperature,
+                    "relative_humidity": 70.0,
+                    "precipitation": 0.0,
+                    "surface_pressure": 1010.0,
+                    "latitude": latitude,
+                    "longitude": 2.0,
+                }
+            )
+            for latitude, temperature in [(45.0, 10.0), (48.0, 30.0)]
+        ]
+        mock_load.return_value = (
+            pd.concat(sites).sort_values("timestamp", kind="stable").reset_index()
+        )
+
+        run_training_job(create_training_job("1.0.0"))
+
+        X, y = mock_train.call_args.args[:2]
+        self.assertEqual(len(X), 2 * (slots - 19))
+        np.testing.assert_array_equal(X["temp_lag_1"], y)
+        np.testing.assert_array_equal(X["temp_rolling_std_24h"], 0.0)
+        pd.testing.assert_frame_equal(
+            X, pd.concat([build_features_from_aggregates(site)[0] for site in sites])
+        )
+
+    def test_train_model_backends_and_warm_start(self):
+        rows = 200
+        rng = np.random.default_rng(0)
+        X = pd.DataFrame(rng.normal(size=(rows, 3)), columns=["a", "b", "c"])
+        y = pd.Series(X["a"] * 2 + rng.normal(scale=0.1, size=rows))
+
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        cwd = os.getcwd()
+        os.chdir(tmp_dir.name)
+        self.addCleanup(os.chdir, cwd)
+
+        with patch("model.predict_series.get_engine", return_value=self.engine):
+            train_model(X, y, "rf", n_jobs=1)
+            train_model(X, y, "hgb", backend="hist_gradient_boosting")
+            with self.assertRaises(ValueError):
+                train_model(X, y, "bad", backend="inconnu")
+
+            parent = self._model("rf")
+            train_model(X, y, "rf-ws", warm_start_model_id=parent.id, add_estimators=10)
+
+        rf, hgb, warm = self._model("rf"), self._model("hgb"), self._model("rf-ws")
+        self.assertEqual(rf.backend, "random_forest")
+        self.assertEqual(rf.n_jobs, 1)
+        self.assertEqual(rf.training_rows, rows)
+        self.assertGreater(rf.fit_seconds, 0)
+        self.assertEqual(hgb.backend, "hist_gradient_boosting")
+        self.assertEqual(hgb.name, "HistGradientBoostingRegressor")
+
+        self.assertEqual(warm.parent_model_id, rf.id)
+        self.assertEqual(warm.n_estimators, rf.n_estimators + 10)
+        model = joblib.load(warm.path)
+        self.assertEqual(len(model.estimators_), rf.n_estimators + 10)
+        self.assertFalse(model.warm_start)
+
+    def _model(self, version):
+        with self.engine.connect() as connection:
+            return connection.execute(
+                Model.__table__.select().where(Model.version == version)
+            ).one()
+
+    def test_executor_restarts_after_shutdown(self):
+        executor = get_executor()
+        shutdown_executor()
+        self.addCleanup(shutdown_executor)
+
+        restarted = get_executor()
+        self.assertIsNot(restarted, executor)
+        self.assertEqual(restarted.submit(abs, -1).result(timeout=60), 1)
+
+    @patch("model.training_jobs.os.cpu_count", return_value=8)
+    @patch("model.training_jobs.TRAINING_CORES_PER_WORKER", 4)
+    @patch("model.training_jobs.TRAINING_SOURCE", "hourly")
+    @patch("model.training_jobs.get_model_id", return_value=3)
+    @patch("model.training_jobs.train_model", return_value="model/registry/m.pkl")
+    @patch("model.training_jobs.preprocess_data")
+    @patch("model.training_jobs.load_real_temperature")
+    def test_run_training_job_limits_n_jobs(
+        self, mock_load, mock_preprocess, mock_train, mock_model_id, mock_cpu_count
+    ):
+        mock_load.return_value = pd.DataFrame({"temperature_2m": [20.0]})
+        mock_preprocess.return_value = (pd.DataFrame(), pd.Series(dtype=float))
+
+        for n_jobs, expected in [(-1, 4), (16, 4), (-6, 3), (2, 2)]:
+            run_training_job(create_training_job("1.0.0", options={"n_jobs": n_jobs}))
+            self.assertEqual(mock_train.call_args.kwargs["n_jobs"], expected)
+
+        with patch("model.training_jobs.TRAINING_N_JOBS", -1):
+            run_training_job(create_training_job("1.0.0"))
+        self.assertEqual(mock_train.call_args.kwargs["n_jobs"], 4)
+
+    @patch("model.training_jobs.submit_training_job")
+    def test_recover_training_jobs(self, mock_submit):
+        queued_id = create_training_job("1.0.0")
+        running_id = create_training_job("2.0.0")
+        update_training_job(running_id, status=JOB_RUNNING)
+
+        self.assertEqual(recover_training_jobs(), [queued_id])
+        self.assertEqual(get_training_job(running_id)["status"], JOB_FAILED)
+        mock_submit.assert_called_once_with(queued_id)
+
+
+class TestModelArtifacts(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        rng = np.random.default_rng(0)
+        self.X = pd.DataFrame(rng.normal(size=(300, 4)), columns=list("abcd"))
+        y = self.X["a"] * 3 - self.X["b"] + rng.normal(scale=0.1, size=300)
+        self.forest = RandomForestRegressor(n_estimators=10, random_state=0)
+        self.forest.fit(self.X, y)
+
+    def test_formats_keep_predictions(self):
+        expected = self.forest.predict(self.X)
+        for artifact_format in ("pickle", "compressed", "compact"):
+            path = os.path.join(self.tmp_dir.name, f"{artifact_format}.pkl")
+            self.assertEqual(
+                save_artifact(self.forest, path, artifact_format), artifact_format
+            )
+            model = load_artifact(path)
+            np.testing.assert_array_equal(model.predict(self.X), expected)
+
+            artifact = describe_artifact(path)
+            self.assertEqual(artifact["artifact_bytes"], os.path.getsize(path))
+            self.assertGreaterEqual(artifact["load_seconds"], 0)
+
+        # Format compact : tableaux projetés en mémoire, seuils en float32
+        model = load_artifact(os.path.join(self.tmp_dir.name, "compact.pkl"))
+        self.assertIsInstance(model, CompactForest)
+        self.assertIsInstance(model.threshold, np.memmap)
+        self.assertEqual(model.threshold.dtype, np.float32)
+        self.assertEqual(model.n_estimators, 10)
+
+    def test_compact_forest_missing_values(self):
+        X = self.X.copy()
+        X.iloc[::5, 1] = np.nan
+        compact = CompactForest.from_forest(self.forest, np.float64)
+        np.testing.assert_array_equal(compact.predict(X), self.forest.predict(X))
+
+    def test_compact_forest_keeps_feature_count(self):
+        # Dernière feature constante : aucun nœud ne l'utilise
+        X = self.X.assign(e=1.0).to_numpy()
+        forest = RandomForestRegressor(n_estimators=5, random_state=0)
+        forest.fit(X, X[:, 0])
+
+        compact = CompactForest.from_forest(forest)
+        self.assertLess(compact.feature.max(), 4)
+        self.assertEqual(compact.n_features_in_, forest.n_features_in_)
+        self.assertEqual(
+            CompactForest.from_forest(self.forest).n_features_in_,
+            len(self.forest.feature_names_in_),
+        )
+
+    def test_compiled_forest_matches_sklearn(self):
+        X = pd.concat([self.X] * 4, ignore_index=True)
+        expected = self.forest.predict(X)
+
+        compiled = compile_model(self.forest)
+        self.assertIsInstance(compiled, CompiledForest)
+        # Petits lots : CompactForest, gros lots : forêt sklearn
+        np.testing.assert_array_equal(compiled.predict(X[:5]), expected[:5])
+        np.testing.assert_array_equal(compiled.predict(X), expected)
+
+        # Découpage en lots de CompactForest.predict
+        with patch("model.artifacts.COMPILED_BATCH_ROWS", 7):
+            np.testing.assert_array_equal(compiled.compact.predict(X), expected)
+
+        # Autres modèles inchangés
+        other = {"model": 1}
+        self.assertIs(compile_model(other), other)
+
+    def test_float32_thresholds_round_down(self):
+        thresholds = np.array([0.1, -0.3, 1e10 + 0.5, -2.0])
+        rounded = float32_thresholds(thresholds)
+        self.assertEqual(rounded.dtype, np.float32)
+        self.assertTrue(np.all(rounded.astype(np.float64) <= thresholds))
+        self.assertTrue(np.all(np.nextafter(rounded, np.float32(np.inf)) > thresholds))
+
+    def test_compact_falls_back_for_other_models(self):
+        path = os.path.join(self.tmp_dir.name, "other.pkl")
+        self.assertEqual(save_artifact({"model": 1}, path, "compact"), "pickle")
+        self.assertEqual(
+            describe_artifact(os.path.join(self.tmp_dir.name, "missing.pkl")),
+            {"artifact_bytes": None, "load_seconds": None},
+        )
+        with self.assertRaises(ValueError):
+            save_artifact({"model": 1}, path, "inconnu")
+
+
+class TestModelCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.paths = []
+        for i in range(3):
+            path = os.path.join(self.tmp_dir.name, f"model{i}.pkl")
+            joblib.dump({"model": i}, path)
+            self.paths.append(path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_hits_and_misses(self):
+        cache = ModelCache(max_entries=4, max_bytes=10**9)
+
+        first = cache.get(self.paths[0], model_id=1)
+        second = cache.get(self.paths[0], model_id=1)
+
+        self.assertIs(first, second)
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["entries"], 1)
+        self.assertGreater(stats["resident_bytes"], 0)
+
+    def test_reload_when_file_changes(self):
+        cache = ModelCache(max_entries=4, max_bytes=10**9)
+        cache.get(self.paths[0])
+
+        joblib.dump({"model": "new"}, self.paths[0])
+        os.utime(self.paths[0], ns=(0, 10**9))
+
+        self.assertEqual(cache.get(self.paths[0]), {"model": "new"})
+        self.assertEqual(cache.stats()["misses"], 2)
+
+    def test_lru_eviction(self):
+        cache = ModelCache(max_entries=2, max_bytes=10**9)
+        cache.get(self.paths[0])
+        cache.get(self.paths[1])
+        cache.get(self.paths[0])
+        cache.get(self.paths[2])
+
+        cached_paths = [entry["path"] for entry in cache.stats()["models"]]
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertNotIn(os.path.abspath(self.paths[1]), cached_paths)
+        self.assertIn(os.path.abspath(self.paths[0]), cached_paths)
+
+    @patch("model.model_cache.compile_model", side_effect=lambda m: {"compiled": m})
+    def test_compiled_entries(self, mock_compile):
+        cache = ModelCache(max_entries=4, max_bytes=10**9)
+
+        self.assertEqual(cache.get(self.paths[0]), {"model": 0})
+        compiled = cache.get(self.paths[0], compiled=True)
+        self.assertEqual(compiled, {"compiled": {"model": 0}})
+        self.assertIs(cache.get(self.paths[0], compiled=True), compiled)
+
+        self.assertEqual(mock_compile.call_count, 1)
+        self.assertEqual(
+            [entry["compiled"] for entry in cache.stats()["models"]], [False, True]
+        )
+
+    def test_memory_budget_eviction(self):
+        size = os.path.getsize(self.paths[0])
+        cache = ModelCache(max_entries=10, max_bytes=size)
+        cache.get(self.paths[0])
+        cache.get(self.paths[1])
+
+        self.assertEqual(cache.stats()["entries"], 1)
+        self.assertLessEqual(cache.stats()["resident_bytes"], size)
+
+    def test_size_of_loaded_model(self):
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(500, 4))
+        forest = RandomForestRegressor(n_estimators=10, random_state=0)
+        forest.fit(X, X[:, 0])
+        path = os.path.join(self.tmp_dir.name, "forest.pkl")
+        save_artifact(forest, path, "compressed")
+
+        cache = ModelCache(max_entries=4, max_bytes=10**9)
+        cache.get(path)
+        nodes = sum(
+            tree.tree_.__getstate__()["nodes"].nbytes for tree in forest.estimators_
+        )
+
+        # Taille chargée, et non celle du fichier compressé
+        (entry,) = cache.stats()["models"]
+        self.assertEqual(entry["size_bytes"], model_nbytes(forest))
+        self.assertGreater(entry["size_bytes"], nodes)
+        self.assertGreater(entry["size_bytes"], os.path.getsize(path))
+
+
+class TestTextClassification(unittest.TestCase):
+
+    MODEL_PATH = (
+        Path(__file__).parent.parent.parent
+        / "model"
+        / "registry"
+        / "text_classification_model.pkl"
+    )
+
+    def test_micro_batcher_groups_concurrent_requests(self):
+        batches = []
+
+        def predict(items):
+            batches.append(len(items))
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(predict, max_batch_size=100, max_wait=0.2)
+        barrier = threading.Barrier(8)
+        results = {}
+
+        def request(i):
+            barrier.wait()
+            results[i] = batcher([i, i + 100])
+
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        batcher.close()
+
+        self.assertEqual(results, {i: [2 * i, 2 * i + 200] for i in range(8)})
+        self.assertEqual(sum(batches), 16)
+        self.assertLess(len(batches), 8)
+        self.assertEqual(batcher.stats()["requests"], 8)
+
+    def test_micro_batcher_limits_and_errors(self):
+        batches = []
+
+        def predict(items):
+            batches.append(len(items))
+            if "bad" in items:
+                raise ValueError("bad")
+            return items
+
+        batcher = MicroBatcher(predict, max_batch_size=3, max_wait=0.1)
+        futures = [batcher.submit([i]) for i in range(7)]
+        self.assertEqual([f.result(1) for f in futures], [[i] for i in range(7)])
+        self.assertTrue(all(size <= 3 for size in batches))
+
+        with self.assertRaises(ValueError):
+            batcher(["bad"])
+        self.assertEqual(batcher([]), [])
+        batcher.close()
+
+    def test_classifier_matches_predict_proba(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            glove_path = os.path.join(tmp_dir, "glove.txt")
+            rng = np.random.default_rng(0)
+            words = ["man", "riding", "horse", "dog", "beach", "pizza", "table"]
+            with open(glove_path, "w") as f:
+                for word in words:
+                    values = " ".join(f"{v:.5f}" for v in rng.normal(0, 0.5, 300))
+                    f.write(f"{word} {values}\n")
+
+            vocab, vectors = load_glove(glove_path)
+            self.assertTrue(os.path.exists(glove_path + ".npy"))
+            self.assertEqual(vectors.shape, (len(words), 300))
+
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                model = joblib.load(self.MODEL_PATH)
+            classifier = TextClassifier(model, vocab, vectors)
+
+            captions = ["A man riding a horse!", "Dog on the beach", "", "unknown"]
+            probabilities = classifier.predict_proba(captions)
+
+            X = classifier.embed(captions)
+            self.assertEqual(X.shape, (4, 300))
+            self.assertFalse(X[2:].any())
+            expected = model.predict_proba(
+                pd.DataFrame(X, columns=model.feature_names_in_)
+            )
+            np.testing.assert_allclose(probabilities, expected, rtol=1e-12)
+            self.assertEqual(len(classifier.labels), 18)
+            self.assertNotIn(12, classifier.labels)
+
+    def test_preprocess_caption(self):
+        tokens = preprocess_caption("Two DOGS, 3 cats & a bird.")
+        self.assertNotIn("3", tokens)
+        self.assertTrue(all(token.isalpha() and token.islower() for token in tokens))
+
+        with self.assertRaises(FileNotFoundError):
+            load_glove("/nonexistent/glove.txt")
+
+    def test_missing_nltk_warns(self):
+        _nltk_tools.cache_clear()
+        self.addCleanup(_nltk_tools.cache_clear)
+        with patch.dict(sys.modules, {"nltk.corpus": None}):
+            with self.assertWarnsRegex(RuntimeWarning, "nltk"):
+                self.assertEqual(_nltk_tools(), (set(), None))
+
+
+def write_image_classification_csvs(directory, labels, offsets):
+    """train.csv (étiquettes "1 19") et split_*.csv (one-hot) cohérents."""
+    records = []
+    for split, dense in labels.items():
+        ids = [f"{offsets[split] + i}.jpg" for i in range(len(dense))]
+        frame = pd.DataFrame(dense.astype(int), columns=[str(l) for l in TEXT_LABELS])
+        frame.insert(0, "ImageID", ids)
+        frame.insert(1, "Caption", "A caption, with a comma")
+        frame.to_csv(os.path.join(directory, f"split_{split}.csv"), index=False)
+        for image_id, row in zip(ids, dense):
+            names = " ".join(str(TEXT_LABELS[j]) for j in np.flatnonzero(row))
+            records.append(f'{image_id},{names},"A caption, with "quotes""')
+    with open(os.path.join(directory, "train.csv"), "w") as f:
+        f.write("ImageID,Labels,Caption\n" + "\n".join(records) + "\n")
+
+
+class TestFeatureStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        self.labels = {}
+        for split, n in [("train", 6), ("val", 3), ("test", 2)]:
+            labels = np.zeros((n, 18), dtype=np.float32)
+            labels[::2, 0] = 1
+            labels[:, 17] = 1
+            self.labels[split] = labels
+            for name, values in [
+                ("text_features", rng.random((n, 18))),
+                ("image_features", rng.random((n, 18)).astype(np.float32)),
+                ("image_labels", labels),
+            ]:
+                np.save(os.path.join(self.tmp_dir.name, f"{split}_{name}.npy"), values)
+        write_image_classification_csvs(
+            self.tmp_dir.name, self.labels, {"train": 0, "val": 100, "test": 200}
+        )
+        self.store = FeatureStore(
+            self.tmp_dir.name,
+            self.tmp_dir.name,
+            os.path.join(self.tmp_dir.name, "label_cache"),
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_split_views_are_memory_mapped(self):
+        features = self.store.features("train", "text")
+
+        self.assertIsInstance(features, np.memmap)
+        self.assertFalse(features.flags.writeable)
+        self.assertIs(self.store.features("train", "text"), features)
+        window = self.store.features("train", "image", slice(1, 4))
+        self.assertTrue(np.shares_memory(window, self.store.features("train", "image")))
+
+    def test_label_rows_and_lookup(self):
+        np.testing.assert_array_equal(self.store.label_rows("train", 1), [0, 2, 4])
+        self.assertEqual(len(self.store.label_rows("val", 19)), 3)
+        self.assertEqual(self.store.by_label("train", 1, "image").shape, (3, 18))
+        with self.assertRaises(ValueError):
+            self.store.label_rows("train", 12)
+
+        self.assertEqual(
+            self.store.locate(["102.jpg", "unknown", "0.jpg"]),
+            [("val", 2), None, ("train", 0)],
+        )
+        values, found = self.store.lookup(["201.jpg", "unknown", "3.jpg"], "text")
+        np.testing.assert_array_equal(found, [True, False, True])
+        np.testing.assert_array_equal(values[0], self.store.features("test", "text")[1])
+        np.testing.assert_array_equal(
+            values[2], self.store.features("train", "text")[3]
+        )
+        self.assertTrue(np.isnan(values[1]).all())
+
+    def test_row_count_mismatch(self):
+        np.save(
+            os.path.join(self.tmp_dir.name, "val_text_features.npy"), np.zeros((5, 18))
+        )
+        with self.assertRaises(ValueError):
+            self.store.features("val", "text")
+        with self.assertRaises(ValueError):
+            self.store.features("holdout", "text")
+
+    def test_registry_labels_match_splits(self):
+        store = FeatureStore(
+            str(Path(__file__).parent.parent.parent / "model" / "registry"),
+            str(Path(__file__).parent.parent.parent / "data" / "image_classification"),
+        )
+        split = pd.read_csv(store.splits_dir + "/split_val.csv")
+        expected = split[[str(label) for label in TEXT_LABELS]].to_numpy()
+
+        np.testing.assert_array_equal(store.labels("val"), expected)
+        self.assertEqual(store.features("val", "text").shape, (len(split), 18))
+
+
+class TestFusion(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.labels = rng.random((200, 18)) < 0.2
+        self.text = np.clip(self.labels + rng.normal(0, 0.3, (200, 18)), 0, 1)
+        self.image = rng.random((200, 18)).astype(np.float32)
+
+    def test_f1_scores_match_sklearn(self):
+        from sklearn.metrics import f1_score
+
+        predicted = self.text >= 0.5
+        predicted[:, 3] = False
+        labels = self.labels.copy()
+        labels[:, 3] = False
+
+        micro, macro = f1_scores(labels, predicted)
+        self.assertAlmostEqual(
+            float(micro), f1_score(labels, predicted, average="micro")
+        )
+        self.assertAlmostEqual(
+            float(macro),
+            f1_score(labels, predicted, average="macro", zero_division=0),
+        )
+
+    def test_weighted_average_grid(self):
+        fused = weighted_average(self.text, self.image, 0.7)
+        np.testing.assert_allclose(fused, 0.7 * self.text + 0.3 * self.image)
+
+        grid = weighted_average(self.text, self.image, np.array([0.0, 1.0]))
+        self.assertEqual(grid.shape, (2, 200, 18))
+        np.testing.assert_allclose(grid[0], self.image)
+        np.testing.assert_allclose(grid[1], self.text)
+
+        micro, macro = f1_scores(self.labels, grid >= 0.5)
+        self.assertEqual(micro.shape, (2,))
+        self.assertGreater(micro[1], micro[0])
+
+    def test_concat_head_matches_mlp(self):
+        from sklearn.neural_network import MLPClassifier
+
+        mlp = MLPClassifier(hidden_layer_sizes=(16,), max_iter=20, random_state=0)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            mlp.fit(np.hstack([self.text, self.image]), self.labels.astype(int))
+        head = ConcatHead.from_mlp(mlp, 18)
+
+        np.testing.assert_allclose(
+            head.predict_proba(self.text, self.image),
+            mlp.predict_proba(np.hstack([self.text, self.image])),
+            rtol=1e-6,
+        )
+
+    def test_concat_head_cache(self):
+        store = MagicMock()
+        store.features.side_effect = lambda split, modality: (
+            self.text if modality == "text" else self.image
+        )
+        store.labels.return_value = self.labels
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        path = os.path.join(tmp_dir.name, "fusion_head.pkl")
+
+        # Tête absente : entraînée et enregistrée au premier chargement
+        with patch("model.model_cache.model_cache.get") as mock_get:
+            head = load_concat_head(path, store=store)
+            self.assertTrue(os.path.exists(path))
+            self.assertIs(load_concat_head(path, store=store), head)
+        mock_get.assert_not_called()
+        self.assertEqual(os.listdir(tmp_dir.name), ["fusion_head.pkl"])
+
+        # Tête réentraînée : relue d'après sa date de modification
+        train_concat_head(store, path, hidden=4, max_iter=5)
+        os.utime(path, (0, os.path.getmtime(path) + 1))
+        self.assertEqual(load_concat_head(path).coefs[0].shape[1], 4)
+
+    def test_evaluate_split_and_weight_search(self):
+        store = MagicMock()
+        store.features.side_effect = lambda split, modality: (
+            self.text if modality == "text" else self.image
+        )
+        store.labels.return_value = self.labels
+
+        engine = FusionEngine("average", text_weight=1.0, store=store)
+        evaluation = evaluate_split(engine, "test")
+
+        self.assertEqual(evaluation["rows"], 200)
+        self.assertEqual(evaluation["scores"]["fusion"], evaluation["scores"]["text"])
+        weight, scores = search_text_weight(store, weights=np.linspace(0, 1, 5))
+        self.assertEqual(len(scores), 5)
+        self.assertGreaterEqual(weight, 0.5)
+
+        with self.assertRaises(ValueError):
+            FusionEngine("stacking", store=store)
+
+
+class TestSimilarityIndex(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.vectors = rng.random((500, 18))
+        self.ids = [f"{i}.jpg" for i in range(500)]
+        self.queries = rng.random((20, 18))
+        normalized = normalize(self.vectors)
+        scores = normalize(self.queries) @ normalized.T
+        self.expected = np.argsort(-scores, axis=1)[:, :5]
+
+    def test_exact_blocked_search(self):
+        index = ExactIndex.build(self.vectors, self.ids)
+
+        self.assertEqual(index.vectors.dtype, np.float32)
+        np.testing.assert_allclose(np.linalg.norm(index.vectors, axis=1), 1, rtol=1e-6)
+        for block_rows in [7, 64, 10_000]:
+            scores, rows = index.search(self.queries, k=5, block_rows=block_rows)
+            np.testing.assert_array_equal(rows, self.expected)
+            self.assertTrue((np.diff(scores, axis=1) <= 0).all())
+
+    def test_ivf_search_and_persistence(self):
+        index = IVFIndex.build(self.vectors, self.ids, n_lists=10)
+
+        self.assertEqual(index.offsets[-1], 500)
+        # Toutes les listes parcourues : résultat exact
+        _, rows = index.search(self.queries, k=5, n_probe=10)
+        np.testing.assert_array_equal(
+            index.ids[rows], np.asarray(self.ids)[self.expected]
+        )
+        _, rows = index.search(self.queries, k=5, n_probe=2)
+        self.assertEqual(rows.shape, (20, 5))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index.save(tmp_dir)
+            loaded = IVFIndex.load(tmp_dir)
+            self.assertIsInstance(loaded.vectors, np.memmap)
+            np.testing.assert_array_equal(
+                loaded.search(self.queries, k=5, n_probe=3)[1],
+                index.search(self.queries, k=5, n_probe=3)[1],
+            )
+
+    def test_save_index_swaps_versions(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            directory = os.path.join(tmp_dir, "train_text_exact")
+            save_index(ExactIndex.build(self.vectors[:10], self.ids[:10]), directory)
+            first = current_version(directory)
+            mapped = ExactIndex.load(first)
+            save_index(ExactIndex.build(self.vectors, self.ids), directory)
+            second = current_version(directory)
+
+            self.assertNotEqual(second, first)
+            self.assertEqual(len(ExactIndex.load(second)), 500)
+            # L'index projeté avant la reconstruction reste lisible
+            self.assertEqual(len(mapped), 10)
+            self.assertEqual(mapped.search(self.queries, k=3)[1].shape, (20, 3))
+
+            # Version remplacée conservée, les plus anciennes supprimées
+            save_index(ExactIndex.build(self.vectors[:20], self.ids[:20]), directory)
+            third = current_version(directory)
+            self.assertEqual(
+                sorted(os.listdir(directory)),
+                sorted(["CURRENT", os.path.basename(second), os.path.basename(third)]),
+            )
+
+    def test_get_similarity_index_builds_once(self):
+        builds = []
+        vectors, ids = self.vectors, self.ids
+
+        class Store:
+            def features(self, split, modality):
+                builds.append(split)
+                return vectors
+
+            def image_ids(self, split):
+                return ids
+
+        with tempfile.TemporaryDirectory() as tmp_dir, patch(
+            "model.similarity_index.SIMILARITY_INDEX_DIR", tmp_dir
+        ), patch.dict("model.similarity_index._indexes", clear=True):
+            indexes = []
+            threads = [
+                threading.Thread(
+                    target=lambda: indexes.append(
+                        get_similarity_index("train", "text", "ivf", store=Store())
+                    )
+                )
+                for _ in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(builds, ["train"])
+        self.assertEqual(len({id(index) for index in indexes}), 1)
+
+    def test_top_k(self):
+        scores = np.array([[0.1, 0.9, 0.5, 0.7]])
+        best, indices = top_k(scores, 2)
+        np.testing.assert_array_equal(indices, [[1, 3]])
+        self.assertEqual(top_k(scores, 10)[1].shape, (1, 4))
+
+
+class TestImageLabels(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        rng = np.random.default_rng(0)
+        self.labels = {
+            split: (rng.random((n, 18)) < 0.2).astype(np.uint8)
+            for split, n in [("train", 40), ("val", 10), ("test", 10)]
+        }
+        for dense in self.labels.values():
+            dense[:, 0] = 1
+        write_image_classification_csvs(
+            self.tmp_dir.name, self.labels, {"train": 0, "val": 1000, "test": 2000}
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_parse_label_strings(self):
+        dense = parse_label_strings(["1 19", "13", "2 11 1"])
+
+        self.assertEqual(dense.dtype, np.uint8)
+        np.testing.assert_array_equal(np.flatnonzero(dense[0]), [0, 17])
+        np.testing.assert_array_equal(np.flatnonzero(dense[1]), [11])
+        np.testing.assert_array_equal(np.flatnonzero(dense[2]), [0, 1, 10])
+        with self.assertRaises(ValueError):
+            parse_label_strings(["1 12"])
+
+    def test_train_csv_with_broken_captions(self):
+        path = os.path.join(self.tmp_dir.name, "broken.csv")
+        with open(path, "w") as f:
+            f.write(
+                "ImageID,Labels,Caption\n"
+                '0.jpg,1 19,"A sign reading "stop, now"."\n'
+                '1.jpg,3,"A caption\n\non several lines"\n'
+                "2.jpg,13 2,No quotes at all\n"
+            )
+        labels = read_train_labels(path)
+
+        self.assertEqual(labels.image_ids.tolist(), ["0.jpg", "1.jpg", "2.jpg"])
+        self.assertEqual(labels.packed.shape, (3, 3))
+        np.testing.assert_array_equal(np.flatnonzero(labels.dense()[2]), [1, 11])
+
+    def test_load_labels_checks_and_caches(self):
+        labels = load_labels(self.tmp_dir.name, self.cache_dir)
+
+        self.assertEqual(len(labels["all"]), 60)
+        for split, dense in self.labels.items():
+            np.testing.assert_array_equal(labels[split].dense(), dense)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+        with patch("data.image_labels.read_train_labels") as mock_read:
+            cached = load_labels(self.tmp_dir.name, self.cache_dir)
+        mock_read.assert_not_called()
+        np.testing.assert_array_equal(cached["val"].packed, labels["val"].packed)
+        np.testing.assert_array_equal(cached["all"].image_ids, labels["all"].image_ids)
+
+    def test_load_labels_mismatch(self):
+        self.labels["val"][3, 5] ^= 1
+        split = pd.read_csv(os.path.join(self.tmp_dir.name, "split_val.csv"))
+        split[str(TEXT_LABELS[5])] = self.labels["val"][:, 5]
+        split.to_csv(os.path.join(self.tmp_dir.name, "split_val.csv"), index=False)
+
+        with self.assertRaises(ValueError):
+            load_labels(self.tmp_dir.name, self.cache_dir)
+
+        labels = load_labels(self.tmp_dir.name, self.cache_dir, strict=False)
+        problems = check_labels(labels["all"], {"val": labels["val"]})
+        self.assertEqual(problems["val"]["mismatched"], ["1003.jpg"])
+        self.assertFalse(os.path.exists(self.cache_dir))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,75 @@
+"""
+Benchmark de la préparation des données d'entraînement : relevés horaires
+(lecture + agrégation 3h + features) vs table agrégée RealTemperature3h
+(lecture + features), et coût de la mise à jour des agrégats à l'ingestion.
+
+Usage :
+    python benchmarks/bench_aggregates.py --years 10
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+import pandas as pd
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from data.data_ingestion import bulk_save_weather_data
+from data.data_access import load_real_temperature, load_aggregates_3h
+from model.predict_series import preprocess_data_pandas
+from model.feature_engine import build_features, build_features_from_aggregates
+from benchmarks.bench_ingestion import make_weather_frame, fresh_engine
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=10)
+    args = parser.parse_args()
+
+    df = make_weather_frame(args.years * 365 * 24)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        plain = fresh_engine(tmp_dir, "plain")
+        with patch("data.data_ingestion.refresh_aggregates"):
+            plain_seconds, _ = timed(lambda: bulk_save_weather_data(df, engine=plain))
+
+        engine = fresh_engine(tmp_dir, "aggregated")
+        aggregated_seconds, _ = timed(lambda: bulk_save_weather_data(df, engine=engine))
+        print(
+            f"ingestion de {len(df)} relevés : {plain_seconds:.2f}s sans agrégats, "
+            f"{aggregated_seconds:.2f}s avec agrégats 3h + jour"
+        )
+
+        read_hourly, hourly = timed(lambda: load_real_temperature(engine=engine))
+        pandas_features, (X_ref, _) = timed(lambda: preprocess_data_pandas(hourly))
+        numpy_features, _ = timed(lambda: build_features(hourly))
+        read_3h, aggregates = timed(lambda: load_aggregates_3h(engine=engine))
+        aggregate_features, (X, _) = timed(
+            lambda: build_features_from_aggregates(aggregates)
+        )
+
+        pd.testing.assert_frame_equal(
+            X, X_ref, check_exact=False, rtol=1e-12, atol=1e-12, check_freq=False
+        )
+
+        print(
+            f"horaire   : {len(hourly)} lignes lues en {read_hourly:.2f}s, "
+            f"features pandas {pandas_features:.2f}s / numpy {numpy_features:.2f}s"
+        )
+        print(
+            f"agrégé 3h : {len(aggregates)} lignes lues en {read_3h:.2f}s, "
+            f"features {aggregate_features:.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
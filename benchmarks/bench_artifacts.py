@@ -0,0 +1,63 @@
+"""
+Benchmark des formats de fichiers du registre : taille, durée de chargement
+(joblib.load, mmap pour les fichiers non compressés) et de prédiction d'une
+forêt aléatoire enregistrée en pickle, compressée ou compacte.
+
+Usage :
+    python benchmarks/bench_artifacts.py --years 2 --trees 200
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from model.feature_engine import build_features
+from model.predict_series import build_estimator
+from model.artifacts import (
+    ARTIFACT_FORMATS,
+    save_artifact,
+    load_artifact,
+    describe_artifact,
+)
+from benchmarks.bench_ingestion import make_weather_frame
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--trees", type=int, default=200)
+    args = parser.parse_args()
+
+    X, y = build_features(make_weather_frame(args.years * 365 * 24))
+    forest = build_estimator("random_forest", -1)
+    forest.set_params(n_estimators=args.trees)
+    forest.fit(X, y)
+    expected = forest.predict(X)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for artifact_format in ARTIFACT_FORMATS:
+            path = os.path.join(tmp_dir, f"{artifact_format}.pkl")
+            save_artifact(forest, path, artifact_format)
+            artifact = describe_artifact(path)
+
+            model = load_artifact(path)
+            start = time.perf_counter()
+            y_pred = model.predict(X)
+            predict_seconds = time.perf_counter() - start
+
+            print(
+                f"{artifact_format:10s} {artifact['artifact_bytes'] / 1024**2:7.1f} Mo  "
+                f"chargement {artifact['load_seconds'] * 1000:7.1f} ms  "
+                f"prédiction ({len(X)} lignes) {predict_seconds * 1000:7.1f} ms  "
+                f"écart max {np.abs(y_pred - expected).max():.1e}"
+            )
+
+
+if __name__ == "__main__":
+    main()
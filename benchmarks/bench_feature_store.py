@@ -0,0 +1,112 @@
+"""
+Benchmark du magasin de features (model/feature_store.py) :
+ - chargement complet des tableaux du registre (np.load, comme les notebooks)
+   vs ouverture projetée en mémoire (FeatureStore) ;
+ - lecture des features de quelques ImageID et des lignes d'une étiquette ;
+ - mémoire privée (RssAnon) et partagée (RssFile) de plusieurs processus
+   ouvrant les mêmes tableaux.
+
+Usage :
+    python benchmarks/bench_feature_store.py --lookups 100 --workers 4
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+from multiprocessing import Pool
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from model.feature_store import (
+    ARRAY_NAMES,
+    FEATURE_STORE_DIR,
+    SPLITS,
+    FeatureStore,
+)
+
+
+def memory_kb():
+    values = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("RssAnon", "RssFile")):
+                name, value = line.split(":")
+                values[name] = int(value.split()[0])
+    return values
+
+
+def load_eager():
+    return {
+        (split, name): np.load(os.path.join(FEATURE_STORE_DIR, f"{split}_{name}.npy"))
+        for split in SPLITS
+        for name in ARRAY_NAMES
+    }
+
+
+def open_store():
+    store = FeatureStore()
+    for split in SPLITS:
+        for name in ARRAY_NAMES:
+            store.array(split, name)
+    return store
+
+
+def worker(mode):
+    before = memory_kb()
+    if mode == "np.load":
+        arrays = load_eager()
+        total = sum(float(array.sum()) for array in arrays.values())
+    else:
+        store = open_store()
+        total = sum(
+            float(store.array(split, name).sum())
+            for split in SPLITS
+            for name in ARRAY_NAMES
+        )
+    after = memory_kb()
+    return {name: after[name] - before[name] for name in after}, total
+
+
+def timed(function, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lookups", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    seconds, _ = timed(load_eager)
+    print(f"np.load de tous les tableaux       : {seconds * 1000:7.2f} ms")
+    seconds, store = timed(open_store)
+    print(f"FeatureStore (mmap + ImageID)     : {seconds * 1000:7.2f} ms")
+
+    rng = np.random.default_rng(0)
+    image_ids = rng.choice(np.asarray(store.image_ids("train")), args.lookups)
+    seconds, _ = timed(lambda: store.lookup(image_ids, "text"))
+    print(f"lookup de {args.lookups} ImageID            : {seconds * 1000:7.2f} ms")
+    seconds, _ = timed(lambda: store.by_label("train", 19, "image"))
+    print(f"features train de l'étiquette 19    : {seconds * 1000:7.2f} ms")
+
+    for mode in ["np.load", "mmap"]:
+        with Pool(args.workers) as pool:
+            results = pool.map(worker, [mode] * args.workers)
+        anon = sum(memory["RssAnon"] for memory, _ in results) / 1024
+        shared = max(memory["RssFile"] for memory, _ in results) / 1024
+        print(
+            f"{args.workers} processus ({mode:7s}) : mémoire privée totale {anon:6.1f} Mo, "
+            f"pages de fichier par processus {shared:6.1f} Mo (partagées)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark du calcul des features : chemin pandas d'origine (groupby 3h +
+create_features) vs model.feature_engine (matrice NumPy préallouée).
+
+Vérifie que les deux chemins produisent les mêmes X et y.
+
+Usage :
+    python benchmarks/bench_features.py --years 1 5 20
+"""
+
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from model.predict_series import preprocess_data_pandas
+from model.feature_engine import build_features
+from benchmarks.bench_ingestion import make_weather_frame
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for years in args.years:
+        df = make_weather_frame(years * 365 * 24)
+
+        pandas_seconds, (X_ref, y_ref) = best_of(
+            lambda: preprocess_data_pandas(df), args.repeat
+        )
+        numpy_seconds, (X, y) = best_of(lambda: build_features(df), args.repeat)
+        float32_seconds, (X32, _) = best_of(
+            lambda: build_features(df, dtype=np.float32), args.repeat
+        )
+
+        pd.testing.assert_series_equal(y, y_ref, check_exact=True, check_freq=False)
+        pd.testing.assert_frame_equal(
+            X, X_ref, check_exact=False, rtol=1e-12, atol=1e-12, check_freq=False
+        )
+
+        print(
+            f"{years:>3} an(s), {len(df):>7} relevés : pandas {pandas_seconds * 1000:.0f} ms, "
+            f"numpy {numpy_seconds * 1000:.0f} ms (x{pandas_seconds / numpy_seconds:.1f}), "
+            f"float32 {float32_seconds * 1000:.0f} ms, "
+            f"X {X.memory_usage().sum() / 1e6:.1f} Mo / {X32.memory_usage().sum() / 1e6:.1f} Mo"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark de la fusion multimodale (model/fusion) sur tout split_test.csv :
+débit (lignes/s) de la moyenne pondérée et de la tête concaténée, ligne par
+ligne vs par lot (FusionEngine), et de MLPClassifier.predict_proba de sklearn
+sur les features concaténées ; F1 micro et macro de chaque source.
+
+Usage :
+    python benchmarks/bench_fusion.py --split test --repeat 20
+"""
+
+import sys
+import time
+import argparse
+import warnings
+import numpy as np
+from pathlib import Path
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.neural_network import MLPClassifier
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from model.feature_store import feature_store
+from model.fusion import ConcatHead, FusionEngine, evaluate_split, search_text_weight
+
+
+def rate(function, rows, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return rows / best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--split", default="test")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    text = feature_store.features(args.split, "text")
+    image = feature_store.features(args.split, "image")
+    rows = len(text)
+
+    mlp = MLPClassifier(hidden_layer_sizes=(64,), max_iter=50, random_state=0)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", ConvergenceWarning)
+        mlp.fit(
+            np.hstack(
+                [
+                    feature_store.features("train", "text"),
+                    feature_store.features("train", "image"),
+                ]
+            ),
+            feature_store.labels("train").astype(int),
+        )
+    head = ConcatHead.from_mlp(mlp, text.shape[1])
+
+    weight, _ = search_text_weight(feature_store)
+    average = FusionEngine("average", text_weight=weight)
+    concat = FusionEngine("concat", head=head)
+
+    print(f"split {args.split} : {rows} lignes")
+    results = [
+        (
+            "moyenne, ligne par ligne",
+            lambda: [average.predict_proba(t, i) for t, i in zip(text, image)],
+        ),
+        ("moyenne, par lot", lambda: average.predict_proba(text, image)),
+        (
+            "concat, ligne par ligne",
+            lambda: [
+                concat.predict_proba(t[None], i[None]) for t, i in zip(text, image)
+            ],
+        ),
+        (
+            "concat, sklearn predict_proba",
+            lambda: mlp.predict_proba(np.hstack([text, image])),
+        ),
+        ("concat, par lot", lambda: concat.predict_proba(text, image)),
+    ]
+    for name, function in results:
+        repeat = 1 if "ligne" in name else args.repeat
+        print(f"  {name:32s} {rate(function, rows, repeat):12.0f} lignes/s")
+
+    for engine in [average, concat]:
+        scores = evaluate_split(engine, args.split)["scores"]
+        print(
+            f"F1 ({engine.mode}"
+            + (f", poids texte {weight:.2f}" if engine.mode == "average" else "")
+            + ") : "
+            + ", ".join(
+                f"{source} micro {s['micro_f1']:.3f} / macro {s['macro_f1']:.3f}"
+                for source, s in scores.items()
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark des moteurs de prédiction d'une forêt aléatoire : sklearn
+(RandomForestRegressor.predict), CompactForest (parcours vectorisé de tous les
+arbres) et CompiledForest (CompactForest jusqu'à COMPILED_MAX_ROWS lignes,
+sklearn au-delà), de 1 à 100 000 lignes.
+
+Usage :
+    python benchmarks/bench_inference.py --years 2 --trees 200
+"""
+
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from model.feature_engine import build_features
+from model.predict_series import build_estimator
+from model.artifacts import compile_model
+from benchmarks.bench_ingestion import make_weather_frame
+
+
+def best_of(func, X, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(X)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--trees", type=int, default=200)
+    args = parser.parse_args()
+
+    X, y = build_features(make_weather_frame(args.years * 365 * 24))
+    forest = build_estimator("random_forest", -1)
+    forest.set_params(n_estimators=args.trees)
+    forest.fit(X, y)
+    compiled = compile_model(forest)
+
+    rows = pd.concat([X] * (100_000 // len(X) + 1), ignore_index=True)
+    print(f"{'lignes':>7s} {'sklearn':>12s} {'compact':>12s} {'compiled':>12s}")
+    for n in (1, 10, 100, 1_000, 10_000, 100_000):
+        X_n = rows[:n]
+        repeat = 5 if n <= 1_000 else 1
+        sklearn_seconds, expected = best_of(forest.predict, X_n, repeat)
+        compact_seconds, y_compact = best_of(compiled.compact.predict, X_n, repeat)
+        compiled_seconds, y_compiled = best_of(compiled.predict, X_n, repeat)
+        assert np.array_equal(y_compact, expected)
+        assert np.array_equal(y_compiled, expected)
+        print(
+            f"{n:7d} {sklearn_seconds * 1000:10.2f}ms {compact_seconds * 1000:10.2f}ms "
+            f"{compiled_seconds * 1000:10.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark de l'ingestion : boucle ligne à ligne vs insertion par lots.
+
+Usage :
+    python benchmarks/bench_ingestion.py --rows 100000
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from sqlalchemy import create_engine
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from data.db_init import Base
+from data.data_ingestion import save_weather_data_to_db, bulk_save_weather_data
+
+
+def make_weather_frame(rows, start="2010-01-01"):
+    rng = np.random.default_rng(42)
+    return pd.DataFrame(
+        {
+            "timestamp": pd.date_range(start=start, periods=rows, freq="h"),
+            "temperature_2m": rng.normal(12, 6, rows).round(1),
+            "relative_humidity": rng.integers(30, 100, rows),
+            "precipitation": rng.exponential(0.3, rows).round(1),
+            "surface_pressure": rng.normal(1010, 8, rows).round(1),
+            "latitude": 48.8566,
+            "longitude": 2.3522,
+        }
+    )
+
+
+def fresh_engine(tmp_dir, name):
+    engine = create_engine(f"sqlite:///{tmp_dir}/{name}.db")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument(
+        "--loop-rows",
+        type=int,
+        default=None,
+        help="Nombre de lignes pour la boucle historique (défaut: --rows)",
+    )
+    args = parser.parse_args()
+
+    df = make_weather_frame(args.rows)
+    loop_df = df.iloc[: args.loop_rows] if args.loop_rows else df
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = fresh_engine(tmp_dir, "loop")
+        start = time.perf_counter()
+        save_weather_data_to_db(loop_df, engine=engine)
+        loop_seconds = time.perf_counter() - start
+        print(
+            f"boucle ligne à ligne : {len(loop_df)} lignes en {loop_seconds:.2f}s "
+            f"({len(loop_df) / loop_seconds:,.0f} lignes/s)"
+        )
+
+        engine = fresh_engine(tmp_dir, "bulk")
+        start = time.perf_counter()
+        counts = bulk_save_weather_data(df, engine=engine)
+        bulk_seconds = time.perf_counter() - start
+        print(
+            f"insertion par lots   : {len(df)} lignes en {bulk_seconds:.2f}s "
+            f"({len(df) / bulk_seconds:,.0f} lignes/s) -> {counts}"
+        )
+
+        # Ré-ingestion complète : tout doit être ignoré
+        start = time.perf_counter()
+        counts = bulk_save_weather_data(df, engine=engine)
+        print(
+            f"ré-ingestion (doublons) : {time.perf_counter() - start:.2f}s -> {counts}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark du chargement des étiquettes de data/image_classification :
+lecture pandas des notebooks (read_csv complet, on_bad_lines="skip",
+str.get_dummies pour train.csv) vs data.image_labels.load_labels sans cache
+(lecture des seules étiquettes, vérification croisée) et avec cache .npz.
+
+Usage :
+    python benchmarks/bench_labels.py --repeat 5
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+import pandas as pd
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from data.image_labels import IMAGE_CLASSIFICATION_DIR, LABELS, SPLITS, load_labels
+
+
+def pandas_labels(directory):
+    data = pd.read_csv(f"{directory}/train.csv", on_bad_lines="skip")
+    dense = data["Labels"].astype(str).str.get_dummies(sep=" ")
+    splits = {
+        split: pd.read_csv(f"{directory}/split_{split}.csv")[
+            [str(label) for label in LABELS]
+        ].to_numpy()
+        for split in SPLITS
+    }
+    return dense, splits
+
+
+def best_of(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--directory", default=IMAGE_CLASSIFICATION_DIR)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        timings = [
+            ("pandas (notebooks)", lambda: pandas_labels(args.directory)),
+            (
+                "load_labels sans cache",
+                lambda: load_labels(args.directory, cache_dir, use_cache=False),
+            ),
+        ]
+        load_labels(args.directory, cache_dir)
+        timings.append(
+            ("load_labels, cache .npz", lambda: load_labels(args.directory, cache_dir))
+        )
+        for name, function in timings:
+            print(f"{name:26s} {best_of(function, args.repeat) * 1000:8.1f} ms")
+
+        labels = load_labels(args.directory, cache_dir)
+        print(
+            ", ".join(
+                f"{name} {len(matrix)} images ({matrix.packed.nbytes} octets)"
+                for name, matrix in labels.items()
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Benchmark multi-sites :
+ - lecture des relevés d'un site (requête par l'index (latitude, longitude,
+   timestamp)) vs lecture de toute la période puis filtrage pandas, quand le
+   nombre de sites augmente ;
+ - récupération de plusieurs sites, un par un vs en parallèle
+   (fetch_locations_weather), sur une API d'archive locale avec latence simulée.
+
+Usage :
+    python benchmarks/bench_locations.py --sites 10 100 300 --days 90
+"""
+
+import sys
+import json
+import time
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from sqlalchemy import create_engine
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from data import data_ingestion
+from data.db_init import Base
+from data.data_access import load_real_temperature
+from data.data_ingestion import (
+    bulk_save_weather_data,
+    fetch_weather_data,
+    fetch_locations_weather,
+)
+
+
+def make_sites(n_sites):
+    rng = np.random.default_rng(0)
+    latitudes = np.round(rng.uniform(42, 51, n_sites), 4)
+    longitudes = np.round(rng.uniform(-4, 8, n_sites), 4)
+    return list(zip(latitudes.tolist(), longitudes.tolist()))
+
+
+def fill_database(engine, sites, days):
+    timestamps = pd.date_range("2024-01-01", periods=days * 24, freq="h")
+    rng = np.random.default_rng(1)
+    for latitude, longitude in sites:
+        n = len(timestamps)
+        bulk_save_weather_data(
+            pd.DataFrame(
+                {
+                    "timestamp": timestamps,
+                    "temperature_2m": rng.normal(12, 6, n),
+                    "relative_humidity": rng.uniform(40, 100, n),
+                    "precipitation": rng.exponential(0.2, n),
+                    "surface_pressure": rng.normal(1010, 5, n),
+                    "latitude": latitude,
+                    "longitude": longitude,
+                }
+            ),
+            engine=engine,
+        )
+
+
+def bench_reads(n_sites, days):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    sites = make_sites(n_sites)
+    fill_database(engine, sites, days)
+    latitude, longitude = sites[n_sites // 2]
+    bounds = (
+        pd.Timestamp("2024-01-01"),
+        pd.Timestamp("2024-01-01") + pd.Timedelta(days=days),
+    )
+
+    start = time.perf_counter()
+    everything = load_real_temperature(*bounds, engine=engine)
+    site = everything[
+        (everything["latitude"] == latitude) & (everything["longitude"] == longitude)
+    ]
+    full_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed = load_real_temperature(
+        *bounds, engine=engine, location=(latitude, longitude)
+    )
+    indexed_seconds = time.perf_counter() - start
+
+    assert len(site) == len(indexed) == days * 24
+    print(
+        f"{n_sites:4d} sites : lecture complète + filtre {full_seconds * 1000:8.1f} ms, "
+        f"requête par site {indexed_seconds * 1000:6.1f} ms"
+    )
+
+
+class SlowArchive(BaseHTTPRequestHandler):
+    latency = 0.2
+
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        times = pd.date_range(
+            params["start_date"][0],
+            pd.Timestamp(params["end_date"][0]) + pd.Timedelta(hours=23),
+            freq="h",
+        ).strftime("%Y-%m-%dT%H:%M")
+        time.sleep(self.latency)
+        body = json.dumps(
+            {
+                "hourly": {
+                    "time": times.tolist(),
+                    "temperature_2m": [12.0] * len(times),
+                    "relative_humidity_2m": [80.0] * len(times),
+                    "precipitation": [0.0] * len(times),
+                    "surface_pressure": [1013.0] * len(times),
+                }
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def bench_fetch(n_sites, latency, max_workers):
+    SlowArchive.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowArchive)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    data_ingestion.OPEN_METEO_ARCHIVE_URL = (
+        f"http://127.0.0.1:{server.server_port}/v1/archive"
+    )
+    sites = make_sites(n_sites)
+    window = ("2024-01-01", "2024-01-31")
+
+    try:
+        start = time.perf_counter()
+        for latitude, longitude in sites:
+            fetch_weather_data(*window, False, latitude, longitude)
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        frames = fetch_locations_weather(
+            sites, *window, use_cache=False, max_workers=max_workers
+        )
+        concurrent = time.perf_counter() - start
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert all(len(frame) == 31 * 24 for frame in frames.values())
+    print(
+        f"{n_sites} sites (latence {latency * 1000:.0f} ms) : un par un {sequential:.2f}s, "
+        f"en parallèle ({max_workers} threads) {concurrent:.2f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sites", type=int, nargs="+", default=[10, 100, 300])
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--fetch-sites", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--max-workers", type=int, default=8)
+    args = parser.parse_args()
+
+    for n_sites in args.sites:
+        bench_reads(n_sites, args.days)
+    bench_fetch(args.fetch_sites, args.latency, args.max_workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark de l'assemblage des résultats de predict() : boucle ligne à ligne
+(ancienne implémentation) vs construction colonne par colonne.
+
+Vérifie aussi que les deux DataFrames sont identiques (hors created_at).
+
+Usage :
+    python benchmarks/bench_predict_assembly.py --rows 10000 100000 1000000
+"""
+
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from model.predict_series import build_prediction_frame
+
+
+def build_with_loop(X, y, y_pred, latitude, longitude):
+    results = []
+    for i in range(len(y_pred)):
+        row = {
+            "prediction": y_pred[i],
+            "timestamp": (
+                X.index[i]
+                if hasattr(X, "index") and len(X.index) == len(y_pred)
+                else None
+            ),
+            "created_at": pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+        for col in ["relative_humidity", "precipitation", "surface_pressure"]:
+            if col in X.columns:
+                row[col] = X[col].iloc[i]
+
+        row["latitude"] = latitude
+        row["longitude"] = longitude
+
+        if isinstance(y, pd.Series) or isinstance(y, pd.DataFrame):
+            if len(y) == len(y_pred):
+                row["real"] = y.iloc[i]
+
+        results.append(row)
+
+    return pd.DataFrame(results)
+
+
+def make_forecast_window(rows):
+    rng = np.random.default_rng(42)
+    index = pd.date_range("2000-01-01", periods=rows, freq="3h", name="timestamp")
+    X = pd.DataFrame(
+        {
+            "relative_humidity": rng.uniform(30, 100, rows),
+            "precipitation": rng.exponential(0.3, rows),
+            "surface_pressure": rng.normal(1010, 8, rows),
+        },
+        index=index,
+    )
+    y = pd.Series(rng.normal(12, 6, rows), index=index, name="temperature_2m")
+    y_pred = y.to_numpy() + rng.normal(0, 1, rows)
+    return X, y, y_pred
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument(
+        "--loop-max-rows",
+        type=int,
+        default=100_000,
+        help="au-delà, la boucle est extrapolée depuis cette taille",
+    )
+    args = parser.parse_args()
+
+    latitude, longitude = np.float64(48.8566), np.float64(2.3522)
+
+    for rows in args.rows:
+        X, y, y_pred = make_forecast_window(rows)
+
+        start = time.perf_counter()
+        vectorized = build_prediction_frame(X, y, y_pred, latitude, longitude)
+        vectorized_seconds = time.perf_counter() - start
+
+        loop_rows = min(rows, args.loop_max_rows)
+        start = time.perf_counter()
+        looped = build_with_loop(
+            X.iloc[:loop_rows],
+            y.iloc[:loop_rows],
+            y_pred[:loop_rows],
+            latitude,
+            longitude,
+        )
+        loop_seconds = (time.perf_counter() - start) * rows / loop_rows
+
+        pd.testing.assert_frame_equal(
+            vectorized.iloc[:loop_rows].drop(columns="created_at"),
+            looped.drop(columns="created_at"),
+        )
+
+        estimate = " (extrapolé)" if loop_rows < rows else ""
+        print(
+            f"{rows:>9} lignes : boucle {loop_seconds:.2f}s{estimate}, "
+            f"colonnes {vectorized_seconds * 1000:.1f} ms, "
+            f"x{loop_seconds / vectorized_seconds:.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
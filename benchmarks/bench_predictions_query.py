@@ -0,0 +1,115 @@
+"""
+Benchmark de /predictions : lecture ORM de toutes les prédictions + RMSE en
+Python (implémentation d'origine) vs métriques calculées par SQLite et
+première page lue par clé, puis parcours complet en NDJSON.
+
+Usage :
+    python benchmarks/bench_predictions_query.py --rows 500000
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from sqlalchemy.orm import sessionmaker
+from sklearn.metrics import mean_squared_error
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from data.db_class import Prediction
+from data.data_access import (
+    prediction_metrics,
+    load_predictions_page,
+    iter_prediction_frames,
+)
+from model.predict_series import save_predictions_to_db
+from benchmarks.bench_ingestion import fresh_engine
+
+
+def orm_predictions(engine, start, end):
+    session = sessionmaker(bind=engine)()
+    predictions = (
+        session.query(Prediction)
+        .filter(Prediction.timestamp >= start, Prediction.timestamp < end)
+        .all()
+    )
+    rows = [
+        {
+            "id": pred.id,
+            "timestamp": pred.timestamp,
+            "valeur_reelle": pred.real,
+            "valeur_prevue": pred.prediction,
+        }
+        for pred in predictions
+    ]
+    rmse = np.sqrt(
+        mean_squared_error(
+            [row["valeur_reelle"] for row in rows],
+            [row["valeur_prevue"] for row in rows],
+        )
+    )
+    session.close()
+    return rmse, rows
+
+
+def measured(func):
+    """Durée, puis pic mémoire sur une seconde exécution (tracemalloc ralentit)."""
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 1024**2
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame(
+        {
+            "timestamp": pd.date_range("2000-01-01", periods=args.rows, freq="3h"),
+            "prediction": rng.normal(12, 6, args.rows),
+            "real": rng.normal(12, 6, args.rows),
+            "latitude": 48.8566,
+            "longitude": 2.3522,
+        }
+    )
+    start, end = frame["timestamp"].iloc[0], frame["timestamp"].iloc[-1]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = fresh_engine(tmp_dir, "predictions")
+        save_predictions_to_db(frame, 1, engine=engine)
+
+        for label, func in [
+            ("ORM + RMSE Python", lambda: orm_predictions(engine, start, end)),
+            (
+                "métriques SQL + page de 1000",
+                lambda: (
+                    prediction_metrics(start, end, engine=engine),
+                    load_predictions_page(start, end, engine=engine),
+                ),
+            ),
+            (
+                "flux NDJSON complet",
+                lambda: sum(
+                    len(page.to_json(orient="records", lines=True, double_precision=15))
+                    for page in iter_prediction_frames(start, end, engine=engine)
+                ),
+            ),
+        ]:
+            seconds, peak = measured(func)
+            print(f"{label:30s} {seconds:6.2f}s  pic mémoire {peak:7.1f} Mo")
+
+
+if __name__ == "__main__":
+    main()
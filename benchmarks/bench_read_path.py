@@ -0,0 +1,88 @@
+"""
+Benchmark du chargement des données d'entraînement (/train_model).
+
+Compare la lecture ORM (query.all() + liste de dicts + DataFrame) et la lecture
+colonnaire de data.data_access, en temps et en pic mémoire (tracemalloc).
+
+Usage :
+    python benchmarks/bench_read_path.py --years 10
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+import pandas as pd
+from pathlib import Path
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from data.db_init import Base
+from data.db_class import RealTemperature
+from data.data_ingestion import bulk_save_weather_data
+from data.data_access import load_real_temperature
+from benchmarks.bench_ingestion import make_weather_frame
+
+
+def load_with_orm(engine):
+    session = sessionmaker(bind=engine)()
+    try:
+        results = session.query(RealTemperature).all()
+        return pd.DataFrame(
+            [
+                {
+                    "timestamp": item.timestamp,
+                    "temperature_2m": float(item.temperature_2m),
+                    "relative_humidity": float(item.relative_humidity),
+                    "precipitation": float(item.precipitation),
+                    "surface_pressure": float(item.surface_pressure),
+                    "latitude": float(item.latitude),
+                    "longitude": float(item.longitude),
+                }
+                for item in results
+            ]
+        )
+    finally:
+        session.close()
+
+
+def measure(name, func):
+    start = time.perf_counter()
+    df = func()
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{name:28s} : {len(df)} lignes, {seconds:.2f}s, "
+        f"pic mémoire {peak / 1e6:.1f} Mo, DataFrame {df.memory_usage().sum() / 1e6:.1f} Mo"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=10)
+    args = parser.parse_args()
+
+    rows = args.years * 365 * 24
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{tmp_dir}/bench.db")
+        Base.metadata.create_all(bind=engine)
+        bulk_save_weather_data(make_weather_frame(rows), engine=engine)
+
+        measure("ORM (query.all)", lambda: load_with_orm(engine))
+        measure("colonnaire", lambda: load_real_temperature(engine=engine))
+        measure(
+            "colonnaire par blocs (20k)",
+            lambda: load_real_temperature(chunksize=20_000, engine=engine),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark des formats de réponse de /predict, /predictions et /history :
+to_dict(orient="records") + encodeur FastAPI (ancienne réponse) vs JSON orjson,
+NDJSON, Arrow IPC et Parquet, sur des séries de prédictions de 1 à 10 ans.
+
+Usage :
+    python benchmarks/bench_response_formats.py --years 1 10
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from fastapi.encoders import jsonable_encoder
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from api.formats import frames_response, available_formats
+
+
+def make_predictions_frame(rows):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "prediction": rng.normal(15, 5, rows),
+            "timestamp": pd.date_range("2015-01-01", periods=rows, freq="3h"),
+            "created_at": "2025-01-01 00:00:00",
+            "relative_humidity": rng.uniform(40, 100, rows),
+            "precipitation": rng.exponential(0.2, rows),
+            "surface_pressure": rng.normal(1010, 5, rows),
+            "latitude": 48.8566,
+            "longitude": 2.3522,
+            "real": rng.normal(15, 5, rows),
+        }
+    )
+
+
+def legacy_json(frame):
+    # Réponse d'origine : dicts Python, jsonable_encoder puis json.dumps (FastAPI)
+    return json.dumps(jsonable_encoder(frame.to_dict(orient="records"))).encode()
+
+
+def streamed(frame, response_format, chunksize=5000):
+    frames = (
+        frame.iloc[start : start + chunksize]
+        for start in range(0, len(frame), chunksize)
+    )
+    response = frames_response(frames, response_format)
+
+    async def read():
+        return b"".join([chunk async for chunk in response.body_iterator])
+
+    return asyncio.run(read())
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    body = function(*args)
+    return time.perf_counter() - start, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 10])
+    args = parser.parse_args()
+
+    for years in args.years:
+        frame = make_predictions_frame(years * 365 * 8)
+        print(f"{len(frame)} prédictions ({years} an(s))")
+
+        seconds, size = timed(legacy_json, frame)
+        print(f"  {'to_dict + FastAPI':20s} {seconds:7.3f}s {size / 1e6:8.2f} Mo")
+        for response_format in available_formats():
+            seconds, size = timed(streamed, frame, response_format)
+            print(f"  {response_format:20s} {seconds:7.3f}s {size / 1e6:8.2f} Mo")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark du schéma RealTemperature : ancien schéma texte vs schéma typé.
+
+Mesure l'insertion par lots et des requêtes par période (site + fenêtre de 30 jours).
+
+Usage :
+    python benchmarks/bench_schema.py --rows 100000 --queries 200
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+from pathlib import Path
+from sqlalchemy import (
+    create_engine,
+    select,
+    func,
+    MetaData,
+    Table,
+    Column,
+    Integer,
+    String,
+    UniqueConstraint,
+)
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from data.db_init import Base
+from data.db_class import RealTemperature
+from data.db_bulk import bulk_insert_ignore, to_epoch_seconds, frame_to_records
+from benchmarks.bench_ingestion import make_weather_frame
+
+legacy_metadata = MetaData()
+LegacyRealTemperature = Table(
+    "RealTemperature",
+    legacy_metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("timestamp", String, index=True),
+    Column("temperature_2m", String, index=True),
+    Column("relative_humidity", String, index=True),
+    Column("precipitation", String, index=True),
+    Column("surface_pressure", String, index=True),
+    Column("latitude", String, index=True),
+    Column("longitude", String, index=True),
+    UniqueConstraint(
+        "timestamp",
+        "latitude",
+        "longitude",
+        name="unique_timestamp_latitude_longitude",
+    ),
+)
+
+
+def legacy_records(df):
+    records = df.drop(columns=["timestamp"]).astype(float).astype(str)
+    records["timestamp"] = df["timestamp"].dt.strftime("%Y-%m-%d %H:%M:%S")
+    return records.to_dict(orient="records")
+
+
+def typed_records(df):
+    records = df.copy()
+    records["timestamp"] = to_epoch_seconds(df["timestamp"])
+    return frame_to_records(records)
+
+
+def time_inserts(engine, table, records):
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        bulk_insert_ignore(connection, table, records)
+    return time.perf_counter() - start
+
+
+def time_range_queries(engine, windows, make_filter):
+    start = time.perf_counter()
+    rows = 0
+    with engine.connect() as connection:
+        for window_start, window_end in windows:
+            result = connection.execute(make_filter(window_start, window_end))
+            rows += len(result.fetchall())
+    return time.perf_counter() - start, rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    df = make_weather_frame(args.rows)
+    rng = np.random.default_rng(0)
+    starts = rng.choice(df["timestamp"].iloc[: -24 * 30].values, args.queries)
+    windows = [
+        (ts, ts + np.timedelta64(30, "D")) for ts in starts.astype("datetime64[s]")
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy_engine = create_engine(f"sqlite:///{tmp_dir}/legacy.db")
+        legacy_metadata.create_all(bind=legacy_engine)
+        typed_engine = create_engine(f"sqlite:///{tmp_dir}/typed.db")
+        Base.metadata.create_all(bind=typed_engine)
+
+        legacy_insert = time_inserts(
+            legacy_engine, LegacyRealTemperature, legacy_records(df)
+        )
+        typed_insert = time_inserts(
+            typed_engine, RealTemperature.__table__, typed_records(df)
+        )
+
+        legacy_table = LegacyRealTemperature.c
+        legacy_query, legacy_rows = time_range_queries(
+            legacy_engine,
+            [(str(a).replace("T", " "), str(b).replace("T", " ")) for a, b in windows],
+            lambda a, b: select(LegacyRealTemperature).where(
+                legacy_table.latitude == "48.8566",
+                legacy_table.longitude == "2.3522",
+                legacy_table.timestamp >= a,
+                legacy_table.timestamp < b,
+            ),
+        )
+        typed_query, typed_rows = time_range_queries(
+            typed_engine,
+            [(int(a.astype("int64")), int(b.astype("int64"))) for a, b in windows],
+            lambda a, b: select(RealTemperature.__table__).where(
+                RealTemperature.latitude == 48.8566,
+                RealTemperature.longitude == 2.3522,
+                RealTemperature.timestamp >= a,
+                RealTemperature.timestamp < b,
+            ),
+        )
+
+        for name, engine, table in [
+            ("legacy", legacy_engine, LegacyRealTemperature),
+            ("typed", typed_engine, RealTemperature.__table__),
+        ]:
+            with engine.connect() as connection:
+                connection.exec_driver_sql("VACUUM")
+                count = connection.execute(
+                    select(func.count()).select_from(table)
+                ).scalar()
+            size = Path(f"{tmp_dir}/{name}.db").stat().st_size
+            print(f"{name:6s} : {count} lignes, fichier {size / 1e6:.1f} Mo")
+
+    print(
+        f"insertion {args.rows} lignes : ancien {legacy_insert:.2f}s, "
+        f"typé {typed_insert:.2f}s (x{legacy_insert / typed_insert:.1f})"
+    )
+    print(
+        f"{args.queries} requêtes de 30 jours : ancien {legacy_query:.2f}s "
+        f"({legacy_rows} lignes), typé {typed_query:.2f}s ({typed_rows} lignes) "
+        f"(x{legacy_query / typed_query:.1f})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark de l'index de similarité (model/similarity_index.py) sur le split
+train (21 004 lignes) : recherche par force brute (produit complet puis tri)
+vs index exact par blocs vs index IVF (1 à 32 listes parcourues), rappel@k
+par rapport à la force brute et latence par requête.
+
+Usage :
+    python benchmarks/bench_similarity.py --modality text --queries 1000 --k 10
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from model.feature_store import feature_store
+from model.similarity_index import ExactIndex, IVFIndex, normalize
+
+
+def brute_force(vectors, queries, k):
+    scores = normalize(queries) @ vectors.T
+    rows = np.argsort(-scores, axis=1)[:, :k]
+    return np.take_along_axis(scores, rows, axis=1), rows
+
+
+def recall(scores, expected_scores):
+    # Voisins corrects : score au moins égal au k-ième score exact (ex aequo
+    # comptés comme corrects)
+    threshold = expected_scores[:, -1:] - 1e-6
+    return float((scores >= threshold).mean())
+
+
+def latency(search, queries, **options):
+    start = time.perf_counter()
+    for query in queries:
+        search(query[None], **options)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--split", default="train")
+    parser.add_argument("--modality", default="text")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    features = feature_store.features(args.split, args.modality)
+    ids = feature_store.image_ids(args.split)
+    rng = np.random.default_rng(0)
+    queries = np.asarray(features[rng.choice(len(features), args.queries)])
+
+    start = time.perf_counter()
+    exact = ExactIndex.build(features, ids)
+    exact_build = time.perf_counter() - start
+    start = time.perf_counter()
+    ivf = IVFIndex.build(features, ids)
+    ivf_build = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        ivf.save(tmp_dir)
+        start = time.perf_counter()
+        IVFIndex.load(tmp_dir)
+        load_seconds = time.perf_counter() - start
+
+    print(
+        f"{len(features)} lignes ({args.split}, {args.modality}), {args.queries} requêtes, k={args.k}"
+    )
+    print(
+        f"construction : exact {exact_build * 1000:.1f} ms, IVF ({len(ivf.centroids)} listes) "
+        f"{ivf_build * 1000:.1f} ms ; chargement IVF enregistré {load_seconds * 1000:.1f} ms"
+    )
+
+    start = time.perf_counter()
+    expected_scores, _ = brute_force(exact.vectors, queries, args.k)
+    batch = time.perf_counter() - start
+    single = latency(
+        lambda query: brute_force(exact.vectors, query, args.k), queries[:200]
+    )
+    print(
+        f"  {'force brute':22s} rappel 1.000  {single:6.3f} ms/requête  "
+        f"lot {args.queries / batch:9.0f} requêtes/s"
+    )
+
+    start = time.perf_counter()
+    scores, _ = exact.search(queries, args.k)
+    batch = time.perf_counter() - start
+    single = latency(exact.search, queries[:200], k=args.k)
+    print(
+        f"  {'exact par blocs':22s} rappel {recall(scores, expected_scores):.3f}  "
+        f"{single:6.3f} ms/requête  lot {args.queries / batch:9.0f} requêtes/s"
+    )
+
+    for n_probe in args.probes:
+        start = time.perf_counter()
+        scores, _ = ivf.search(queries, args.k, n_probe=n_probe)
+        batch = time.perf_counter() - start
+        print(
+            f"  {f'IVF n_probe={n_probe}':22s} rappel {recall(scores, expected_scores):.3f}  "
+            f"{batch / args.queries * 1000:6.3f} ms/requête"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark de /classify/text (légendes de data/image_classification/split_train.csv) :
+ - débit de TextClassifier.predict_proba par lots de 1, 32 et 256 légendes,
+   comparé à OneVsRestClassifier.predict_proba de sklearn ;
+ - débit de clients concurrents envoyant une légende par requête, regroupées
+   par MicroBatcher (taille maximale de lot 1, 32 et 256).
+
+Sans le fichier GloVe (GLOVE_PATH), des vecteurs aléatoires sont générés pour
+le vocabulaire des légendes : les probabilités n'ont alors pas de sens, mais
+le coût du calcul est le même.
+
+Usage :
+    python benchmarks/bench_text_classification.py --batch-sizes 1 32 256 --clients 64
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import warnings
+import numpy as np
+import pandas as pd
+import joblib
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from model.micro_batch import MicroBatcher
+from model.text_classification import (
+    GLOVE_PATH,
+    TEXT_MODEL_PATH,
+    TextClassifier,
+    load_glove,
+    preprocess_caption,
+)
+
+CAPTIONS_PATH = "data/image_classification/split_train.csv"
+
+
+def synthetic_glove(captions, directory):
+    words = sorted(
+        {token for caption in captions for token in preprocess_caption(caption)}
+    )
+    rng = np.random.default_rng(0)
+    path = os.path.join(directory, "glove.synthetic.300d.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        for word in words:
+            values = " ".join(f"{v:.5f}" for v in rng.normal(0, 0.4, 300))
+            f.write(f"{word} {values}\n")
+    return path
+
+
+def sklearn_predict_proba(classifier, captions):
+    X = classifier.embed(captions)
+    return classifier.model.predict_proba(
+        pd.DataFrame(X, columns=classifier.model.feature_names_in_)
+    )
+
+
+def bench_direct(classifier, captions, batch_size, n_captions):
+    batches = [
+        captions[start : start + batch_size]
+        for start in range(0, n_captions, batch_size)
+    ]
+    rates = {}
+    for name, function in [
+        ("sklearn", lambda batch: sklearn_predict_proba(classifier, batch)),
+        ("TextClassifier", classifier.predict_proba),
+    ]:
+        start = time.perf_counter()
+        for batch in batches:
+            function(batch)
+        rates[name] = n_captions / (time.perf_counter() - start)
+    print(
+        f"  lots de {batch_size:3d} : sklearn {rates['sklearn']:9.0f} légendes/s, "
+        f"TextClassifier {rates['TextClassifier']:9.0f} légendes/s"
+    )
+
+
+def bench_concurrent(classifier, captions, batch_size, clients, n_requests):
+    batcher = MicroBatcher(
+        classifier.predict_proba, max_batch_size=batch_size, max_wait=0.005
+    )
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        start = time.perf_counter()
+        list(executor.map(lambda caption: batcher([caption]), captions[:n_requests]))
+        elapsed = time.perf_counter() - start
+    stats = batcher.stats()
+    batcher.close()
+    print(
+        f"  {clients} clients, lots <= {batch_size:3d} : {n_requests / elapsed:8.0f} requêtes/s "
+        f"(lot moyen {stats['mean_batch_items']:.1f})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32, 256])
+    parser.add_argument("--captions", type=int, default=4096)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=4096)
+    args = parser.parse_args()
+
+    captions = pd.read_csv(CAPTIONS_PATH)["Caption"].astype(str).tolist()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        glove_path = GLOVE_PATH
+        if not os.path.exists(glove_path):
+            print(f"{glove_path} absent : vecteurs aléatoires")
+            glove_path = synthetic_glove(captions, tmp_dir)
+        vocab, vectors = load_glove(glove_path)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            model = joblib.load(TEXT_MODEL_PATH)
+        classifier = TextClassifier(model, vocab, vectors)
+
+        print("predict_proba direct")
+        for batch_size in args.batch_sizes:
+            bench_direct(classifier, captions, batch_size, args.captions)
+
+        print("Requêtes concurrentes d'une légende (MicroBatcher)")
+        for batch_size in args.batch_sizes:
+            bench_concurrent(
+                classifier, captions, batch_size, args.clients, args.requests
+            )
+
+
+if __name__ == "__main__":
+    main()
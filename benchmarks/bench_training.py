@@ -0,0 +1,67 @@
+"""
+Benchmark des modes d'entraînement : forêt aléatoire sur 1 cœur vs tous les
+cœurs, HistGradientBoosting, et ajout d'arbres (warm start) à une forêt existante
+sur un mois de nouvelles données au lieu d'un réentraînement complet.
+
+Usage :
+    python benchmarks/bench_training.py --years 5
+"""
+
+import sys
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from model.feature_engine import build_features
+from model.predict_series import build_estimator
+from benchmarks.bench_ingestion import make_weather_frame
+
+
+def timed_fit(model, X, y):
+    start = time.perf_counter()
+    model.fit(X, y)
+    return time.perf_counter() - start
+
+
+def rmse(model, X, y):
+    return float(np.sqrt(np.mean((model.predict(X) - y.to_numpy()) ** 2)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--add-estimators", type=int, default=50)
+    args = parser.parse_args()
+
+    X, y = build_features(make_weather_frame(args.years * 365 * 24))
+    # Dernier mois (240 créneaux de 3h) : nouvelles données / jeu de test
+    X_old, y_old, X_new, y_new = X[:-240], y[:-240], X[-240:], y[-240:]
+    print(f"{len(X_old)} créneaux d'entraînement, {len(X_new)} nouveaux")
+
+    for label, backend, n_jobs in [
+        ("forêt aléatoire, n_jobs=1", "random_forest", 1),
+        ("forêt aléatoire, n_jobs=-1", "random_forest", -1),
+        ("HistGradientBoosting", "hist_gradient_boosting", None),
+    ]:
+        model = build_estimator(backend, n_jobs)
+        seconds = timed_fit(model, X_old, y_old)
+        print(f"{label:30s} {seconds:7.2f}s  RMSE {rmse(model, X_new, y_new):.3f}")
+
+    forest = build_estimator("random_forest", -1)
+    forest.fit(X_old, y_old)
+    full_seconds = timed_fit(build_estimator("random_forest", -1), X, y)
+    forest.set_params(
+        warm_start=True, n_estimators=forest.n_estimators + args.add_estimators
+    )
+    warm_seconds = timed_fit(forest, X_new, y_new)
+    print(
+        f"réentraînement complet {full_seconds:.2f}s, "
+        f"warm start (+{args.add_estimators} arbres) {warm_seconds:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
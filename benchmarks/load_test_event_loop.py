@@ -0,0 +1,125 @@
+"""
+Test de charge : latence de /models pendant des appels lents à /fetch_data et /predict.
+
+Open-Meteo et l'inférence sont remplacés par des fonctions bloquantes
+(time.sleep) ; la base est une base SQLite temporaire contenant un modèle.
+Si les routes bloquantes occupaient la boucle d'événements, la latence de
+/models suivrait la durée de ces appels.
+
+Usage :
+    python benchmarks/load_test_event_loop.py --inflight 8 --delay 1.0
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+import pandas as pd
+from pathlib import Path
+from unittest.mock import patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import httpx
+from data.db_init import Base
+from data.db_class import Model
+from api.main import app
+
+
+def slow_fetch(delay):
+    def fetch(start_date, end_date=None, **kwargs):
+        time.sleep(delay)
+        return pd.DataFrame(
+            {"timestamp": pd.date_range(start=start_date, periods=24, freq="h")}
+        )
+
+    return fetch
+
+
+def slow_predict(delay):
+    def predict(path, data, **kwargs):
+        time.sleep(delay)
+        return pd.DataFrame({"prediction": [20.0] * 8})
+
+    return predict
+
+
+async def timed_get(client, url):
+    start = time.perf_counter()
+    await client.get(url)
+    return time.perf_counter() - start
+
+
+async def run(inflight, delay):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        idle = [await timed_get(client, "/models") for _ in range(20)]
+
+        body = {"start_date": "2030-01-01", "end_date": "2030-01-02"}
+        slow_calls = [
+            client.post("/fetch_data", json=body) for _ in range(inflight)
+        ] + [
+            client.post("/predict", json={**body, "model_id": 1})
+            for _ in range(inflight)
+        ]
+        slow_tasks = [asyncio.ensure_future(call) for call in slow_calls]
+
+        # Sondes /models planifiées toutes les 50 ms pendant les appels lents ;
+        # la latence est mesurée depuis l'instant prévu de la sonde
+        interval = 0.05
+        t0 = time.perf_counter()
+
+        async def probe(i):
+            planned = t0 + interval * (i + 1)
+            await asyncio.sleep(max(0.0, planned - time.perf_counter()))
+            await client.get("/models")
+            return time.perf_counter() - planned
+
+        probes = [probe(i) for i in range(int(delay / interval))]
+        loaded = await asyncio.gather(*probes)
+        await asyncio.gather(*slow_tasks)
+
+    return idle, loaded
+
+
+def summary(name, samples):
+    samples = sorted(samples)
+    p95 = samples[int(0.95 * (len(samples) - 1))]
+    print(
+        f"{name:34s} : {len(samples)} requêtes, "
+        f"médiane {statistics.median(samples) * 1000:.1f} ms, "
+        f"p95 {p95 * 1000:.1f} ms, max {samples[-1] * 1000:.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--inflight", type=int, default=8)
+    parser.add_argument("--delay", type=float, default=1.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{tmp_dir}/load.db")
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        session.add(Model(name="Stub", version="1", path="model/registry/stub.pkl"))
+        session.commit()
+        session.close()
+
+        with patch("api.main.get_engine", return_value=engine), patch(
+            "api.main.fetch_weather_data", slow_fetch(args.delay)
+        ), patch("api.main.save_weather_data_to_db", return_value="ok"), patch(
+            "api.main.predict", slow_predict(args.delay)
+        ):
+            idle, loaded = asyncio.run(run(args.inflight, args.delay))
+
+    summary("/models au repos", idle)
+    summary(f"/models avec {2 * args.inflight} appels lents", loaded)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Tables agrégées RealTemperature3h et RealTemperatureDaily.
+
+Elles sont mises à jour à chaque enregistrement de relevés horaires : seuls les
+créneaux (et jours) touchés par les nouveaux relevés sont recalculés, à partir
+de tous les relevés horaires de ces créneaux déjà en base.
+
+Usage (reconstruction complète, par exemple sur une base existante) :
+    python -m data.aggregates [--db data/sql_app.db]
+"""
+
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from sqlalchemy import create_engine, select, func, Integer, type_coerce
+from sqlalchemy.dialects.sqlite import insert
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from data.db_init import get_engine, DB_PATH
+from data.db_class import RealTemperature, RealTemperature3h, RealTemperatureDaily
+from data.db_bulk import to_epoch_seconds, frame_to_records, DEFAULT_BATCH_SIZE
+from data.resampling import MEASURE_COLUMNS, resample_3h
+
+BUCKET_SECONDS = 3 * 3600
+DAY_SECONDS = 24 * 3600
+
+# Mise à jour des agrégats journaliers en plus des créneaux de 3h
+AGGREGATE_DAILY = os.environ.get("AGGREGATE_DAILY", "1") == "1"
+
+
+def _read_hourly(connection, latitude, longitude, start, end):
+    """Relevés horaires d'un site sur [start, end[ (secondes epoch), dans l'ordre d'insertion."""
+    table = RealTemperature.__table__
+    statement = (
+        select(
+            type_coerce(table.c.timestamp, Integer).label("timestamp"),
+            *[table.c[col] for col in MEASURE_COLUMNS],
+        )
+        .where(
+            table.c.latitude == latitude,
+            table.c.longitude == longitude,
+            table.c.timestamp >= start,
+            table.c.timestamp < end,
+        )
+        .order_by(table.c.id)
+    )
+    rows = connection.execute(statement).all()
+    frame = pd.DataFrame(rows, columns=["timestamp"] + MEASURE_COLUMNS)
+    return frame.astype({col: "float64" for col in MEASURE_COLUMNS})
+
+
+def _upsert(connection, table, records, batch_size=DEFAULT_BATCH_SIZE):
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=["latitude", "longitude", "timestamp"],
+        set_={
+            col.name: statement.excluded[col.name]
+            for col in table.columns
+            if col.name not in ("id", "latitude", "longitude", "timestamp")
+        },
+    )
+    for start in range(0, len(records), batch_size):
+        connection.execute(statement, records[start : start + batch_size])
+
+
+def _aggregate_3h(hourly, buckets, latitude, longitude):
+    """Lignes RealTemperature3h des créneaux `buckets` (secondes epoch)."""
+    timestamps = hourly["timestamp"].to_numpy(dtype=np.int64) * 10**9
+    values = hourly[MEASURE_COLUMNS].to_numpy(dtype=np.float64)
+
+    # Même agrégation (et mêmes arrondis) que preprocess_data
+    slots, means = resample_3h(timestamps, values)
+    slots //= 10**9
+    counts = np.bincount(
+        np.searchsorted(slots, timestamps // 10**9 // BUCKET_SECONDS * BUCKET_SECONDS),
+        minlength=len(slots),
+    )
+
+    frame = pd.DataFrame(means, columns=MEASURE_COLUMNS)
+    frame.insert(0, "timestamp", slots)
+    frame["latitude"] = latitude
+    frame["longitude"] = longitude
+    frame["n_observations"] = counts
+    return frame[np.isin(slots, buckets)]
+
+
+def _aggregate_daily(hourly, days, latitude, longitude):
+    hourly = hourly.assign(day=hourly["timestamp"] // DAY_SECONDS * DAY_SECONDS)
+    grouped = hourly.groupby("day")
+    frame = grouped[MEASURE_COLUMNS].mean()
+    frame["temperature_2m_min"] = grouped["temperature_2m"].min()
+    frame["temperature_2m_max"] = grouped["temperature_2m"].max()
+    frame["precipitation"] = grouped["precipitation"].sum(min_count=1)
+    frame["n_observations"] = grouped.size()
+    frame = frame.rename_axis("timestamp").reset_index()
+    frame["latitude"] = latitude
+    frame["longitude"] = longitude
+    return frame[frame["timestamp"].isin(days)]
+
+
+def refresh_aggregates(connection, df, daily=AGGREGATE_DAILY):
+    """
+    Recalcule les créneaux de 3h (et les jours) touchés par les relevés de `df`.
+
+    Doit être appelée dans la transaction qui a inséré les relevés.
+
+    Returns:
+        int: nombre de créneaux de 3h mis à jour
+    """
+    if df.empty:
+        return 0
+
+    touched = pd.DataFrame(
+        {
+            "timestamp": to_epoch_seconds(df["timestamp"]).values,
+            "latitude": df["latitude"].astype(float).values,
+            "longitude": df["longitude"].astype(float).values,
+        }
+    )
+
+    updated = 0
+    for (latitude, longitude), group in touched.groupby(["latitude", "longitude"]):
+        epoch = group["timestamp"].to_numpy()
+        buckets = np.unique(epoch // BUCKET_SECONDS * BUCKET_SECONDS)
+        days = np.unique(epoch // DAY_SECONDS * DAY_SECONDS)
+
+        # Les jours englobent les créneaux de 3h : une seule lecture suffit
+        if daily:
+            start, end = days[0], days[-1] + DAY_SECONDS
+        else:
+            start, end = buckets[0], buckets[-1] + BUCKET_SECONDS
+        hourly = _read_hourly(connection, latitude, longitude, int(start), int(end))
+        if hourly.empty:
+            continue
+
+        rows_3h = _aggregate_3h(hourly, buckets, latitude, longitude)
+        _upsert(connection, RealTemperature3h.__table__, frame_to_records(rows_3h))
+        updated += len(rows_3h)
+
+        if daily:
+            rows_daily = _aggregate_daily(hourly, days, latitude, longitude)
+            _upsert(
+                connection, RealTemperatureDaily.__table__, frame_to_records(rows_daily)
+            )
+
+    return updated
+
+
+def needs_rebuild(engine=None):
+    """Vrai si des relevés horaires existent sans agrégats (base antérieure aux tables agrégées)."""
+    engine = engine or get_engine()
+    with engine.connect() as connection:
+        aggregated = connection.execute(
+            select(func.count()).select_from(RealTemperature3h.__table__)
+        ).scalar()
+        if aggregated:
+            return False
+        hourly = connection.execute(
+            select(func.count()).select_from(RealTemperature.__table__)
+        ).scalar()
+    return hourly > 0
+
+
+def rebuild_aggregates(engine=None, chunksize=200_000, daily=AGGREGATE_DAILY):
+    """Recalcule entièrement les tables agrégées à partir de RealTemperature."""
+    engine = engine or get_engine()
+    with engine.begin() as connection:
+        connection.execute(RealTemperature3h.__table__.delete())
+        connection.execute(RealTemperatureDaily.__table__.delete())
+
+    # Lecture par blocs d'identifiants, chaque bloc dans sa propre transaction :
+    # pas de curseur de lecture ouvert pendant les écritures (verrou SQLite)
+    table = RealTemperature.__table__
+    last_id, updated = 0, 0
+    while True:
+        with engine.begin() as connection:
+            chunk = pd.DataFrame(
+                connection.execute(
+                    select(
+                        table.c.id,
+                        type_coerce(table.c.timestamp, Integer).label("timestamp"),
+                        table.c.latitude,
+                        table.c.longitude,
+                    )
+                    .where(table.c.id > last_id)
+                    .order_by(table.c.id)
+                    .limit(chunksize)
+                ).all(),
+                columns=["id", "timestamp", "latitude", "longitude"],
+            )
+            if chunk.empty:
+                break
+            last_id = int(chunk["id"].iloc[-1])
+            chunk["timestamp"] = pd.to_datetime(chunk["timestamp"], unit="s")
+            updated += refresh_aggregates(connection, chunk, daily=daily)
+
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default=DB_PATH, help="Chemin de la base SQLite")
+    args = parser.parse_args()
+
+    engine = create_engine(f"sqlite:///{args.db}")
+    RealTemperature3h.__table__.create(bind=engine, checkfirst=True)
+    RealTemperatureDaily.__table__.create(bind=engine, checkfirst=True)
+
+    updated = rebuild_aggregates(engine)
+    print(f"{updated} créneaux de 3h recalculés")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+
+# Configuration du cache via les variables d'environnement
+ARCHIVE_CACHE_DIR = os.environ.get(
+    "ARCHIVE_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive_cache"),
+)
+ARCHIVE_CACHE_MAX_BYTES = int(
+    os.environ.get("ARCHIVE_CACHE_MAX_BYTES", str(512 * 1024**2))
+)
+ARCHIVE_CACHE_ENABLED = os.environ.get("ARCHIVE_CACHE_ENABLED", "1") == "1"
+
+# Les derniers jours de l'archive sont encore complétés par Open-Meteo :
+# seuls les mois terminés depuis au moins ce délai sont mis en cache
+ARCHIVE_CACHE_MIN_AGE_DAYS = int(os.environ.get("ARCHIVE_CACHE_MIN_AGE_DAYS", "7"))
+
+
+class ArchiveCache:
+    """
+    Cache sur disque des réponses de l'API d'archive, par mois calendaire.
+
+    Chaque entrée est un fichier .npz nommé par l'empreinte SHA-256 de la
+    requête (latitude, longitude, variables, mois). L'éviction supprime les
+    fichiers les moins récemment lus dès que la taille totale dépasse le budget.
+    """
+
+    def __init__(
+        self,
+        cache_dir=ARCHIVE_CACHE_DIR,
+        max_bytes=ARCHIVE_CACHE_MAX_BYTES,
+        enabled=ARCHIVE_CACHE_ENABLED,
+        min_age_days=ARCHIVE_CACHE_MIN_AGE_DAYS,
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.min_age_days = min_age_days
+        self._lock = threading.Lock()
+        self._size_bytes = None
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.writes = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(latitude, longitude, variables, start_date, end_date):
+        content = json.dumps(
+            {
+                "latitude": float(latitude),
+                "longitude": float(longitude),
+                "variables": list(variables),
+                "start_date": start_date,
+                "end_date": end_date,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.npz")
+
+    def is_cacheable(self, end_date):
+        """Un mois n'est mis en cache que s'il ne peut plus être modifié."""
+        cutoff = datetime.now().date() - timedelta(days=self.min_age_days)
+        return datetime.strptime(end_date, "%Y-%m-%d").date() <= cutoff
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def get(self, key, variables):
+        """
+        Returns:
+            dict: séries horaires (time + variables) ou None si absent du cache
+        """
+        path = self._path(key)
+        try:
+            with np.load(path) as archive:
+                hourly = {"time": archive["time"].tolist()}
+                for variable in variables:
+                    hourly[variable] = archive[variable].tolist()
+        except (OSError, KeyError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # La date de modification sert d'horodatage de dernière lecture (LRU)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        with self._lock:
+            self.hits += 1
+        return hourly
+
+    def put(self, key, hourly, variables):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        arrays = {"time": np.asarray(hourly["time"], dtype=str)}
+        for variable in variables:
+            arrays[variable] = np.asarray(hourly[variable], dtype=np.float64)
+
+        # Écriture atomique : un lecteur concurrent ne voit jamais de fichier partiel
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+
+        with self._lock:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self.writes += 1
+            self._size_bytes = (
+                self._scan_size()
+                if self._size_bytes is None
+                else self._size_bytes - previous + os.path.getsize(path)
+            )
+            self._evict()
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".npz"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        if self._size_bytes <= self.max_bytes:
+            return
+        for _, size, path in sorted(self._entries()):
+            if self._size_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size_bytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            for _, _, path in self._entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._size_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            entries = self._entries()
+            self._size_bytes = sum(size for _, size, _ in entries)
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "cache_dir": self.cache_dir,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "bypassed": self.bypassed,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "entries": len(entries),
+                "size_bytes": self._size_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+archive_cache = ArchiveCache()
@@ -0,0 +1,165 @@
+import threading
+import uuid
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from data.data_ingestion import PARIS_LATITUDE, PARIS_LONGITUDE, location_key
+from data.weather_backfill import (
+    BACKFILL_MAX_WORKERS,
+    backfill_weather_data,
+    chunk_key,
+    load_checkpoint,
+    split_date_range,
+)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+_executor = None
+_stop = threading.Event()
+_jobs = {}
+_lock = threading.Lock()
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # Un import à la fois : les imports partagent le fichier de reprise
+            _stop.clear()
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backfill")
+        return _executor
+
+
+def shutdown_executor():
+    """Arrête l'import en cours après ses requêtes en vol ; la suite reste à reprendre."""
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _stop.set()
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def _update_job(job_id, **fields):
+    with _lock:
+        _jobs[job_id].update(fields)
+
+
+def run_backfill_job(job_id, checkpoint_path, max_workers, use_cache):
+    """Exécuté dans le thread d'import : récupère et enregistre les intervalles du job."""
+    job = get_backfill_job(job_id)
+    _update_job(job_id, status=JOB_RUNNING, started_at=_now())
+    try:
+        report = backfill_weather_data(
+            job["start_date"],
+            job["end_date"],
+            chunk=job["chunk"],
+            max_workers=max_workers,
+            checkpoint_path=checkpoint_path,
+            use_cache=use_cache,
+            locations=[tuple(location) for location in job["locations"]],
+            stop=_stop,
+        )
+    except Exception as e:
+        _update_job(job_id, status=JOB_FAILED, finished_at=_now(), message=str(e))
+        return job_id
+
+    # Intervalles abandonnés par un arrêt de l'API
+    interrupted = report["completed"] + len(report["failed"]) < (
+        report["chunks"] - report["resumed"]
+    )
+    _update_job(
+        job_id,
+        status=JOB_FAILED if interrupted else JOB_DONE,
+        finished_at=_now(),
+        report=report,
+        message=(
+            "Interrompu par un arrêt de l'API (relancer la requête pour reprendre)"
+            if interrupted
+            else f"{report['completed']}/{report['chunks'] - report['resumed']} "
+            f"intervalles importés, {report['inserted']} enregistrements ajoutés"
+        ),
+    )
+    return job_id
+
+
+def submit_backfill_job(
+    start_date,
+    end_date=None,
+    chunk="month",
+    max_workers=BACKFILL_MAX_WORKERS,
+    checkpoint_path=None,
+    use_cache=True,
+    locations=None,
+):
+    """
+    Met un import historique en file d'attente et renvoie son identifiant.
+
+    La période et le découpage sont vérifiés ici (ValueError), avant toute
+    requête. L'avancement est lu dans le fichier de reprise `checkpoint_path`.
+    `max_workers` est borné par BACKFILL_MAX_WORKERS, qui fixe aussi la taille
+    du pool de connexions vers l'API d'archive.
+    """
+    if end_date is None:
+        end_date = datetime.now().strftime("%Y-%m-%d")
+    if locations is None:
+        locations = [(PARIS_LATITUDE, PARIS_LONGITUDE)]
+    locations = list(dict.fromkeys(location_key(*location) for location in locations))
+    keys = [
+        chunk_key(s, e, lat, lon)
+        for lat, lon in locations
+        for s, e in split_date_range(start_date, end_date, chunk)
+    ]
+
+    job_id = uuid.uuid4().hex
+    with _lock:
+        _jobs[job_id] = {
+            "id": job_id,
+            "status": JOB_QUEUED,
+            "start_date": str(start_date),
+            "end_date": str(end_date),
+            "chunk": chunk,
+            "locations": [list(location) for location in locations],
+            "message": "En attente de la fin des imports précédents",
+            "report": None,
+            "created_at": _now(),
+            "started_at": None,
+            "finished_at": None,
+            "_keys": keys,
+            "_checkpoint": checkpoint_path,
+        }
+
+    get_executor().submit(
+        run_backfill_job,
+        job_id,
+        checkpoint_path,
+        max(1, min(max_workers, BACKFILL_MAX_WORKERS)),
+        use_cache,
+    )
+    return job_id
+
+
+def get_backfill_job(job_id):
+    """
+    État d'un import, avec son avancement d'après le fichier de reprise :
+    intervalles du job déjà enregistrés (y compris par un import précédent).
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        job = dict(job)
+
+    keys, checkpoint_path = job.pop("_keys"), job.pop("_checkpoint")
+    completed = load_checkpoint(checkpoint_path)
+    job["progress"] = {
+        "chunks": len(keys),
+        "completed": sum(key in completed for key in keys),
+    }
+    return job
@@ -0,0 +1,445 @@
+import math
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, func, Integer, type_coerce
+from data.db_class import (
+    RealTemperature,
+    RealTemperature3h,
+    RealTemperatureDaily,
+    Prediction,
+)
+from data.db_init import get_engine
+from data.db_bulk import frame_to_records
+
+# Types explicites des colonnes lues depuis RealTemperature
+REAL_TEMPERATURE_DTYPES = {
+    "temperature_2m": "float64",
+    "relative_humidity": "float64",
+    "precipitation": "float64",
+    "surface_pressure": "float64",
+    "latitude": "float64",
+    "longitude": "float64",
+}
+
+
+def _location_filters(table, location):
+    # Égalité sur (latitude, longitude) : préfixe de l'index unique
+    # (latitude, longitude, timestamp), la période est lue par plage d'index
+    if location is None:
+        return []
+    latitude, longitude = location
+    return [table.c.latitude == latitude, table.c.longitude == longitude]
+
+
+def real_temperature_query(start_date=None, end_date=None, location=None):
+    """
+    Requête Core sur RealTemperature, bornes [start_date, end_date[, limitée au
+    site `location` (latitude, longitude) s'il est donné.
+
+    Le timestamp est lu comme entier (secondes epoch) pour éviter la conversion
+    ligne à ligne en datetime Python ; il est converti ensuite en une opération.
+    """
+    table = RealTemperature.__table__
+
+    statement = select(
+        type_coerce(table.c.timestamp, Integer).label("timestamp"),
+        *[table.c[col] for col in REAL_TEMPERATURE_DTYPES],
+    )
+    if start_date is not None:
+        statement = statement.where(table.c.timestamp >= start_date)
+    if end_date is not None:
+        statement = statement.where(table.c.timestamp < end_date)
+    if location is not None:
+        statement = statement.where(*_location_filters(table, location))
+
+    return statement
+
+
+def _typed_frame(df):
+    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="s")
+    return df
+
+
+def iter_real_temperature(
+    start_date=None, end_date=None, chunksize=50_000, engine=None, location=None
+):
+    """Lit RealTemperature par blocs de `chunksize` lignes (DataFrames typés)."""
+    engine = engine or get_engine()
+    statement = real_temperature_query(start_date, end_date, location)
+
+    with engine.connect() as connection:
+        for chunk in pd.read_sql(
+            statement,
+            connection,
+            dtype=REAL_TEMPERATURE_DTYPES,
+            chunksize=chunksize,
+        ):
+            yield _typed_frame(chunk)
+
+
+def load_real_temperature(
+    start_date=None, end_date=None, chunksize=None, engine=None, location=None
+):
+    """
+    Charge les relevés RealTemperature dans un DataFrame typé.
+
+    Sans passer par les objets ORM : les lignes sont lues via un select Core et
+    pd.read_sql. Avec `chunksize`, la lecture se fait par blocs pour limiter
+    le pic mémoire. `location` (latitude, longitude) limite la lecture à un site.
+
+    Returns:
+        pd.DataFrame: colonnes timestamp (datetime64), mesures et coordonnées (float64)
+    """
+    if chunksize:
+        chunks = list(
+            iter_real_temperature(start_date, end_date, chunksize, engine, location)
+        )
+        if chunks:
+            return pd.concat(chunks, ignore_index=True)
+        return _empty_frame()
+
+    engine = engine or get_engine()
+    with engine.connect() as connection:
+        df = pd.read_sql(
+            real_temperature_query(start_date, end_date, location),
+            connection,
+            dtype=REAL_TEMPERATURE_DTYPES,
+        )
+
+    return _typed_frame(df)
+
+
+def _empty_frame():
+    df = pd.DataFrame(
+        {col: pd.Series(dtype=dtype) for col, dtype in REAL_TEMPERATURE_DTYPES.items()}
+    )
+    df.insert(0, "timestamp", pd.Series(dtype="datetime64[ns]"))
+    return df
+
+
+def _load_aggregates(table, columns, start_date, end_date, engine, location=None):
+    engine = engine or get_engine()
+    statement = select(
+        type_coerce(table.c.timestamp, Integer).label("timestamp"),
+        *[table.c[col] for col in columns],
+    ).order_by(table.c.timestamp)
+    if start_date is not None:
+        statement = statement.where(table.c.timestamp >= start_date)
+    if end_date is not None:
+        statement = statement.where(table.c.timestamp < end_date)
+    if location is not None:
+        statement = statement.where(*_location_filters(table, location))
+
+    with engine.connect() as connection:
+        df = pd.read_sql(
+            statement,
+            connection,
+            dtype={
+                col: "int64" if col == "n_observations" else "float64"
+                for col in columns
+            },
+        )
+
+    return _typed_frame(df)
+
+
+def load_aggregates_3h(start_date=None, end_date=None, engine=None, location=None):
+    """
+    Charge la table RealTemperature3h (moyennes par créneau de 3h, triées).
+
+    Trois fois moins de lignes que RealTemperature et aucun regroupement à
+    refaire : à passer à model.feature_engine.build_features_from_aggregates.
+    """
+    return _load_aggregates(
+        RealTemperature3h.__table__,
+        list(REAL_TEMPERATURE_DTYPES) + ["n_observations"],
+        start_date,
+        end_date,
+        engine,
+        location,
+    )
+
+
+def load_aggregates_daily(start_date=None, end_date=None, engine=None, location=None):
+    """Charge la table RealTemperatureDaily (moyennes, min/max, cumul de précipitations)."""
+    columns = list(REAL_TEMPERATURE_DTYPES) + [
+        "temperature_2m_min",
+        "temperature_2m_max",
+        "n_observations",
+    ]
+    return _load_aggregates(
+        RealTemperatureDaily.__table__, columns, start_date, end_date, engine, location
+    )
+
+
+def list_locations(engine=None):
+    """
+    Sites présents dans RealTemperature : nombre de relevés et période couverte.
+
+    Le regroupement par (latitude, longitude) parcourt l'index unique
+    (latitude, longitude, timestamp) sans lire la table.
+    """
+    engine = engine or get_engine()
+    table = RealTemperature.__table__
+    timestamp = type_coerce(table.c.timestamp, Integer)
+    statement = (
+        select(
+            table.c.latitude,
+            table.c.longitude,
+            func.count().label("observations"),
+            func.min(timestamp).label("first"),
+            func.max(timestamp).label("last"),
+        )
+        .group_by(table.c.latitude, table.c.longitude)
+        .order_by(table.c.latitude, table.c.longitude)
+    )
+    with engine.connect() as connection:
+        rows = connection.execute(statement).mappings().all()
+
+    return [
+        {
+            "latitude": row["latitude"],
+            "longitude": row["longitude"],
+            "observations": row["observations"],
+            "start_date": str(pd.Timestamp(row["first"], unit="s")),
+            "end_date": str(pd.Timestamp(row["last"], unit="s")),
+        }
+        for row in rows
+    ]
+
+
+# Résolutions de /history et table correspondante
+HISTORY_RESOLUTIONS = ("hourly", "3h", "daily")
+
+
+def iter_history_frames(
+    start_date,
+    end_date,
+    resolution="hourly",
+    window_days=31,
+    engine=None,
+    location=None,
+):
+    """
+    Relevés de [start_date, end_date[ (d'un site ou de tous) par DataFrames
+    successifs triés par date.
+
+    Les relevés horaires sont lus par fenêtres de `window_days` jours (une
+    connexion par fenêtre) ; les tables agrégées, déjà réduites, en une fois.
+    """
+    if resolution == "3h":
+        yield load_aggregates_3h(start_date, end_date, engine, location)
+        return
+    if resolution == "daily":
+        yield load_aggregates_daily(start_date, end_date, engine, location)
+        return
+
+    window = pd.Timedelta(days=window_days)
+    window_start = start_date
+    while window_start < end_date:
+        window_end = min(window_start + window, end_date)
+        frame = load_real_temperature(
+            window_start, window_end, engine=engine, location=location
+        )
+        if not frame.empty:
+            yield frame.sort_values("timestamp", ignore_index=True)
+        window_start = window_end
+
+
+# Champs renvoyés par /predictions et colonnes correspondantes de Prediction
+PREDICTION_FIELDS = {
+    "id": "id",
+    "model_id": "model_id",
+    "timestamp": "timestamp",
+    "valeur_reelle": "real",
+    "valeur_prevue": "prediction",
+    "relative_humidity": "relative_humidity",
+    "precipitation": "precipitation",
+    "surface_pressure": "surface_pressure",
+    "latitude": "latitude",
+    "longitude": "longitude",
+}
+
+# Types des champs de /predictions dans les flux Arrow et Parquet : déclarés
+# plutôt qu'inférés du premier bloc, où une colonne sans valeur est de type null
+PREDICTION_DTYPES = {
+    "id": "int64",
+    "model_id": "int64",
+    "timestamp": "datetime64[ns]",
+    "valeur_reelle": "float64",
+    "valeur_prevue": "float64",
+    "relative_humidity": "float64",
+    "precipitation": "float64",
+    "surface_pressure": "float64",
+    "latitude": "float64",
+    "longitude": "float64",
+}
+
+
+def _prediction_filters(table, start_date, end_date, model_id, location=None):
+    filters = [table.c.timestamp >= start_date, table.c.timestamp < end_date]
+    if model_id:
+        filters.append(table.c.model_id == model_id)
+    return filters + _location_filters(table, location)
+
+
+def prediction_metrics(
+    start_date,
+    end_date,
+    model_id=None,
+    group_by_model=False,
+    engine=None,
+    location=None,
+):
+    """
+    Nombre de prédictions, RMSE et MAE calculés par SQLite (une seule ligne
+    lue, ou une par modèle avec `group_by_model`).
+
+    Seules les prédictions avec une valeur réelle comptent dans les erreurs.
+
+    Returns:
+        list: un dict par groupe (count, paired_count, rmse, mae)
+    """
+    engine = engine or get_engine()
+    table = Prediction.__table__
+    error = table.c.prediction - table.c.real
+
+    columns = [
+        func.count().label("count"),
+        func.count(error).label("paired_count"),
+        func.avg(error * error).label("mse"),
+        func.avg(func.abs(error)).label("mae"),
+    ]
+    if group_by_model:
+        columns.insert(0, table.c.model_id)
+
+    statement = select(*columns).where(
+        *_prediction_filters(table, start_date, end_date, model_id, location)
+    )
+    if group_by_model:
+        statement = statement.group_by(table.c.model_id).order_by(table.c.model_id)
+
+    with engine.connect() as connection:
+        rows = connection.execute(statement).mappings().all()
+
+    metrics = []
+    for row in rows:
+        row = dict(row)
+        mse = row.pop("mse")
+        row["rmse"] = math.sqrt(mse) if mse is not None else None
+        metrics.append(row)
+    return metrics
+
+
+def load_predictions_page(
+    start_date,
+    end_date,
+    model_id=None,
+    fields=None,
+    cursor=None,
+    limit=1000,
+    engine=None,
+    location=None,
+):
+    """
+    Page de prédictions, triées par id (pagination par clé : id > cursor).
+
+    Returns:
+        tuple: (liste de dicts, curseur de la page suivante ou None)
+    """
+    page, next_cursor = load_predictions_frame(
+        start_date, end_date, model_id, fields, cursor, limit, engine, location=location
+    )
+    return frame_to_records(page), next_cursor
+
+
+def load_predictions_frame(
+    start_date,
+    end_date,
+    model_id=None,
+    fields=None,
+    cursor=None,
+    limit=1000,
+    engine=None,
+    iso_timestamps=True,
+    location=None,
+):
+    """
+    Comme load_predictions_page, sous forme de DataFrame.
+
+    Seules les colonnes des `fields` demandés (PREDICTION_FIELDS) sont lues. Le
+    timestamp est au format ISO, ou en datetime64 avec iso_timestamps=False
+    (formats Arrow et Parquet).
+    """
+    engine = engine or get_engine()
+    table = Prediction.__table__
+    fields = list(fields or PREDICTION_FIELDS)
+
+    columns = [table.c.id]
+    for field in fields:
+        column = PREDICTION_FIELDS[field]
+        if column == "id":
+            continue
+        if column == "timestamp":
+            columns.append(type_coerce(table.c.timestamp, Integer).label(field))
+        else:
+            columns.append(table.c[column].label(field))
+
+    statement = select(*columns).where(
+        *_prediction_filters(table, start_date, end_date, model_id, location)
+    )
+    if cursor is not None:
+        statement = statement.where(table.c.id > cursor)
+    # Une ligne de plus que la page : indique s'il reste des prédictions
+    statement = statement.order_by(table.c.id).limit(limit + 1)
+
+    with engine.connect() as connection:
+        rows = connection.execute(statement).all()
+
+    page = pd.DataFrame(rows[:limit], columns=["_id"] + [c.name for c in columns[1:]])
+    next_cursor = int(page["_id"].iloc[-1]) if len(rows) > limit else None
+
+    if "id" in fields:
+        page["id"] = page["_id"]
+    if "timestamp" in fields and not iso_timestamps:
+        page["timestamp"] = pd.to_datetime(page["timestamp"], unit="s")
+    elif "timestamp" in fields:
+        timestamps = page["timestamp"]
+        page["timestamp"] = np.where(
+            timestamps.isna(),
+            None,
+            np.datetime_as_string(
+                timestamps.fillna(0).to_numpy(dtype="int64").astype("datetime64[s]")
+            ),
+        )
+    return page[fields], next_cursor
+
+
+def iter_prediction_frames(
+    start_date,
+    end_date,
+    model_id=None,
+    fields=None,
+    cursor=None,
+    chunksize=5000,
+    engine=None,
+    iso_timestamps=True,
+    location=None,
+):
+    """Toutes les prédictions à partir de `cursor`, par DataFrames de `chunksize` lignes."""
+    while True:
+        page, cursor = load_predictions_frame(
+            start_date,
+            end_date,
+            model_id,
+            fields,
+            cursor,
+            chunksize,
+            engine,
+            iso_timestamps,
+            location,
+        )
+        if not page.empty:
+            yield page
+        if cursor is None:
+            break
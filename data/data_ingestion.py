@@ -1,4 +1,7 @@
+import os
 import requests
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
 import sqlite3
 from sqlalchemy import create_engine
@@ -8,93 +11,355 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import IntegrityError
 from data.db_class import RealTemperature
 from data.db_init import get_engine
+from data import archive_cache as archive_cache_module
+from data.aggregates import refresh_aggregates
+from data.db_bulk import (
+    bulk_insert_ignore,
+    to_epoch_seconds,
+    frame_to_records,
+    DEFAULT_BATCH_SIZE,
+)
 
+OPEN_METEO_ARCHIVE_URL = os.environ.get(
+    "OPEN_METEO_ARCHIVE_URL", "https://archive-api.open-meteo.com/v1/archive"
+)
 
-def fetch_weather_data(
-    start_date: Union[str, datetime], end_date: Optional[Union[str, datetime]] = None
-) -> pd.DataFrame:
+PARIS_LATITUDE = 48.8566
+PARIS_LONGITUDE = 2.3522
 
-    api_url = "https://archive-api.open-meteo.com/v1/archive"
+# Coordonnées arrondies (environ 10 m) : un site a toujours les mêmes valeurs
+# en base, ce qui permet les requêtes par égalité sur l'index (latitude, longitude, timestamp)
+LOCATION_DECIMALS = 4
 
-    longitude = 2.3522
-    latitude = 48.8566
+# Nombre maximal de sites récupérés simultanément
+FETCH_MAX_WORKERS = int(os.environ.get("FETCH_MAX_WORKERS", "8"))
 
-    if isinstance(start_date, datetime):
-        start_date = start_date.strftime("%Y-%m-%d")
+HOURLY_VARIABLES = [
+    "temperature_2m",
+    "relative_humidity_2m",
+    "precipitation",
+    "surface_pressure",
+]
+
+WEATHER_COLUMNS = [
+    "temperature_2m",
+    "relative_humidity",
+    "precipitation",
+    "surface_pressure",
+    "latitude",
+    "longitude",
+]
+
+
+def location_key(latitude, longitude):
+    """Couple (latitude, longitude) arrondi, identifiant un site."""
+    return (
+        round(float(latitude), LOCATION_DECIMALS),
+        round(float(longitude), LOCATION_DECIMALS),
+    )
+
+
+def _format_date(value):
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d")
+    return value
 
-    if end_date is None:
-        end_date = datetime.now().strftime("%Y-%m-%d")
-    elif isinstance(end_date, datetime):
-        end_date = end_date.strftime("%Y-%m-%d")
 
-    params = {
+def _archive_params(start_date, end_date, latitude, longitude):
+    return {
         "latitude": latitude,
         "longitude": longitude,
         "start_date": start_date,
         "end_date": end_date,
-        "hourly": [
-            "temperature_2m",
-            "relative_humidity_2m",
-            "precipitation",
-            "surface_pressure",
-        ],
+        "hourly": HOURLY_VARIABLES,
         "timezone": "auto",
     }
 
-    try:
-        response = requests.get(api_url, params=params)
-        response.raise_for_status()
-
-        data = response.json()
-
-        df = pd.DataFrame(
-            {
-                "timestamp": pd.to_datetime(data["hourly"]["time"]),
-                "temperature_2m": data["hourly"]["temperature_2m"],
-                "relative_humidity": data["hourly"]["relative_humidity_2m"],
-                "precipitation": data["hourly"]["precipitation"],
-                "surface_pressure": data["hourly"]["surface_pressure"],
-                "latitude": latitude,
-                "longitude": longitude,
-            }
+
+def _month_ranges(start_date, end_date):
+    """Mois calendaires complets (début, fin) couvrant [start_date, end_date]."""
+    months = pd.period_range(start_date, end_date, freq="M")
+    return [
+        (
+            month.start_time.strftime("%Y-%m-%d"),
+            month.end_time.strftime("%Y-%m-%d"),
         )
+        for month in months
+    ]
+
+
+def _request_hourly(get, api_url, start_date, end_date, latitude, longitude, **kwargs):
+    params = _archive_params(start_date, end_date, latitude, longitude)
+    response = get(api_url, params=params, **kwargs)
+    response.raise_for_status()
+    hourly = response.json()["hourly"]
+
+    # Mesures en float (None -> NaN), identiques qu'elles viennent du cache ou non
+    series = {"time": list(hourly["time"])}
+    for variable in HOURLY_VARIABLES:
+        series[variable] = np.asarray(hourly[variable], dtype=np.float64).tolist()
+    return series
+
+
+def _slice_hourly(hourly, start_date, end_date):
+    """Garde les heures dont la date est dans [start_date, end_date] (bornes incluses)."""
+    keep = [start_date <= t[:10] <= end_date for t in hourly["time"]]
+    return {
+        name: [value for value, k in zip(values, keep) if k]
+        for name, values in hourly.items()
+    }
+
+
+def _concat_hourly(parts):
+    hourly = {name: [] for name in ["time"] + HOURLY_VARIABLES}
+    for part in parts:
+        for name in hourly:
+            hourly[name].extend(part[name])
+    return hourly
+
+
+def fetch_archive_hourly(
+    start_date,
+    end_date,
+    latitude=PARIS_LATITUDE,
+    longitude=PARIS_LONGITUDE,
+    get=None,
+    api_url=None,
+    use_cache=True,
+    cache=None,
+    **kwargs,
+):
+    """
+    Récupère les séries horaires de l'API d'archive pour [start_date, end_date].
+
+    Les mois terminés sont lus depuis le cache disque lorsqu'ils y sont ; les
+    mois manquants consécutifs sont récupérés en une seule requête, étendue aux
+    bornes des mois, puis mis en cache mois par mois. Lève une exception en
+    cas d'erreur HTTP.
+
+    Returns:
+        dict: réponse au format de l'API ({"hourly": {...}})
+    """
+    get = get or requests.get
+    api_url = api_url or OPEN_METEO_ARCHIVE_URL
+    cache = cache or archive_cache_module.archive_cache
+
+    if not (use_cache and cache.enabled):
+        cache.record_bypass()
+        hourly = _request_hourly(
+            get, api_url, start_date, end_date, latitude, longitude, **kwargs
+        )
+        return {"hourly": _slice_hourly(hourly, start_date, end_date)}
+
+    # Découpage en mois : depuis le cache, ou à récupérer (mois complet si
+    # cachable, sinon limité à la période demandée)
+    segments = []
+    for month_start, month_end in _month_ranges(start_date, end_date):
+        if cache.is_cacheable(month_end):
+            key = cache.key(
+                latitude, longitude, HOURLY_VARIABLES, month_start, month_end
+            )
+            segments.append(
+                {
+                    "start": month_start,
+                    "end": month_end,
+                    "key": key,
+                    "hourly": cache.get(key, HOURLY_VARIABLES),
+                }
+            )
+        else:
+            cache.record_bypass()
+            segments.append(
+                {
+                    "start": max(month_start, start_date),
+                    "end": min(month_end, end_date),
+                    "key": None,
+                    "hourly": None,
+                }
+            )
+
+    # Regroupement des segments manquants consécutifs en une requête
+    runs, current = [], []
+    for segment in segments:
+        if segment["hourly"] is None:
+            current.append(segment)
+        elif current:
+            runs.append(current)
+            current = []
+    if current:
+        runs.append(current)
+
+    for run in runs:
+        hourly = _request_hourly(
+            get, api_url, run[0]["start"], run[-1]["end"], latitude, longitude, **kwargs
+        )
+        for segment in run:
+            part = _slice_hourly(hourly, segment["start"], segment["end"])
+            segment["hourly"] = part
+            # Un mois n'est mis en cache que s'il est complet (premier et dernier jour)
+            times = part["time"]
+            if (
+                segment["key"] is not None
+                and times
+                and times[0][:10] == segment["start"]
+                and times[-1][:10] == segment["end"]
+            ):
+                cache.put(segment["key"], part, HOURLY_VARIABLES)
+
+    hourly = _concat_hourly(segment["hourly"] for segment in segments)
+    return {"hourly": _slice_hourly(hourly, start_date, end_date)}
+
+
+def parse_archive_response(data, latitude, longitude) -> pd.DataFrame:
+    df = pd.DataFrame(
+        {
+            "timestamp": pd.to_datetime(data["hourly"]["time"]),
+            "temperature_2m": data["hourly"]["temperature_2m"],
+            "relative_humidity": data["hourly"]["relative_humidity_2m"],
+            "precipitation": data["hourly"]["precipitation"],
+            "surface_pressure": data["hourly"]["surface_pressure"],
+            "latitude": latitude,
+            "longitude": longitude,
+        }
+    )
 
-        if df.isnull().values.any():
-            for col in df.columns:
-                if col != "timestamp" and df[col].isnull().any():
-                    df[col] = df[col].interpolate(method="linear")
+    if df.isnull().values.any():
+        for col in df.columns:
+            if col != "timestamp" and df[col].isnull().any():
+                df[col] = df[col].interpolate(method="linear")
 
-        return df
+    return df
+
+
+def fetch_weather_data(
+    start_date: Union[str, datetime],
+    end_date: Optional[Union[str, datetime]] = None,
+    use_cache: bool = True,
+    latitude: float = PARIS_LATITUDE,
+    longitude: float = PARIS_LONGITUDE,
+) -> pd.DataFrame:
+
+    latitude, longitude = location_key(latitude, longitude)
+
+    start_date = _format_date(start_date)
+
+    if end_date is None:
+        end_date = datetime.now().strftime("%Y-%m-%d")
+    else:
+        end_date = _format_date(end_date)
+
+    try:
+        data = fetch_archive_hourly(
+            start_date, end_date, latitude, longitude, use_cache=use_cache
+        )
+        return parse_archive_response(data, latitude, longitude)
 
     except requests.exceptions.RequestException as e:
         print(f"Erreur lors de la récupération des données: {e}")
         return pd.DataFrame()
 
 
-def save_weather_data_to_db(df: pd.DataFrame) -> bool:
+def fetch_locations_weather(
+    locations,
+    start_date: Union[str, datetime],
+    end_date: Optional[Union[str, datetime]] = None,
+    use_cache: bool = True,
+    max_workers: int = FETCH_MAX_WORKERS,
+) -> dict:
+    """
+    Récupère les relevés de plusieurs sites, un thread par site (au plus
+    `max_workers` requêtes simultanées vers l'API d'archive).
+
+    Returns:
+        dict: DataFrame de chaque site, indexé par location_key (vide en cas d'erreur)
+    """
+    locations = list(dict.fromkeys(location_key(*location) for location in locations))
+    if len(locations) <= 1 or max_workers <= 1:
+        return {
+            location: fetch_weather_data(start_date, end_date, use_cache, *location)
+            for location in locations
+        }
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(locations))) as executor:
+        frames = executor.map(
+            lambda location: fetch_weather_data(
+                start_date, end_date, use_cache, *location
+            ),
+            locations,
+        )
+        return dict(zip(locations, frames))
+
+
+def build_weather_records(df: pd.DataFrame) -> list:
+    # Conversion vectorisée : timestamp en secondes epoch, mesures en float
+    records = pd.DataFrame({"timestamp": to_epoch_seconds(df["timestamp"]).values})
+    for col in WEATHER_COLUMNS:
+        records[col] = df[col].astype(float).values
+
+    return frame_to_records(records)
+
+
+def bulk_save_weather_data(
+    df: pd.DataFrame, batch_size: int = DEFAULT_BATCH_SIZE, engine=None
+) -> dict:
+    """
+    Enregistre un DataFrame météo dans une seule transaction.
+
+    Les lignes déjà présentes (même timestamp, latitude, longitude) sont
+    ignorées via INSERT ... ON CONFLICT DO NOTHING. Les tables agrégées
+    (3h, jour) sont mises à jour pour les créneaux touchés.
+
+    Returns:
+        dict: nombre de lignes insérées et ignorées
+    """
+    if df.empty:
+        return {"inserted": 0, "skipped": 0}
+
+    engine = engine or get_engine()
+    records = build_weather_records(df)
+
+    with engine.begin() as connection:
+        inserted = bulk_insert_ignore(
+            connection, RealTemperature.__table__, records, batch_size
+        )
+        # Agrégats 3h / journaliers des créneaux touchés, dans la même transaction
+        refresh_aggregates(connection, df)
+
+    return {"inserted": inserted, "skipped": len(records) - inserted}
+
+
+def save_weather_data_to_db(df: pd.DataFrame, bulk: bool = False, engine=None) -> bool:
 
     if df.empty:
         print("Aucune donnée à enregistrer")
         return False
 
+    if bulk:
+        try:
+            counts = bulk_save_weather_data(df, engine=engine)
+            return (
+                f"{counts['inserted']} enregistrements ajoutés à la base de données"
+                f" ({counts['skipped']} doublons ignorés)"
+            )
+        except Exception as e:
+            return f"Erreur lors de l'enregistrement des données: {e}"
+
     try:
-        engine = get_engine()
+        engine = engine or get_engine()
         Session = sessionmaker(bind=engine)
         session = Session()
 
         records_added = 0
 
         for _, row in df.iterrows():
-            timestamp_str = row["timestamp"].strftime("%Y-%m-%d %H:%M:%S")
-
             new_record = RealTemperature(
-                timestamp=timestamp_str,
-                temperature_2m=str(row["temperature_2m"]),
-                relative_humidity=str(row["relative_humidity"]),
-                precipitation=str(row["precipitation"]),
-                surface_pressure=str(row["surface_pressure"]),
-                latitude=str(row["latitude"]),
-                longitude=str(row["longitude"]),
+                timestamp=row["timestamp"],
+                temperature_2m=float(row["temperature_2m"]),
+                relative_humidity=float(row["relative_humidity"]),
+                precipitation=float(row["precipitation"]),
+                surface_pressure=float(row["surface_pressure"]),
+                latitude=float(row["latitude"]),
+                longitude=float(row["longitude"]),
             )
 
             try:
@@ -106,6 +371,14 @@ def save_weather_data_to_db(df: pd.DataFrame) -> bool:
                 continue
 
         session.close()
+
+        if records_added:
+            try:
+                with engine.begin() as connection:
+                    refresh_aggregates(connection, df)
+            except Exception as e:
+                print(f"Erreur lors de la mise à jour des agrégats: {e}")
+
         return f"{records_added} enregistrements ajoutés à la base de données"
 
     except Exception as e:
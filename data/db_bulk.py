@@ -0,0 +1,40 @@
+import pandas as pd
+from sqlalchemy.dialects.sqlite import insert
+
+# Nombre de lignes envoyées par appel executemany
+DEFAULT_BATCH_SIZE = 5000
+
+
+def bulk_insert_ignore(connection, table, records, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Insère des enregistrements par lots avec INSERT ... ON CONFLICT DO NOTHING.
+
+    Les doublons (contraintes d'unicité) sont ignorés par SQLite. Doit être
+    appelée dans une transaction ouverte par l'appelant (engine.begin()).
+
+    Returns:
+        int: nombre de lignes réellement insérées
+    """
+    statement = insert(table).on_conflict_do_nothing()
+
+    inserted = 0
+    for start in range(0, len(records), batch_size):
+        batch = records[start : start + batch_size]
+        result = connection.execute(statement, batch)
+        inserted += max(result.rowcount, 0)
+
+    return inserted
+
+
+def to_epoch_seconds(values):
+    """Convertit une série de dates en secondes epoch (entiers), sans boucle Python."""
+    timestamps = pd.to_datetime(values)
+    if getattr(timestamps.dt, "tz", None) is not None:
+        timestamps = timestamps.dt.tz_convert("UTC").dt.tz_localize(None)
+    return timestamps.astype("datetime64[s]").astype("int64")
+
+
+def frame_to_records(frame):
+    """Convertit un DataFrame en liste de dicts, les NaN devenant NULL."""
+    frame = frame.astype(object).where(frame.notna(), None)
+    return frame.to_dict(orient="records")
@@ -1,7 +1,50 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, UniqueConstraint
+import calendar
+from datetime import datetime, date, timedelta, timezone
+from sqlalchemy import (
+    Column,
+    Integer,
+    Float,
+    String,
+    ForeignKey,
+    UniqueConstraint,
+    Index,
+)
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.orm import relationship
 from data.db_init import Base
 
+EPOCH = datetime(1970, 1, 1)
+
+
+class EpochDateTime(TypeDecorator):
+    """
+    Horodatage stocké en secondes depuis l'epoch (entier) dans SQLite.
+
+    Les datetime naïfs sont interprétés tels quels (heure locale de la série),
+    sans conversion de fuseau. Les entiers sont transmis sans conversion.
+    """
+
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        if isinstance(value, datetime):
+            if value.tzinfo is not None:
+                value = value.astimezone(timezone.utc).replace(tzinfo=None)
+            return calendar.timegm(value.timetuple())
+        if isinstance(value, date):
+            return calendar.timegm(value.timetuple())
+        return int(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return EPOCH + timedelta(seconds=value)
+
 
 class Model(Base):
     __tablename__ = "Model"
@@ -10,52 +53,138 @@ class Model(Base):
     version = Column(String, index=True)
     created_at = Column(String, index=True)
     path = Column(String, index=True)
+    # Options d'entraînement et mesures, pour comparer précision et temps d'entraînement
+    backend = Column(String)
+    n_jobs = Column(Integer)
+    n_estimators = Column(Integer)
+    parent_model_id = Column(Integer)
+    fit_seconds = Column(Float)
+    training_rows = Column(Integer)
+    # Fichier du registre : format, taille et durée de chargement
+    artifact_format = Column(String)
+    artifact_bytes = Column(Integer)
+    load_seconds = Column(Float)
+    # Moteur de prédiction : "sklearn" ou "compiled" (INFERENCE_ENGINE si vide)
+    inference_engine = Column(String)
+    # Site des données d'entraînement (vide : tous les sites de la base)
+    latitude = Column(Float)
+    longitude = Column(Float)
 
     predictions = relationship("Prediction", back_populates="model")
 
 
 class RealTemperature(Base):
     __tablename__ = "RealTemperature"
-    id = Column(Integer, primary_key=True, index=True)
-    timestamp = Column(String, index=True)
-    temperature_2m = Column(String, index=True)
-    relative_humidity = Column(String, index=True)
-    precipitation = Column(String, index=True)
-    surface_pressure = Column(String, index=True)
-    latitude = Column(String, index=True)
-    longitude = Column(String, index=True)
+    id = Column(Integer, primary_key=True)
+    timestamp = Column(EpochDateTime, nullable=False)
+    temperature_2m = Column(Float)
+    relative_humidity = Column(Float)
+    precipitation = Column(Float)
+    surface_pressure = Column(Float)
+    latitude = Column(Float)
+    longitude = Column(Float)
 
+    # L'index unique (latitude, longitude, timestamp) sert aussi d'index
+    # composite pour les requêtes par site et par période
     __table_args__ = (
         UniqueConstraint(
-            "timestamp",
             "latitude",
             "longitude",
+            "timestamp",
             name="unique_timestamp_latitude_longitude",
         ),
     )
 
 
+class RealTemperature3h(Base):
+    """Moyennes des relevés par créneau de 3h, mises à jour à chaque insertion."""
+
+    __tablename__ = "RealTemperature3h"
+    id = Column(Integer, primary_key=True)
+    # Début du créneau (00h, 03h, ..., 21h)
+    timestamp = Column(EpochDateTime, nullable=False)
+    temperature_2m = Column(Float)
+    relative_humidity = Column(Float)
+    precipitation = Column(Float)
+    surface_pressure = Column(Float)
+    latitude = Column(Float)
+    longitude = Column(Float)
+    n_observations = Column(Integer)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "latitude",
+            "longitude",
+            "timestamp",
+            name="unique_3h_timestamp_latitude_longitude",
+        ),
+    )
+
+
+class RealTemperatureDaily(Base):
+    """Agrégats journaliers : moyennes, températures min/max et cumul de précipitations."""
+
+    __tablename__ = "RealTemperatureDaily"
+    id = Column(Integer, primary_key=True)
+    timestamp = Column(EpochDateTime, nullable=False)
+    temperature_2m = Column(Float)
+    temperature_2m_min = Column(Float)
+    temperature_2m_max = Column(Float)
+    relative_humidity = Column(Float)
+    precipitation = Column(Float)
+    surface_pressure = Column(Float)
+    latitude = Column(Float)
+    longitude = Column(Float)
+    n_observations = Column(Integer)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "latitude",
+            "longitude",
+            "timestamp",
+            name="unique_daily_timestamp_latitude_longitude",
+        ),
+    )
+
+
 class Prediction(Base):
     __tablename__ = "Prediction"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     model_id = Column(Integer, ForeignKey("Model.id"))
-    timestamp = Column(String, index=True)
-    relative_humidity = Column(String, index=True)
-    precipitation = Column(String, index=True)
-    surface_pressure = Column(String, index=True)
-    latitude = Column(String, index=True)
-    longitude = Column(String, index=True)
-    real = Column(String, index=True)
-    prediction = Column(String, index=True)
+    timestamp = Column(EpochDateTime)
+    relative_humidity = Column(Float)
+    precipitation = Column(Float)
+    surface_pressure = Column(Float)
+    latitude = Column(Float)
+    longitude = Column(Float)
+    real = Column(Float)
+    prediction = Column(Float)
 
     model = relationship("Model", back_populates="predictions")
 
     __table_args__ = (
         UniqueConstraint(
-            "timestamp",
             "latitude",
             "longitude",
+            "timestamp",
             "model_id",
             name="unique_timestamp_latitude_longitude_model_id",
         ),
+        Index("ix_Prediction_model_id_timestamp", "model_id", "timestamp"),
     )
+
+
+class TrainingJob(Base):
+    __tablename__ = "TrainingJob"
+    id = Column(Integer, primary_key=True)
+    status = Column(String, index=True)
+    version = Column(String)
+    start_date = Column(String)
+    end_date = Column(String)
+    message = Column(String)
+    model_id = Column(Integer, ForeignKey("Model.id"))
+    # Options de train_model (backend, n_jobs, modèle de départ...) en JSON
+    options = Column(String)
+    created_at = Column(String)
+    started_at = Column(String)
+    finished_at = Column(String)
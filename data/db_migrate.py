@@ -0,0 +1,176 @@
+"""
+Migration des tables RealTemperature et Prediction vers le schéma typé.
+
+L'ancien schéma stockait toutes les valeurs (y compris le timestamp) en texte,
+avec un index par colonne. Le nouveau schéma utilise un timestamp entier
+(secondes epoch), des colonnes Float et un index composite
+(latitude, longitude, timestamp).
+
+Les colonnes ajoutées depuis aux tables Model et TrainingJob sont créées par
+ALTER TABLE ... ADD COLUMN.
+
+Usage :
+    python -m data.db_migrate [--db data/sql_app.db] [--vacuum]
+"""
+
+import sys
+import argparse
+from pathlib import Path
+from sqlalchemy import create_engine, inspect, text
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from data.db_init import get_engine, DB_PATH
+from data.db_class import RealTemperature, Prediction, Model, TrainingJob
+
+MIGRATED_TABLES = [RealTemperature, Prediction]
+
+# Tables dont les nouvelles colonnes sont ajoutées par ALTER TABLE ... ADD COLUMN
+EXTENDED_TABLES = [Model, TrainingJob]
+
+
+def _timestamp_expression(column):
+    return f"CAST(strftime('%s', {column}) AS INTEGER)"
+
+
+def _float_expression(column):
+    # CAST('nan' AS REAL) vaut 0.0 dans SQLite : on convertit explicitement en NULL
+    return (
+        f"CASE WHEN {column} IS NULL "
+        f"OR lower(trim({column})) IN ('', 'nan', 'none', 'null') THEN NULL "
+        f"ELSE CAST({column} AS REAL) END"
+    )
+
+
+def is_legacy_table(engine, table_name):
+    inspector = inspect(engine)
+    if not inspector.has_table(table_name):
+        return False
+
+    columns = {col["name"]: col for col in inspector.get_columns(table_name)}
+    timestamp = columns.get("timestamp")
+    if timestamp is None:
+        return False
+
+    return (
+        "CHAR" in str(timestamp["type"]).upper()
+        or "TEXT" in str(timestamp["type"]).upper()
+    )
+
+
+def needs_migration(engine=None):
+    engine = engine or get_engine()
+    return any(
+        is_legacy_table(engine, table.__tablename__) for table in MIGRATED_TABLES
+    )
+
+
+def _migrate_table(connection, table):
+    name = table.__tablename__
+    legacy_name = f"{name}_legacy"
+
+    connection.execute(text(f'ALTER TABLE "{name}" RENAME TO "{legacy_name}"'))
+    table.__table__.create(bind=connection)
+
+    columns = [col.name for col in table.__table__.columns]
+    expressions = []
+    for col in table.__table__.columns:
+        if col.name == "timestamp":
+            expressions.append(_timestamp_expression(col.name))
+        elif col.name in ("id", "model_id"):
+            expressions.append(col.name)
+        else:
+            expressions.append(_float_expression(col.name))
+
+    total = connection.execute(text(f'SELECT COUNT(*) FROM "{legacy_name}"')).scalar()
+    result = connection.execute(
+        text(
+            f'INSERT OR IGNORE INTO "{name}" ({", ".join(columns)}) '
+            f'SELECT {", ".join(expressions)} FROM "{legacy_name}" '
+            f"WHERE {_timestamp_expression('timestamp')} IS NOT NULL"
+        )
+    )
+    connection.execute(text(f'DROP TABLE "{legacy_name}"'))
+
+    return {"copied": result.rowcount, "dropped": total - result.rowcount}
+
+
+def missing_columns(connection, table):
+    inspector = inspect(connection)
+    if not inspector.has_table(table.__tablename__):
+        return []
+    existing = {col["name"] for col in inspector.get_columns(table.__tablename__)}
+    return [col for col in table.__table__.columns if col.name not in existing]
+
+
+def _add_columns(connection, table, columns):
+    for col in columns:
+        column_type = col.type.compile(dialect=connection.dialect)
+        connection.execute(
+            text(
+                f'ALTER TABLE "{table.__tablename__}" '
+                f'ADD COLUMN "{col.name}" {column_type}'
+            )
+        )
+    return {"added_columns": [col.name for col in columns]}
+
+
+def migrate_database(engine=None, vacuum=False):
+    """
+    Convertit en place les tables à l'ancien format.
+
+    La conversion se fait dans une seule transaction : en cas d'erreur la base
+    reste dans son état d'origine.
+
+    Returns:
+        dict: lignes copiées et lignes ignorées (timestamp invalide ou doublon)
+        pour chaque table migrée, colonnes ajoutées pour chaque table étendue
+    """
+    engine = engine or get_engine()
+    report = {}
+
+    # Le pilote sqlite3 n'ouvre pas de transaction avant un ALTER TABLE :
+    # on gère explicitement BEGIN/COMMIT pour que la conversion soit atomique
+    with engine.connect() as connection:
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        connection.exec_driver_sql("BEGIN")
+        try:
+            for table in MIGRATED_TABLES:
+                if is_legacy_table(connection, table.__tablename__):
+                    report[table.__tablename__] = _migrate_table(connection, table)
+            for table in EXTENDED_TABLES:
+                columns = missing_columns(connection, table)
+                if columns:
+                    report[table.__tablename__] = _add_columns(
+                        connection, table, columns
+                    )
+            connection.exec_driver_sql("COMMIT")
+        except Exception:
+            connection.exec_driver_sql("ROLLBACK")
+            raise
+
+        if vacuum and report:
+            connection.exec_driver_sql("VACUUM")
+
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--vacuum", action="store_true")
+    args = parser.parse_args()
+
+    report = migrate_database(create_engine(f"sqlite:///{args.db}"), args.vacuum)
+    if not report:
+        print("Base déjà au nouveau format, aucune migration nécessaire")
+    for table_name, counts in report.items():
+        if "added_columns" in counts:
+            print(
+                f"{table_name}: colonnes ajoutées {', '.join(counts['added_columns'])}"
+            )
+            continue
+        print(
+            f"{table_name}: {counts['copied']} lignes converties, "
+            f"{counts['dropped']} lignes ignorées"
+        )
@@ -0,0 +1,199 @@
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+
+IMAGE_CLASSIFICATION_DIR = os.environ.get(
+    "IMAGE_CLASSIFICATION_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "image_classification"),
+)
+LABEL_CACHE_DIR = os.environ.get(
+    "LABEL_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "label_cache"),
+)
+
+# Étiquettes du jeu de données (1 à 19, la 12 n'existe pas), dans l'ordre des
+# colonnes one-hot des split_*.csv
+LABELS = [label for label in range(1, 20) if label != 12]
+SPLITS = ("train", "val", "test")
+
+# À incrémenter si le contenu du cache change
+LABEL_CACHE_VERSION = 1
+
+# Début d'enregistrement de train.csv : ImageID, étiquettes séparées par des
+# espaces. Les légendes ne sont pas lues : certaines contiennent des guillemets
+# non échappés ou des retours à la ligne que pandas rejette.
+TRAIN_RECORD = r"^(\d+\.jpg),([0-9 ]+),"
+
+
+class LabelMatrix:
+    """
+    Étiquettes d'un ensemble d'images, une ligne par ImageID.
+
+    Les 18 colonnes one-hot (ordre de LABELS) sont empaquetées en bits
+    (np.packbits) : 3 octets par image.
+    """
+
+    def __init__(self, image_ids, packed):
+        self.image_ids = np.asarray(image_ids, dtype=str)
+        self.packed = packed
+
+    @classmethod
+    def from_dense(cls, image_ids, dense):
+        return cls(image_ids, np.packbits(np.asarray(dense, dtype=bool), axis=1))
+
+    def __len__(self):
+        return len(self.image_ids)
+
+    def dense(self):
+        """Matrice one-hot uint8 (n_images, 18)."""
+        return np.unpackbits(self.packed, axis=1, count=len(LABELS))
+
+    def rows(self, image_ids):
+        """Ligne de chaque ImageID (-1 s'il est absent)."""
+        return pd.Index(self.image_ids).get_indexer(np.asarray(image_ids, dtype=str))
+
+
+def parse_label_strings(labels):
+    """
+    Étiquettes "1 19" -> matrice one-hot uint8 (n, 18), sans boucle Python.
+
+    Raises:
+        ValueError: étiquette hors de LABELS
+    """
+    labels = pd.Series(labels, dtype=str).reset_index(drop=True)
+    tokens = labels.str.split().explode().dropna()
+    values = tokens.astype(int).to_numpy()
+
+    columns = np.full(max(LABELS) + 1, -1)
+    columns[LABELS] = np.arange(len(LABELS))
+    unknown = (values < 0) | (values > max(LABELS))
+    unknown[~unknown] = columns[values[~unknown]] < 0
+    if unknown.any():
+        raise ValueError(f"Étiquettes inconnues: {sorted(set(values[unknown]))}")
+
+    dense = np.zeros((len(labels), len(LABELS)), dtype=np.uint8)
+    dense[tokens.index.to_numpy(), columns[values]] = 1
+    return dense
+
+
+def read_train_labels(path):
+    """Étiquettes de train.csv (format "1 19"), lues ligne à ligne sans les légendes."""
+    with open(path, encoding="utf-8") as f:
+        lines = pd.Series(f.read().split("\n"))
+    records = lines.str.extract(TRAIN_RECORD).dropna()
+    return LabelMatrix.from_dense(
+        records[0].to_numpy(), parse_label_strings(records[1])
+    )
+
+
+def read_split_labels(path):
+    """Étiquettes d'un split_*.csv (18 colonnes one-hot)."""
+    columns = [str(label) for label in LABELS]
+    frame = pd.read_csv(
+        path,
+        usecols=["ImageID", *columns],
+        dtype={"ImageID": str, **{column: np.uint8 for column in columns}},
+    )
+    return LabelMatrix.from_dense(
+        frame["ImageID"].to_numpy(), frame[columns].to_numpy()
+    )
+
+
+def check_labels(train, splits):
+    """
+    Compare les étiquettes des splits à celles de train.csv.
+
+    Returns:
+        dict: ImageID absents de train.csv et ImageID aux étiquettes différentes,
+            par split
+    """
+    problems = {}
+    for name, split in splits.items():
+        rows = train.rows(split.image_ids)
+        missing = rows < 0
+        differ = np.zeros(len(split), dtype=bool)
+        differ[~missing] = (train.packed[rows[~missing]] != split.packed[~missing]).any(
+            axis=1
+        )
+        if missing.any() or differ.any():
+            problems[name] = {
+                "missing": split.image_ids[missing].tolist(),
+                "mismatched": split.image_ids[differ].tolist(),
+            }
+    return problems
+
+
+def _source_paths(directory):
+    paths = {"all": os.path.join(directory, "train.csv")}
+    for split in SPLITS:
+        paths[split] = os.path.join(directory, f"split_{split}.csv")
+    return paths
+
+
+def _sources_hash(paths):
+    digest = hashlib.sha256(f"v{LABEL_CACHE_VERSION}".encode())
+    for name, path in paths.items():
+        digest.update(name.encode())
+        with open(path, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def load_labels(
+    directory=IMAGE_CLASSIFICATION_DIR,
+    cache_dir=LABEL_CACHE_DIR,
+    use_cache=True,
+    strict=True,
+):
+    """
+    Étiquettes de train.csv ("all") et des splits ("train", "val", "test").
+
+    Le résultat est mis en cache dans un .npz nommé par l'empreinte SHA-256
+    des quatre fichiers : tant qu'ils ne changent pas, les CSV ne sont plus lus.
+
+    Args:
+        strict: lève une erreur si un split ne correspond pas à train.csv
+
+    Returns:
+        dict: nom -> LabelMatrix
+
+    Raises:
+        ValueError: étiquettes des splits différentes de train.csv (strict)
+    """
+    paths = _source_paths(directory)
+    cache_path = None
+    if use_cache:
+        cache_path = os.path.join(cache_dir, f"labels_{_sources_hash(paths)}.npz")
+        if os.path.exists(cache_path):
+            with np.load(cache_path) as cached:
+                return {
+                    name: LabelMatrix(cached[f"{name}_ids"], cached[f"{name}_packed"])
+                    for name in paths
+                }
+
+    matrices = {"all": read_train_labels(paths["all"])}
+    for split in SPLITS:
+        matrices[split] = read_split_labels(paths[split])
+
+    problems = check_labels(
+        matrices["all"], {split: matrices[split] for split in SPLITS}
+    )
+    if problems and strict:
+        summary = ", ".join(
+            f"{split}: {len(p['missing'])} absents, {len(p['mismatched'])} différents"
+            for split, p in problems.items()
+        )
+        raise ValueError(f"Étiquettes incohérentes avec train.csv ({summary})")
+
+    if cache_path is not None and not problems:
+        os.makedirs(cache_dir, exist_ok=True)
+        arrays = {}
+        for name, matrix in matrices.items():
+            arrays[f"{name}_ids"] = matrix.image_ids
+            arrays[f"{name}_packed"] = matrix.packed
+        # Écriture atomique : un autre processus peut lire le cache en parallèle
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, cache_path)
+    return matrices
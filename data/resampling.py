@@ -0,0 +1,70 @@
+"""
+Moyennes des relevés horaires par créneau de 3h, partagées par les tables
+agrégées (data.aggregates) et le calcul des features (model.feature_engine).
+"""
+
+import numpy as np
+
+# Mesures agrégées au pas de 3h (même ordre que preprocess_data)
+MEASURE_COLUMNS = [
+    "temperature_2m",
+    "relative_humidity",
+    "precipitation",
+    "surface_pressure",
+]
+
+# Pas des créneaux, en nanosecondes
+STEP_NS = 3 * 3600 * 10**9
+
+
+def kahan_step(sums, compensation, value):
+    """Un pas de somme compensée, comme groupby().mean() (à appliquer si value n'est pas NaN)."""
+    y = value - compensation
+    t = sums + y
+    c = t - sums - y
+    c[np.isnan(c)] = 0.0
+    return t, c
+
+
+def resample_3h(timestamps, values):
+    """
+    Moyenne par créneau de 3h (NaN ignorés), créneaux triés.
+
+    La somme par groupe reproduit la somme compensée (Kahan) de
+    groupby().mean(), dans l'ordre des lignes : les moyennes sont identiques
+    à celles de preprocess_data.
+
+    Returns:
+        tuple: (créneaux en ns depuis l'epoch (int64), moyennes (n_créneaux, n_mesures))
+    """
+    bins = np.floor_divide(timestamps, STEP_NS)
+    # Relevés en général déjà triés : pas de tri ni de copie dans ce cas
+    if len(bins) and np.any(bins[1:] < bins[:-1]):
+        order = np.argsort(bins, kind="stable")
+        bins = bins[order]
+        values = values[order]
+
+    starts = np.flatnonzero(np.diff(bins, prepend=bins[:1] - 1))
+    sizes = np.diff(starts, append=len(bins))
+    slots = bins[starts]
+
+    sums = np.zeros((len(slots), values.shape[1]))
+    compensation = np.zeros_like(sums)
+    nobs = np.zeros_like(sums)
+
+    # Une itération par rang dans le groupe (3 relevés horaires par créneau)
+    for k in range(sizes.max() if len(sizes) else 0):
+        groups = np.flatnonzero(sizes > k)
+        value = values[starts[groups] + k]
+        valid = ~np.isnan(value)
+
+        t, c = kahan_step(sums[groups], compensation[groups], value)
+
+        sums[groups] = np.where(valid, t, sums[groups])
+        compensation[groups] = np.where(valid, c, compensation[groups])
+        nobs[groups] += valid
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(nobs > 0, sums / nobs, np.nan)
+
+    return slots * STEP_NS, means
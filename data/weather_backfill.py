@@ -0,0 +1,235 @@
+import os
+import json
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from data.data_ingestion import (
+    OPEN_METEO_ARCHIVE_URL,
+    PARIS_LATITUDE,
+    PARIS_LONGITUDE,
+    fetch_archive_hourly,
+    parse_archive_response,
+    bulk_save_weather_data,
+    location_key,
+)
+
+# Découpage de la période : un appel à l'API d'archive par mois ou par année
+CHUNK_FREQUENCIES = {"month": "MS", "year": "YS"}
+
+# Nombre maximal de requêtes simultanées vers l'API d'archive
+BACKFILL_MAX_WORKERS = int(os.environ.get("BACKFILL_MAX_WORKERS", "4"))
+
+# Codes HTTP pour lesquels une requête est réessayée
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def split_date_range(start_date, end_date, chunk="month"):
+    """
+    Découpe [start_date, end_date] (bornes incluses, comme l'API d'archive)
+    en intervalles d'un mois ou d'un an.
+
+    Returns:
+        list: couples (début, fin) au format YYYY-MM-DD
+    """
+    if chunk not in CHUNK_FREQUENCIES:
+        raise ValueError(f"Découpage inconnu: {chunk} (month ou year)")
+
+    start = pd.Timestamp(start_date).normalize()
+    end = pd.Timestamp(end_date).normalize()
+    if end < start:
+        return []
+
+    boundaries = pd.date_range(start, end, freq=CHUNK_FREQUENCIES[chunk])
+    starts = [start] + [b for b in boundaries if b > start]
+    ends = [s - pd.Timedelta(days=1) for s in starts[1:]] + [end]
+
+    return [
+        (s.strftime("%Y-%m-%d"), e.strftime("%Y-%m-%d")) for s, e in zip(starts, ends)
+    ]
+
+
+def create_http_session(max_workers=BACKFILL_MAX_WORKERS, retries=5, backoff=1.0):
+    """
+    Session HTTP partagée par les threads du backfill : connexions réutilisées
+    (pool dimensionné sur le parallélisme) et nouvelles tentatives avec
+    attente exponentielle sur les erreurs réseau, 429 et 5xx.
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=["GET"],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1, pool_maxsize=max_workers, max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch_weather_chunk(
+    session,
+    start_date,
+    end_date,
+    latitude=PARIS_LATITUDE,
+    longitude=PARIS_LONGITUDE,
+    api_url=OPEN_METEO_ARCHIVE_URL,
+    timeout=60,
+    use_cache=True,
+):
+    """Récupère un intervalle ; lève une exception en cas d'échec (pas de DataFrame vide)."""
+    data = fetch_archive_hourly(
+        start_date,
+        end_date,
+        latitude,
+        longitude,
+        get=session.get,
+        api_url=api_url,
+        use_cache=use_cache,
+        timeout=timeout,
+    )
+    return parse_archive_response(data, latitude, longitude)
+
+
+def chunk_key(start_date, end_date, latitude, longitude):
+    return f"{latitude},{longitude},{start_date},{end_date}"
+
+
+def load_checkpoint(checkpoint_path):
+    if not checkpoint_path or not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        return set(json.load(f).get("completed", []))
+
+
+def save_checkpoint(checkpoint_path, completed):
+    # Écriture atomique : un arrêt brutal ne laisse pas de fichier tronqué
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "completed": sorted(completed),
+                "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            },
+            f,
+        )
+    os.replace(tmp_path, checkpoint_path)
+
+
+def backfill_weather_data(
+    start_date,
+    end_date=None,
+    chunk="month",
+    max_workers=BACKFILL_MAX_WORKERS,
+    retries=5,
+    backoff=1.0,
+    checkpoint_path=None,
+    latitude=PARIS_LATITUDE,
+    longitude=PARIS_LONGITUDE,
+    api_url=OPEN_METEO_ARCHIVE_URL,
+    use_cache=True,
+    engine=None,
+    locations=None,
+    stop=None,
+):
+    """
+    Import historique par intervalles récupérés en parallèle.
+
+    `locations` : liste de sites (latitude, longitude) importés ensemble, les
+    intervalles de tous les sites partageant le même pool de requêtes (par
+    défaut, le seul site latitude/longitude).
+
+    Chaque intervalle est enregistré en base dès sa réception (depuis le thread
+    appelant, une transaction par intervalle) puis noté dans le fichier de
+    reprise : un nouvel appel avec le même `checkpoint_path` ne récupère que
+    les intervalles manquants. Un intervalle en échec n'interrompt pas les autres.
+    Les mois déjà présents dans le cache disque ne sont pas redemandés à l'API.
+    `stop` (threading.Event) interrompt l'import : les intervalles non encore
+    récupérés sont abandonnés et repris par l'appel suivant.
+
+    Returns:
+        dict: nombre d'intervalles (total, déjà faits, terminés, en échec) et de lignes
+    """
+    if end_date is None:
+        end_date = datetime.now().strftime("%Y-%m-%d")
+
+    if locations is None:
+        locations = [(latitude, longitude)]
+    locations = list(dict.fromkeys(location_key(*location) for location in locations))
+
+    chunks = [
+        (s, e, lat, lon)
+        for lat, lon in locations
+        for s, e in split_date_range(start_date, end_date, chunk)
+    ]
+    completed = load_checkpoint(checkpoint_path)
+    pending = [task for task in chunks if chunk_key(*task) not in completed]
+
+    report = {
+        "chunks": len(chunks),
+        "resumed": len(chunks) - len(pending),
+        "completed": 0,
+        "failed": [],
+        "inserted": 0,
+        "skipped": 0,
+    }
+
+    session = create_http_session(max_workers, retries, backoff)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    fetch_weather_chunk,
+                    session,
+                    s,
+                    e,
+                    lat,
+                    lon,
+                    api_url,
+                    use_cache=use_cache,
+                ): (s, e, lat, lon)
+                for s, e, lat, lon in pending
+            }
+
+            for future in as_completed(futures):
+                if stop is not None and stop.is_set():
+                    for pending_future in futures:
+                        pending_future.cancel()
+                    break
+                s, e, lat, lon = task = futures[future]
+                try:
+                    counts = bulk_save_weather_data(future.result(), engine=engine)
+                except Exception as exc:
+                    report["failed"].append(
+                        {
+                            "start_date": s,
+                            "end_date": e,
+                            "latitude": lat,
+                            "longitude": lon,
+                            "error": str(exc),
+                        }
+                    )
+                    continue
+
+                report["completed"] += 1
+                report["inserted"] += counts["inserted"]
+                report["skipped"] += counts["skipped"]
+
+                completed.add(chunk_key(*task))
+                if checkpoint_path:
+                    save_checkpoint(checkpoint_path, completed)
+    finally:
+        session.close()
+
+    return report
@@ -0,0 +1,298 @@
+import os
+import time
+import warnings
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.tree._tree import Tree
+
+# Format des fichiers du registre :
+#  - "pickle" : joblib.dump sans compression (format d'origine)
+#  - "compressed" : joblib.dump compressé (zlib), fichiers 4 à 5 fois plus petits
+#  - "compact" : forêt aléatoire convertie en tableaux NumPy plats (CompactForest),
+#    projetables en mémoire (mmap) et donc partagés entre les workers uvicorn
+ARTIFACT_FORMATS = ("pickle", "compressed", "compact")
+MODEL_ARTIFACT_FORMAT = os.environ.get("MODEL_ARTIFACT_FORMAT", "pickle")
+MODEL_ARTIFACT_COMPRESS = int(os.environ.get("MODEL_ARTIFACT_COMPRESS", "3"))
+
+# Seuils des nœuds stockés en float32 (format "compact")
+MODEL_ARTIFACT_FLOAT32 = os.environ.get("MODEL_ARTIFACT_FLOAT32", "1") == "1"
+
+# Moteur de prédiction par défaut : "sklearn" ou "compiled" (CompactForest)
+INFERENCE_ENGINES = ("sklearn", "compiled")
+INFERENCE_ENGINE = os.environ.get("INFERENCE_ENGINE", "sklearn")
+
+# Lignes traitées par lot par CompactForest.predict (couples arbre x ligne)
+COMPILED_BATCH_ROWS = int(os.environ.get("COMPILED_BATCH_ROWS", "2048"))
+
+# Au-delà de ce nombre de lignes, le moteur "compiled" délègue à sklearn
+COMPILED_MAX_ROWS = int(os.environ.get("COMPILED_MAX_ROWS", "256"))
+
+# Chargement avec joblib.load(mmap_mode="r") des fichiers non compressés
+MODEL_ARTIFACT_MMAP = os.environ.get("MODEL_ARTIFACT_MMAP", "1") == "1"
+
+
+def float32_thresholds(thresholds):
+    """
+    Seuils arrondis au float32 inférieur.
+
+    Les arbres sklearn comparent des entrées converties en float32 : pour x
+    float32, x <= t équivaut à x <= (plus grand float32 <= t), les prédictions
+    sont donc inchangées.
+    """
+    rounded = thresholds.astype(np.float32)
+    too_high = rounded.astype(np.float64) > thresholds
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+
+class CompactForest:
+    """
+    Forêt aléatoire de régression sous forme de tableaux NumPy plats.
+
+    Les nœuds de tous les arbres sont concaténés (un nœud par indice, feuilles
+    repérées par feature = -1) ; les enfants du nœud i sont children[2i] (droite)
+    et children[2i + 1] (gauche), en indices globaux. Le fichier ne contient que
+    des tableaux, que joblib.load(mmap_mode="r") projette en mémoire sans copie.
+    Les prédictions sont celles de la forêt d'origine.
+    """
+
+    def __init__(
+        self,
+        feature,
+        threshold,
+        children,
+        missing_left,
+        value,
+        roots,
+        feature_names_in_=None,
+        n_features_in_=None,
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        # Nombre de features de la forêt d'origine : les dernières peuvent
+        # n'apparaître dans aucun nœud
+        if n_features_in_ is None and feature_names_in_ is not None:
+            n_features_in_ = len(feature_names_in_)
+        if n_features_in_ is None:
+            n_features_in_ = int(feature.max()) + 1 if len(feature) else 0
+        self.n_features_in_ = int(n_features_in_)
+        if feature_names_in_ is not None:
+            self.feature_names_in_ = feature_names_in_
+
+    @classmethod
+    def from_forest(cls, forest, threshold_dtype=np.float32):
+        if forest.n_outputs_ != 1:
+            raise ValueError("Seules les forêts à une sortie sont prises en charge")
+
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        sizes = np.array([tree.node_count for tree in trees])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+        def concat(get, dtype):
+            return np.concatenate([get(tree) for tree in trees]).astype(dtype)
+
+        feature = concat(lambda tree: tree.feature, np.int32)
+        leaves = feature < 0
+        feature[leaves] = -1
+
+        # Enfants en indices globaux ; une feuille pointe sur elle-même
+        left = concat(lambda tree: tree.children_left, np.int64)
+        right = concat(lambda tree: tree.children_right, np.int64)
+        shift = np.repeat(offsets, sizes)
+        index = np.arange(len(feature))
+        children = np.empty(2 * len(feature), dtype=np.int32)
+        children[0::2] = np.where(leaves, index, right + shift)
+        children[1::2] = np.where(leaves, index, left + shift)
+
+        threshold = concat(lambda tree: tree.threshold, np.float64)
+        if threshold_dtype == np.float32:
+            threshold = float32_thresholds(threshold)
+
+        missing_left = concat(lambda tree: tree.missing_go_to_left, bool)
+        value = concat(lambda tree: tree.value[:, 0, 0], np.float64)
+
+        return cls(
+            feature,
+            threshold,
+            children,
+            missing_left,
+            value,
+            offsets.astype(np.int32),
+            getattr(forest, "feature_names_in_", None),
+            forest.n_features_in_,
+        )
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    def _input(self, X):
+        if hasattr(X, "columns") and hasattr(self, "feature_names_in_"):
+            X = X[list(self.feature_names_in_)]
+        return np.ascontiguousarray(X, dtype=np.float32)
+
+    def predict(self, X):
+        X = self._input(X)
+        has_missing = bool(np.isnan(X).any())
+        y_pred = np.empty(len(X))
+        for start in range(0, len(X), COMPILED_BATCH_ROWS):
+            stop = start + COMPILED_BATCH_ROWS
+            y_pred[start:stop] = self._predict_batch(X[start:stop], has_missing)
+        return y_pred
+
+    def _predict_batch(self, X, has_missing):
+        """
+        Parcours simultané de tous les arbres : les couples (arbre, ligne) encore
+        sur un nœud interne avancent d'un niveau par itération, ceux arrivés sur
+        une feuille sont retirés du lot.
+        """
+        n_rows, n_features = X.shape
+        n_trees = len(self.roots)
+        flat = X.ravel()
+
+        leaf = np.repeat(self.roots, n_rows)
+        offsets = np.tile(np.arange(n_rows, dtype=np.int64) * n_features, n_trees)
+        active = np.arange(len(leaf))
+        current = leaf.copy()
+        while len(active):
+            feature = self.feature[current]
+            internal = feature >= 0
+            if not internal.all():
+                leaf[active[~internal]] = current[~internal]
+                active = active[internal]
+                current = current[internal]
+                feature = feature[internal]
+                offsets = offsets[internal]
+
+            x = flat[offsets + feature]
+            go_left = x <= self.threshold[current]
+            if has_missing:
+                go_left |= np.isnan(x) & self.missing_left[current]
+            current = self.children[2 * current + go_left]
+
+        # Somme cumulée arbre par arbre (ordre de RandomForestRegressor.predict)
+        values = self.value[leaf].reshape(n_trees, n_rows)
+        return np.cumsum(values, axis=0)[-1] / n_trees
+
+
+class CompiledForest:
+    """
+    Moteur "compiled" d'une forêt aléatoire sklearn.
+
+    Les petits lots (fenêtres de quelques jours) passent par CompactForest, sans
+    le coût fixe de RandomForestRegressor.predict (validation, un appel par
+    arbre) ; au-delà de `max_rows` lignes, la forêt sklearn est plus rapide.
+    """
+
+    def __init__(self, forest, max_rows=None):
+        self.forest = forest
+        self.compact = CompactForest.from_forest(forest)
+        self.max_rows = COMPILED_MAX_ROWS if max_rows is None else max_rows
+        self.n_estimators = self.compact.n_estimators
+        if hasattr(forest, "feature_names_in_"):
+            self.feature_names_in_ = forest.feature_names_in_
+
+    def predict(self, X):
+        if len(X) <= self.max_rows:
+            return self.compact.predict(X)
+        return self.forest.predict(X)
+
+
+def compile_model(model):
+    """Moteur "compiled" : forêts aléatoires compilées, autres modèles inchangés."""
+    if isinstance(model, RandomForestRegressor):
+        return CompiledForest(model)
+    return model
+
+
+def save_artifact(model, path, artifact_format=None, float32=MODEL_ARTIFACT_FLOAT32):
+    """
+    Enregistre un modèle dans le registre.
+
+    Le format "compact" ne s'applique qu'aux forêts aléatoires ; les autres
+    modèles sont alors enregistrés sans compression (chargement mmap).
+
+    Returns:
+        str: format effectivement utilisé
+    """
+    artifact_format = artifact_format or MODEL_ARTIFACT_FORMAT
+    if artifact_format not in ARTIFACT_FORMATS:
+        raise ValueError(
+            f"Format de modèle inconnu: {artifact_format} ({', '.join(ARTIFACT_FORMATS)})"
+        )
+
+    if artifact_format == "compressed":
+        joblib.dump(model, path, compress=MODEL_ARTIFACT_COMPRESS)
+    elif artifact_format == "compact" and isinstance(model, RandomForestRegressor):
+        threshold_dtype = np.float32 if float32 else np.float64
+        joblib.dump(CompactForest.from_forest(model, threshold_dtype), path)
+    else:
+        artifact_format = "pickle"
+        joblib.dump(model, path)
+    return artifact_format
+
+
+def load_artifact(path, mmap=MODEL_ARTIFACT_MMAP):
+    """Charge un modèle du registre, projeté en mémoire si le fichier n'est pas compressé."""
+    if not mmap:
+        return joblib.load(path)
+    # Fichier compressé : joblib ignore mmap_mode, l'avertissement est inutile
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message=".*mmap_mode.*compressed.*")
+        return joblib.load(path, mmap_mode="r")
+
+
+def model_nbytes(model):
+    """
+    Taille en mémoire d'un modèle chargé : somme des tableaux NumPy qu'il
+    contient (nœuds des arbres sklearn compris), indépendante du format du
+    fichier (un artefact compressé est 4 à 5 fois plus petit sur disque).
+    """
+    # Objets parcourus conservés : les tableaux temporaires de __getstate__ ne
+    # doivent pas être libérés puis leur id réutilisé
+    seen = {}
+    stack = [model]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen[id(obj)] = obj
+        if isinstance(obj, np.ndarray):
+            if obj.dtype == object:
+                stack.extend(obj.ravel())
+            else:
+                total += obj.nbytes
+        elif isinstance(obj, Tree):
+            # Tableaux internes du Tree Cython (nodes, values)
+            stack.extend(obj.__getstate__().values())
+        elif isinstance(obj, dict):
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+        elif hasattr(obj, "__dict__"):
+            stack.extend(vars(obj).values())
+    return total
+
+
+def describe_artifact(path):
+    """
+    Taille et durée de chargement d'un fichier du registre.
+
+    Returns:
+        dict: artifact_bytes et load_seconds (None si le fichier est absent)
+    """
+    if not os.path.exists(path):
+        return {"artifact_bytes": None, "load_seconds": None}
+
+    start = time.perf_counter()
+    load_artifact(path)
+    return {
+        "artifact_bytes": os.path.getsize(path),
+        "load_seconds": time.perf_counter() - start,
+    }
@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from data.resampling import MEASURE_COLUMNS, resample_3h
+
+TARGET_COLUMN = "temperature_2m"
+
+N_LAGS = 19
+ROLLING_WINDOW = 8
+
+LAG_COLUMNS = [f"temp_lag_{i}" for i in range(1, N_LAGS + 1)]
+CALENDAR_COLUMNS = ["hour", "dayofweek", "month", "day"]
+ROLLING_COLUMNS = ["temp_rolling_mean_24h", "temp_rolling_std_24h"]
+
+# Colonnes de X, dans l'ordre produit par create_features (et attendu par les modèles)
+FEATURE_COLUMNS = MEASURE_COLUMNS[1:] + LAG_COLUMNS + CALENDAR_COLUMNS + ROLLING_COLUMNS
+
+# Résolution de l'index produit par preprocess_data (pd.to_datetime sur des
+# chaînes : "ns" avec pandas 2, "us" avec pandas 3)
+INDEX_UNIT = pd.to_datetime(["2000-01-01 00:00:00"]).unit
+
+
+def rolling_mean_std(series, window=ROLLING_WINDOW):
+    """
+    Moyenne et écart-type (ddof=1) glissants sur `window` valeurs.
+
+    Calcul sur une vue glissante (sans copie) en deux passes : plus stable que
+    les sommes cumulées sur des séries longues. NaN pour les `window - 1`
+    premières valeurs et pour toute fenêtre contenant un NaN.
+    """
+    mean = np.full(len(series), np.nan)
+    std = np.full(len(series), np.nan)
+    if len(series) < window:
+        return mean, std
+
+    mean[window - 1 :], std[window - 1 :] = window_mean_std(
+        sliding_window_view(series, window)
+    )
+    return mean, std
+
+
+def window_mean_std(windows):
+    """Moyenne et écart-type (ddof=1) de chaque ligne de `windows` (n_fenêtres, taille)."""
+    window_mean = windows.mean(axis=1)
+    deviations = windows - window_mean[:, None]
+    std = np.sqrt(
+        np.einsum("ij,ij->i", deviations, deviations) / (windows.shape[1] - 1)
+    )
+    return window_mean, std
+
+
+def build_feature_matrix(df, dtype=np.float64):
+    """
+    Construit en une fois la matrice des features de preprocess_data.
+
+    Les lignes incomplètes (premières lags, fenêtres glissantes ou mesures
+    manquantes) sont retirées, comme le dropna de create_features.
+
+    Args:
+        df: relevés horaires (timestamp et MEASURE_COLUMNS)
+        dtype: type de la matrice. float64 : valeurs identiques au chemin pandas
+            (à 1e-12 près pour les fenêtres glissantes, recalculées par fenêtre au
+            lieu d'être mises à jour en continu) ; float32 : moitié moins de mémoire
+
+    Returns:
+        tuple: (index des créneaux, matrice (n, len(FEATURE_COLUMNS)), cible)
+    """
+    timestamps = df["timestamp"]
+    if not pd.api.types.is_datetime64_dtype(timestamps):
+        timestamps = pd.to_datetime(timestamps)
+    timestamps = timestamps.to_numpy().astype("datetime64[ns]").astype(np.int64)
+    values = df[MEASURE_COLUMNS].to_numpy(dtype=np.float64)
+
+    slots, means = resample_3h(timestamps, values)
+    return feature_matrix_from_buckets(slots, means, dtype)
+
+
+def feature_matrix_from_buckets(slots, means, dtype=np.float64):
+    """
+    Matrice des features à partir de créneaux de 3h déjà agrégés.
+
+    Args:
+        slots: début des créneaux en ns depuis l'epoch (int64, triés)
+        means: moyennes (n_créneaux, MEASURE_COLUMNS)
+    """
+    n = len(slots)
+    target = means[:, 0]
+
+    matrix = np.empty((n, len(FEATURE_COLUMNS)), dtype=dtype)
+    matrix[:, :3] = means[:, 1:]
+
+    # Lags : vue glissante de N_LAGS valeurs, colonne i = valeur décalée de i + 1
+    lags = matrix[:, 3 : 3 + N_LAGS]
+    lags[: min(n, N_LAGS)] = np.nan
+    if n > N_LAGS:
+        lags[N_LAGS:] = sliding_window_view(target[:-1], N_LAGS)[:, ::-1]
+    for i in range(1, min(n, N_LAGS)):
+        lags[i, :i] = target[:i][::-1]
+
+    index = pd.DatetimeIndex(slots.astype("datetime64[ns]"), name="timestamp").as_unit(
+        INDEX_UNIT
+    )
+    calendar = 3 + N_LAGS
+    matrix[:, calendar] = index.hour
+    matrix[:, calendar + 1] = index.dayofweek
+    matrix[:, calendar + 2] = index.month
+    matrix[:, calendar + 3] = index.day
+
+    matrix[:, -2], matrix[:, -1] = rolling_mean_std(target)
+
+    keep = ~(np.isnan(matrix).any(axis=1) | np.isnan(target))
+    return index[keep], matrix[keep], target[keep]
+
+
+def build_features(df, dtype=np.float64):
+    """
+    Équivalent de preprocess_data basé sur build_feature_matrix.
+
+    Returns:
+        tuple: (X, y) avec les mêmes colonnes, index et types que preprocess_data
+    """
+    return _feature_frames(*build_feature_matrix(df, dtype), dtype)
+
+
+def build_features_from_aggregates(df_3h, dtype=np.float64):
+    """
+    (X, y) à partir de la table agrégée au pas de 3h (data.data_access.load_aggregates_3h),
+    sans relire ni regrouper les relevés horaires.
+    """
+    slots = df_3h["timestamp"].to_numpy().astype("datetime64[ns]").astype(np.int64)
+    means = df_3h[MEASURE_COLUMNS].to_numpy(dtype=np.float64)
+    return _feature_frames(*feature_matrix_from_buckets(slots, means, dtype), dtype)
+
+
+def _feature_frames(index, matrix, target, dtype):
+    columns = {}
+    for j, col in enumerate(FEATURE_COLUMNS):
+        if col in CALENDAR_COLUMNS:
+            columns[col] = matrix[:, j].astype(np.int32)
+        else:
+            columns[col] = matrix[:, j]
+
+    X = pd.DataFrame(columns, index=index)
+    y = pd.Series(target.astype(dtype), index=index, name=TARGET_COLUMN)
+    return X, y
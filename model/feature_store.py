@@ -0,0 +1,152 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+from data.image_labels import LABEL_CACHE_DIR, SPLITS, load_labels
+from model.text_classification import TEXT_LABELS
+
+FEATURE_STORE_DIR = os.environ.get("FEATURE_STORE_DIR", "model/registry")
+SPLITS_DIR = os.environ.get("SPLITS_DIR", "data/image_classification")
+
+MODALITIES = ("text", "image")
+
+# Fichiers du registre par split : {split}_{nom}.npy. Les étiquettes sont les
+# vecteurs one-hot de {split}_image_labels.npy (identiques aux colonnes des
+# split_*.csv) ; {split}_text_labels.npy ne contient que des zéros.
+ARRAY_NAMES = ("text_features", "image_features", "image_labels")
+
+
+class FeatureStore:
+    """
+    Tableaux de features et d'étiquettes du registre, projetés en mémoire.
+
+    Les fichiers .npy sont ouverts avec mmap_mode="r" : aucun tableau n'est lu
+    en entier, les pages sont partagées (cache du système) entre les processus
+    qui ouvrent les mêmes fichiers et un split ou une plage de lignes est une
+    vue sans copie. Les lignes sont indexées par ImageID, dans l'ordre des
+    fichiers split_{split}.csv (lus par data.image_labels.load_labels).
+    """
+
+    def __init__(
+        self,
+        registry_dir=FEATURE_STORE_DIR,
+        splits_dir=SPLITS_DIR,
+        label_cache_dir=LABEL_CACHE_DIR,
+    ):
+        self.registry_dir = registry_dir
+        self.splits_dir = splits_dir
+        self.label_cache_dir = label_cache_dir
+        self._arrays = {}
+        self._image_ids = {}
+        self._lock = threading.Lock()
+
+    def array(self, split, name):
+        """Tableau {split}_{name}.npy projeté en mémoire (ouvert une seule fois)."""
+        if split not in SPLITS:
+            raise ValueError(f"Split inconnu: {split} ({', '.join(SPLITS)})")
+        if name not in ARRAY_NAMES:
+            raise ValueError(f"Tableau inconnu: {name} ({', '.join(ARRAY_NAMES)})")
+
+        key = (split, name)
+        with self._lock:
+            if key not in self._arrays:
+                path = os.path.join(self.registry_dir, f"{split}_{name}.npy")
+                if not os.path.exists(path):
+                    raise FileNotFoundError(f"Tableau introuvable: {path}")
+                array = np.load(path, mmap_mode="r")
+                expected = len(self._ids(split))
+                if len(array) != expected:
+                    raise ValueError(
+                        f"{path}: {len(array)} lignes pour {expected} images dans split_{split}.csv"
+                    )
+                self._arrays[key] = array
+            return self._arrays[key]
+
+    def _ids(self, split):
+        # Appelé avec le verrou
+        if not self._image_ids:
+            # ImageID des splits lus une fois, depuis le cache des étiquettes
+            labels = load_labels(self.splits_dir, self.label_cache_dir)
+            self._image_ids = {
+                name: pd.Index(labels[name].image_ids) for name in SPLITS
+            }
+        return self._image_ids[split]
+
+    def image_ids(self, split):
+        with self._lock:
+            return self._ids(split)
+
+    def features(self, split, modality, rows=None):
+        """
+        Features d'un split pour une modalité ("text" ou "image").
+
+        Args:
+            rows: None (split entier) ou slice : vue sans copie ; tableau
+                d'indices : seules ces lignes sont lues et copiées
+        """
+        if modality not in MODALITIES:
+            raise ValueError(f"Modalité inconnue: {modality} ({', '.join(MODALITIES)})")
+        array = self.array(split, f"{modality}_features")
+        return array if rows is None else array[rows]
+
+    def labels(self, split, rows=None):
+        """Étiquettes one-hot (une colonne par étiquette de TEXT_LABELS)."""
+        array = self.array(split, "image_labels")
+        return array if rows is None else array[rows]
+
+    def label_rows(self, split, label):
+        """Indices des lignes d'un split portant l'étiquette `label` (1 à 19, sauf 12)."""
+        if label not in TEXT_LABELS:
+            raise ValueError(f"Étiquette inconnue: {label}")
+        column = self.labels(split)[:, TEXT_LABELS.index(label)]
+        return np.flatnonzero(column)
+
+    def by_label(self, split, label, modality):
+        """Features des lignes portant `label` (seules ces lignes sont lues)."""
+        return self.features(split, modality, self.label_rows(split, label))
+
+    def _positions(self, image_ids):
+        """Indice du split (-1 si inconnu) et ligne de chaque ImageID."""
+        image_ids = pd.Index([str(image_id) for image_id in image_ids])
+        splits = np.full(len(image_ids), -1)
+        rows = np.full(len(image_ids), -1)
+        for code, split in enumerate(SPLITS):
+            positions = self.image_ids(split).get_indexer(image_ids)
+            found = positions >= 0
+            splits[found] = code
+            rows[found] = positions[found]
+        return splits, rows
+
+    def locate(self, image_ids):
+        """
+        Split et ligne de chaque ImageID.
+
+        Returns:
+            list: (split, ligne) par ImageID, None s'il est inconnu
+        """
+        splits, rows = self._positions(image_ids)
+        return [
+            (SPLITS[code], int(row)) if code >= 0 else None
+            for code, row in zip(splits, rows)
+        ]
+
+    def lookup(self, image_ids, modality):
+        """
+        Features des ImageID demandés, dans l'ordre de la requête (NaN si inconnu).
+
+        Returns:
+            tuple: (features (n, 18), masque des ImageID trouvés)
+        """
+        splits, rows = self._positions(image_ids)
+        result = np.full((len(rows), len(TEXT_LABELS)), np.nan)
+        for code, split in enumerate(SPLITS):
+            positions = np.flatnonzero(splits == code)
+            if len(positions):
+                # Lignes lues dans l'ordre du fichier
+                positions = positions[np.argsort(rows[positions])]
+                result[positions] = self.features(split, modality, rows[positions])
+        return result, splits >= 0
+
+
+feature_store = FeatureStore()
@@ -0,0 +1,9 @@
+from model.fusion.engine import (
+    FUSION_MODES,
+    ConcatHead,
+    FusionEngine,
+    load_concat_head,
+    train_concat_head,
+    weighted_average,
+)
+from model.fusion.metrics import evaluate_split, f1_scores, search_text_weight
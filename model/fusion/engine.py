@@ -0,0 +1,192 @@
+import os
+import argparse
+import tempfile
+import threading
+import warnings
+import numpy as np
+import joblib
+from functools import lru_cache
+from scipy.special import expit
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.neural_network import MLPClassifier
+
+from model.feature_store import feature_store
+
+FUSION_MODES = ("average", "concat")
+FUSION_HEAD_PATH = os.environ.get("FUSION_HEAD_PATH", "model/registry/fusion_head.pkl")
+FUSION_TEXT_WEIGHT = float(os.environ.get("FUSION_TEXT_WEIGHT", "0.7"))
+FUSION_THRESHOLD = float(os.environ.get("FUSION_THRESHOLD", "0.5"))
+
+
+def weighted_average(text_proba, image_proba, text_weight=FUSION_TEXT_WEIGHT):
+    """
+    Fusion tardive : moyenne pondérée des probabilités des deux classifieurs.
+
+    Args:
+        text_weight: poids du texte, scalaire ou tableau (n_poids,) ; avec un
+            tableau, le résultat est (n_poids, n, n_étiquettes), calculé en une
+            opération
+    """
+    weights = np.asarray(text_weight, dtype=np.float64)
+    if weights.ndim:
+        weights = weights[:, None, None]
+    fused = weights * text_proba
+    fused += (1 - weights) * image_proba
+    return fused
+
+
+class ConcatHead:
+    """
+    Tête de fusion sur les features concaténées (texte, image).
+
+    Même architecture que le notebook multimodal_fusion (Dense(64, relu) puis
+    une sigmoïde par étiquette), entraînée avec MLPClassifier. La prédiction
+    est faite en NumPy avec la première couche scindée en deux blocs, ce qui
+    évite de construire la matrice concaténée :
+    relu(T @ W_texte + I @ W_image + b1) @ W2 + b2.
+    """
+
+    def __init__(self, coefs, intercepts, n_text_features):
+        self.coefs = coefs
+        self.intercepts = intercepts
+        self.n_text_features = n_text_features
+
+    @classmethod
+    def from_mlp(cls, mlp, n_text_features):
+        if mlp.activation != "relu" or mlp.out_activation_ != "logistic":
+            raise ValueError("Seuls les MLP relu multi-étiquettes sont pris en charge")
+        return cls(list(mlp.coefs_), list(mlp.intercepts_), n_text_features)
+
+    @classmethod
+    def fit(cls, text, image, labels, hidden=64, max_iter=50, random_state=0):
+        mlp = MLPClassifier(
+            hidden_layer_sizes=(hidden,), max_iter=max_iter, random_state=random_state
+        )
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", ConvergenceWarning)
+            mlp.fit(np.hstack([text, image]), np.asarray(labels).astype(int))
+        return cls.from_mlp(mlp, text.shape[1])
+
+    def predict_proba(self, text, image):
+        first = self.coefs[0]
+        hidden = text @ first[: self.n_text_features]
+        hidden += image @ first[self.n_text_features :]
+        hidden += self.intercepts[0]
+        np.maximum(hidden, 0, out=hidden)
+        for coef, intercept in zip(self.coefs[1:-1], self.intercepts[1:-1]):
+            hidden = np.maximum(hidden @ coef + intercept, 0)
+        return expit(hidden @ self.coefs[-1] + self.intercepts[-1])
+
+
+class FusionEngine:
+    """
+    Fusion des probabilités des classifieurs de texte et d'image, par lots.
+
+    Les probabilités d'entrée sont les sorties des deux classifieurs, lues
+    dans le magasin de features (split entier ou ImageID) ; tout le calcul est
+    fait en opérations matricielles sur le lot.
+    """
+
+    def __init__(
+        self, mode="average", text_weight=None, head=None, store=feature_store
+    ):
+        if mode not in FUSION_MODES:
+            raise ValueError(
+                f"Mode de fusion inconnu: {mode} ({', '.join(FUSION_MODES)})"
+            )
+        if mode == "concat" and head is None:
+            head = load_concat_head(store=store)
+        self.mode = mode
+        self.text_weight = FUSION_TEXT_WEIGHT if text_weight is None else text_weight
+        self.head = head
+        self.store = store
+
+    def predict_proba(self, text_proba, image_proba):
+        if self.mode == "concat":
+            return self.head.predict_proba(text_proba, image_proba)
+        return weighted_average(text_proba, image_proba, self.text_weight)
+
+    def predict(self, text_proba, image_proba, threshold=FUSION_THRESHOLD):
+        return self.predict_proba(text_proba, image_proba) >= threshold
+
+    def predict_split(self, split):
+        return self.predict_proba(
+            self.store.features(split, "text"), self.store.features(split, "image")
+        )
+
+    def predict_images(self, image_ids):
+        """
+        Returns:
+            tuple: (probabilités fusionnées, masque des ImageID trouvés)
+        """
+        text, found = self.store.lookup(image_ids, "text")
+        image, _ = self.store.lookup(image_ids, "image")
+        proba = np.full_like(text, np.nan)
+        if found.any():
+            proba[found] = self.predict_proba(text[found], image[found])
+        return proba, found
+
+
+_train_lock = threading.Lock()
+
+
+@lru_cache(maxsize=4)
+def _load_head(path, mtime):
+    return joblib.load(path)
+
+
+def load_concat_head(path=FUSION_HEAD_PATH, store=feature_store):
+    """
+    Tête de fusion enregistrée, chargée une fois par fichier.
+
+    Absente (image Docker, nouveau registre), elle est entraînée sur le split
+    train puis enregistrée à la première demande (quelques secondes).
+    Le cache, propre à la fusion, est indexé par chemin et date de
+    modification : une tête réentraînée est relue, et les modèles de
+    température du cache de modèles ne sont pas évincés.
+    """
+    if not os.path.exists(path):
+        with _train_lock:
+            if not os.path.exists(path):
+                train_concat_head(store, path)
+    return _load_head(os.path.abspath(path), os.path.getmtime(path))
+
+
+def train_concat_head(store=feature_store, path=FUSION_HEAD_PATH, **params):
+    """Entraîne la tête de fusion sur le split train et l'enregistre."""
+    head = ConcatHead.fit(
+        store.features("train", "text"),
+        store.features("train", "image"),
+        store.labels("train"),
+        **params,
+    )
+    # Écriture puis renommage : un autre processus ne lit jamais un fichier partiel
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=directory)
+    os.close(fd)
+    try:
+        joblib.dump(head, tmp_path)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return head
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Entraînement de la tête de fusion (mode concat)"
+    )
+    parser.add_argument("--path", default=FUSION_HEAD_PATH)
+    parser.add_argument("--hidden", type=int, default=64)
+    parser.add_argument("--max-iter", type=int, default=50)
+    args = parser.parse_args()
+
+    train_concat_head(path=args.path, hidden=args.hidden, max_iter=args.max_iter)
+    print(f"Tête de fusion enregistrée: {args.path}")
+
+
+if __name__ == "__main__":
+    main()
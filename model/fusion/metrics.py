@@ -0,0 +1,81 @@
+import time
+import numpy as np
+
+from model.fusion.engine import FUSION_THRESHOLD, weighted_average
+
+
+def f1_scores(y_true, y_pred):
+    """
+    F1 micro et macro d'une prédiction multi-étiquettes (matrices 0/1).
+
+    Mêmes valeurs que sklearn.metrics.f1_score(average="micro"/"macro",
+    zero_division=0), avec les comptes de vrais/faux positifs calculés en
+    opérations sur les colonnes. Avec une pile de prédictions
+    (n_poids, n, n_étiquettes), un score par prédiction.
+    """
+    y_true = np.asarray(y_true).astype(bool)
+    y_pred = np.asarray(y_pred).astype(bool)
+    tp = (y_pred & y_true).sum(axis=-2)
+    fp = (y_pred & ~y_true).sum(axis=-2)
+    fn = (~y_pred & y_true).sum(axis=-2)
+
+    errors = 2 * tp + fp + fn
+    per_label = np.divide(2 * tp, errors, out=np.zeros(errors.shape), where=errors > 0)
+    total_tp, total_errors = tp.sum(axis=-1), errors.sum(axis=-1)
+    micro = np.divide(
+        2 * total_tp,
+        total_errors,
+        out=np.zeros(np.shape(total_errors)),
+        where=total_errors > 0,
+    )
+    return micro, per_label.mean(axis=-1)
+
+
+def evaluate_split(engine, split, threshold=FUSION_THRESHOLD):
+    """
+    F1 micro et macro d'un split : texte seul, image seule et fusion.
+
+    Returns:
+        dict: rows, durée et débit (lignes/s) de la fusion, scores par source
+    """
+    store = engine.store
+    text = store.features(split, "text")
+    image = store.features(split, "image")
+    labels = store.labels(split)
+
+    start = time.perf_counter()
+    fused = engine.predict_proba(text, image)
+    seconds = time.perf_counter() - start
+
+    scores = {}
+    for name, proba in [("text", text), ("image", image), ("fusion", fused)]:
+        micro, macro = f1_scores(labels, proba >= threshold)
+        scores[name] = {"micro_f1": float(micro), "macro_f1": float(macro)}
+
+    return {
+        "split": split,
+        "mode": engine.mode,
+        "text_weight": engine.text_weight if engine.mode == "average" else None,
+        "threshold": threshold,
+        "rows": len(labels),
+        "fusion_seconds": seconds,
+        "rows_per_second": len(labels) / seconds if seconds > 0 else None,
+        "scores": scores,
+    }
+
+
+def search_text_weight(
+    store, split="val", weights=np.linspace(0, 1, 21), threshold=FUSION_THRESHOLD
+):
+    """
+    Poids du texte maximisant le F1 micro d'un split (validation), toutes les
+    valeurs de `weights` étant évaluées en une seule opération.
+
+    Returns:
+        tuple: (meilleur poids, F1 micro par poids)
+    """
+    fused = weighted_average(
+        store.features(split, "text"), store.features(split, "image"), weights
+    )
+    micro, _ = f1_scores(store.labels(split), fused >= threshold)
+    return float(weights[int(np.argmax(micro))]), micro
@@ -0,0 +1,248 @@
+import os
+import re
+import json
+import threading
+import numpy as np
+import pandas as pd
+from data.resampling import MEASURE_COLUMNS, STEP_NS, kahan_step
+from model.feature_engine import (
+    TARGET_COLUMN,
+    N_LAGS,
+    ROLLING_WINDOW,
+    FEATURE_COLUMNS,
+    CALENDAR_COLUMNS,
+    INDEX_UNIT,
+    window_mean_std,
+)
+
+HOUR_NS = 3600 * 10**9
+STATE_VERSION = 1
+
+
+class IncrementalFeatureBuilder:
+    """
+    Calcul incrémental des features de build_features pour un flux de relevés.
+
+    L'état tient en mémoire constante : les températures des N_LAGS derniers
+    créneaux de 3h dans un tampon circulaire (qui contient aussi la fenêtre
+    glissante) et les sommes du créneau en cours. Un créneau est émis dès que
+    son dernier relevé horaire (h+2) arrive, ou qu'un relevé d'un créneau
+    suivant arrive. Les relevés doivent être transmis dans l'ordre.
+
+    Pour une même série, les lignes émises sont celles de build_features
+    (mêmes valeurs, mêmes lignes écartées par le dropna).
+    """
+
+    def __init__(self):
+        self.history = np.full(N_LAGS, np.nan)
+        self.position = 0
+        self.buckets = 0
+        self.pending_slot = None
+        self.sums = np.zeros(len(MEASURE_COLUMNS))
+        self.compensation = np.zeros(len(MEASURE_COLUMNS))
+        self.nobs = np.zeros(len(MEASURE_COLUMNS))
+        self.last_emitted_slot = None
+
+    def _recent_targets(self, k):
+        """Les k dernières températures de créneau, de la plus ancienne à la plus récente."""
+        return self.history[(self.position - k + np.arange(k)) % N_LAGS]
+
+    def _close_bucket(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(self.nobs > 0, self.sums / self.nobs, np.nan)
+        slot = self.pending_slot
+        target = means[0]
+
+        row = np.empty(len(FEATURE_COLUMNS))
+        row[:3] = means[1:]
+        row[3 : 3 + N_LAGS] = self._recent_targets(N_LAGS)[::-1]
+        timestamp = pd.Timestamp(slot * STEP_NS)
+        row[3 + N_LAGS : 7 + N_LAGS] = [
+            timestamp.hour,
+            timestamp.dayofweek,
+            timestamp.month,
+            timestamp.day,
+        ]
+        # Toujours N_LAGS créneaux vus avant d'émettre (sinon lags manquants)
+        window = np.append(self._recent_targets(ROLLING_WINDOW - 1), target)
+        mean, std = window_mean_std(window[None, :])
+        row[-2], row[-1] = mean[0], std[0]
+        complete = self.buckets >= N_LAGS
+
+        self.history[self.position] = target
+        self.position = (self.position + 1) % N_LAGS
+        self.buckets += 1
+        self.last_emitted_slot = slot
+        self.pending_slot = None
+        self.sums[:] = 0.0
+        self.compensation[:] = 0.0
+        self.nobs[:] = 0.0
+
+        if complete and not (np.isnan(row).any() or np.isnan(target)):
+            return slot, row, target
+        return None
+
+    def _add(self, timestamp_ns, values):
+        slot = timestamp_ns // STEP_NS
+        emitted = []
+
+        if self.pending_slot is not None and slot != self.pending_slot:
+            if slot < self.pending_slot:
+                raise ValueError("Relevés non ordonnés dans le temps")
+            emitted.append(self._close_bucket())
+        if self.last_emitted_slot is not None and slot <= self.last_emitted_slot:
+            raise ValueError("Relevé d'un créneau de 3h déjà émis")
+
+        self.pending_slot = slot
+        valid = ~np.isnan(values)
+        t, c = kahan_step(self.sums, self.compensation, values)
+        self.sums = np.where(valid, t, self.sums)
+        self.compensation = np.where(valid, c, self.compensation)
+        self.nobs += valid
+
+        # Dernière heure du créneau : inutile d'attendre le relevé suivant
+        if timestamp_ns - slot * STEP_NS >= STEP_NS - HOUR_NS:
+            emitted.append(self._close_bucket())
+
+        return [row for row in emitted if row is not None]
+
+    def update(self, df):
+        """
+        Ajoute des relevés horaires (timestamp et MEASURE_COLUMNS, triés).
+
+        Returns:
+            tuple: (X, y) des seuls créneaux terminés par ces relevés
+        """
+        timestamps = pd.to_datetime(df["timestamp"]).to_numpy()
+        timestamps = timestamps.astype("datetime64[ns]").astype(np.int64)
+        values = df[MEASURE_COLUMNS].to_numpy(dtype=np.float64)
+
+        emitted = []
+        for timestamp_ns, row in zip(timestamps, values):
+            emitted.extend(self._add(int(timestamp_ns), row))
+
+        return self._frames(emitted)
+
+    def flush(self):
+        """Termine le créneau en cours (fin de flux ou créneau incomplet)."""
+        if self.pending_slot is None:
+            return self._frames([])
+        row = self._close_bucket()
+        return self._frames([row] if row is not None else [])
+
+    @staticmethod
+    def _frames(emitted):
+        slots = np.array([slot for slot, _, _ in emitted], dtype=np.int64)
+        matrix = np.array([row for _, row, _ in emitted]).reshape(
+            -1, len(FEATURE_COLUMNS)
+        )
+        target = np.array([t for _, _, t in emitted], dtype=np.float64)
+
+        index = pd.DatetimeIndex(
+            (slots * STEP_NS).astype("datetime64[ns]"), name="timestamp"
+        ).as_unit(INDEX_UNIT)
+        columns = {}
+        for j, col in enumerate(FEATURE_COLUMNS):
+            if col in CALENDAR_COLUMNS:
+                columns[col] = matrix[:, j].astype(np.int32)
+            else:
+                columns[col] = matrix[:, j]
+
+        X = pd.DataFrame(columns, index=index)
+        y = pd.Series(target, index=index, name=TARGET_COLUMN)
+        return X, y
+
+    def state_dict(self):
+        # NaN n'existe pas en JSON : remplacés par None
+        def to_list(values):
+            return [None if np.isnan(v) else float(v) for v in values]
+
+        return {
+            "version": STATE_VERSION,
+            "history": to_list(self.history),
+            "position": self.position,
+            "buckets": self.buckets,
+            "pending_slot": self.pending_slot,
+            "sums": to_list(self.sums),
+            "compensation": to_list(self.compensation),
+            "nobs": to_list(self.nobs),
+            "last_emitted_slot": self.last_emitted_slot,
+        }
+
+    @classmethod
+    def from_state_dict(cls, state):
+        if state.get("version") != STATE_VERSION:
+            raise ValueError(f"Version d'état inconnue: {state.get('version')}")
+
+        def to_array(values):
+            return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+        builder = cls()
+        builder.history = to_array(state["history"])
+        builder.position = state["position"]
+        builder.buckets = state["buckets"]
+        builder.pending_slot = state["pending_slot"]
+        builder.sums = to_array(state["sums"])
+        builder.compensation = to_array(state["compensation"])
+        builder.nobs = to_array(state["nobs"])
+        builder.last_emitted_slot = state["last_emitted_slot"]
+        return builder
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Restaure l'état sauvegardé, ou un état vide si le fichier n'existe pas."""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_state_dict(json.load(f))
+
+
+# Répertoire des états persistés, un fichier JSON par flux
+FEATURE_STATE_DIR = os.environ.get(
+    "FEATURE_STATE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "state"),
+)
+
+_stream_locks = {}
+_stream_locks_guard = threading.Lock()
+
+
+def state_path(stream):
+    if not re.fullmatch(r"[A-Za-z0-9_-]+", stream):
+        raise ValueError(f"Nom de flux invalide: {stream}")
+    return os.path.join(FEATURE_STATE_DIR, f"{stream}.json")
+
+
+def update_stream(stream, df, flush=False, reset=False):
+    """
+    Charge l'état du flux, ajoute les relevés et sauvegarde le nouvel état.
+
+    Les appels concurrents sur un même flux sont sérialisés.
+
+    Returns:
+        tuple: (X, y) des créneaux terminés par ces relevés
+    """
+    path = state_path(stream)
+    with _stream_locks_guard:
+        lock = _stream_locks.setdefault(stream, threading.Lock())
+
+    with lock:
+        builder = (
+            IncrementalFeatureBuilder()
+            if reset
+            else IncrementalFeatureBuilder.load(path)
+        )
+        X, y = builder.update(df)
+        if flush:
+            X_last, y_last = builder.flush()
+            X, y = pd.concat([X, X_last]), pd.concat([y, y_last])
+        builder.save(path)
+
+    return X, y
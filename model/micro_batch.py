@@ -0,0 +1,111 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Regroupe les requêtes concurrentes en un seul appel vectorisé.
+
+    Chaque requête (liste d'éléments) est placée dans une file ; un thread
+    dédié attend au plus `max_wait` secondes après la première requête d'un lot
+    (ou jusqu'à `max_batch_size` éléments), appelle `predict` une fois sur
+    tous les éléments du lot et renvoie à chaque requête ses lignes du résultat.
+    Une requête n'est jamais découpée : un lot contient au moins une requête.
+    """
+
+    def __init__(self, predict, max_batch_size=64, max_wait=0.005):
+        self.predict = predict
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {"requests": 0, "items": 0, "batches": 0, "max_batch_items": 0}
+
+    def submit(self, items):
+        """Ajoute une requête au prochain lot ; renvoie un Future (lignes de `predict`)."""
+        future = Future()
+        if not items:
+            future.set_result([])
+            return future
+        self._ensure_worker()
+        self._queue.put((list(items), future))
+        return future
+
+    def __call__(self, items, timeout=None):
+        return self.submit(items).result(timeout)
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="micro-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def close(self):
+        """Arrête le thread après les lots en cours."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._queue.put(None)
+                self._thread.join()
+            self._thread = None
+
+    def _collect(self, first):
+        batch, size = [first], len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                # Arrêt demandé : traité après ce lot
+                self._queue.put(None)
+                break
+            batch.append(request)
+            size += len(request[0])
+        return batch, size
+
+    def _run(self):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                return
+            batch, size = self._collect(request)
+
+            items = [item for request_items, _ in batch for item in request_items]
+            try:
+                results = self.predict(items)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for request_items, future in batch:
+                future.set_result(results[offset : offset + len(request_items)])
+                offset += len(request_items)
+
+            with self._lock:
+                self._stats["requests"] += len(batch)
+                self._stats["items"] += size
+                self._stats["batches"] += 1
+                self._stats["max_batch_items"] = max(
+                    self._stats["max_batch_items"], size
+                )
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["mean_batch_items"] = (
+            stats["items"] / stats["batches"] if stats["batches"] else 0.0
+        )
+        stats["max_batch_size"] = self.max_batch_size
+        stats["max_wait_ms"] = self.max_wait * 1000
+        return stats
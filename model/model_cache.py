@@ -0,0 +1,153 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from model.artifacts import load_artifact, compile_model, model_nbytes
+
+# Configuration du cache via les variables d'environnement
+MODEL_CACHE_MAX_ENTRIES = int(os.environ.get("MODEL_CACHE_MAX_ENTRIES", "4"))
+MODEL_CACHE_MAX_BYTES = int(os.environ.get("MODEL_CACHE_MAX_BYTES", str(1024**3)))
+
+
+class ModelCache:
+    """
+    Cache en mémoire des modèles chargés depuis le registre.
+
+    Les entrées sont indexées par chemin du fichier et invalidées lorsque la
+    date de modification du fichier change. L'éviction se fait par ordre LRU
+    dès que le nombre d'entrées ou la taille résidente dépasse le budget ; la
+    taille d'un modèle est celle de ses tableaux une fois chargé (celle du
+    fichier pour un modèle sans tableaux).
+    """
+
+    def __init__(
+        self, max_entries=MODEL_CACHE_MAX_ENTRIES, max_bytes=MODEL_CACHE_MAX_BYTES
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_load_seconds = 0.0
+
+    @staticmethod
+    def _signature(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, path, model_id=None, compiled=False):
+        """
+        Args:
+            compiled: modèle préparé pour le moteur "compiled"
+                (model.artifacts.compile_model), mis en cache séparément
+        """
+        key = (os.path.abspath(path), compiled)
+        signature = self._signature(path)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["signature"] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                entry["hits"] += 1
+                return entry["model"]
+            self.misses += 1
+
+        start = time.perf_counter()
+        model = load_artifact(path)
+        if compiled:
+            model = compile_model(model)
+        load_seconds = time.perf_counter() - start
+        size_bytes = model_nbytes(model) if signature is not None else 0
+
+        with self._lock:
+            self.total_load_seconds += load_seconds
+
+            # Fichier introuvable (ou non lisible) : on ne met rien en cache
+            if signature is None:
+                self._entries.pop(key, None)
+                return model
+
+            self._entries[key] = {
+                "model": model,
+                "model_id": model_id,
+                "path": key[0],
+                "compiled": compiled,
+                "signature": signature,
+                "size_bytes": size_bytes or signature[1],
+                "load_seconds": load_seconds,
+                "loaded_at": time.time(),
+                "hits": 0,
+            }
+            self._entries.move_to_end(key)
+            self._evict()
+
+        return model
+
+    def _evict(self):
+        # On garde toujours au moins le dernier modèle chargé
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries
+            or self.resident_bytes > self.max_bytes
+        ):
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    @property
+    def resident_bytes(self):
+        return sum(entry["size_bytes"] for entry in self._entries.values())
+
+    def warmup(self, models):
+        """Précharge une liste de couples (model_id, path)."""
+        loaded = 0
+        for model_id, path in models:
+            if not os.path.exists(path):
+                print(f"Modèle introuvable lors du préchargement: {path}")
+                continue
+            self.get(path, model_id=model_id)
+            loaded += 1
+        return loaded
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.total_load_seconds = 0.0
+
+    def stats(self):
+        with self._lock:
+            requests_count = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests_count if requests_count else None,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "resident_bytes": self.resident_bytes,
+                "max_bytes": self.max_bytes,
+                "total_load_seconds": self.total_load_seconds,
+                "models": [
+                    {
+                        "model_id": entry["model_id"],
+                        "path": entry["path"],
+                        "compiled": entry["compiled"],
+                        "size_bytes": entry["size_bytes"],
+                        "load_seconds": entry["load_seconds"],
+                        "loaded_at": entry["loaded_at"],
+                        "hits": entry["hits"],
+                    }
+                    for entry in self._entries.values()
+                ],
+            }
+
+
+model_cache = ModelCache()
@@ -1,16 +1,31 @@
 from data.db_init import get_engine
 from sqlalchemy.orm import sessionmaker
 from data.db_class import Prediction, Model
-from sqlalchemy.exc import IntegrityError
 import joblib
 import os
+import time
 from datetime import datetime
 from data.db_init import get_engine
 from sqlalchemy.orm import sessionmaker
 from data.db_class import Model
 import requests
+import numpy as np
 import pandas as pd
-from sklearn.ensemble import RandomForestRegressor
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
+from model.model_cache import model_cache
+from model.artifacts import save_artifact, describe_artifact, INFERENCE_ENGINE
+from model.feature_engine import build_features, build_features_from_aggregates
+from data.db_bulk import bulk_insert_ignore, to_epoch_seconds, frame_to_records
+
+# Options d'entraînement par défaut (surchargées par les paramètres de train_model)
+TRAINING_BACKENDS = ("random_forest", "hist_gradient_boosting")
+TRAINING_BACKEND = os.environ.get("TRAINING_BACKEND", "random_forest")
+TRAINING_N_JOBS = (
+    int(os.environ["TRAINING_N_JOBS"]) if os.environ.get("TRAINING_N_JOBS") else None
+)
+
+# Calcul des features : "numpy" (model.feature_engine) ou "pandas" (implémentation d'origine)
+FEATURE_ENGINE = os.environ.get("FEATURE_ENGINE", "numpy")
 
 
 def create_features(df):
@@ -40,6 +55,13 @@ def create_features(df):
 
 
 def preprocess_data(df):
+    """Agrégation au pas de 3h et features (lags, calendrier, fenêtres glissantes)."""
+    if FEATURE_ENGINE == "pandas":
+        return preprocess_data_pandas(df)
+    return build_features(df)
+
+
+def preprocess_data_pandas(df):
     data = df.copy()
 
     data["timestamp"] = pd.to_datetime(data["timestamp"])
@@ -85,19 +107,124 @@ def preprocess_data(df):
     return X, y
 
 
-def train_model(X, y, version):
+def build_estimator(backend=None, n_jobs=None):
+    backend = backend or TRAINING_BACKEND
+    if backend == "random_forest":
+        return RandomForestRegressor(
+            n_estimators=200,
+            random_state=42,
+            max_depth=20,
+            min_samples_split=2,
+            n_jobs=n_jobs,
+        )
+    if backend == "hist_gradient_boosting":
+        # Parallélisé par OpenMP (OMP_NUM_THREADS), sans paramètre n_jobs
+        return HistGradientBoostingRegressor(max_iter=200, random_state=42)
+    raise ValueError(f"Backend inconnu: {backend} ({', '.join(TRAINING_BACKENDS)})")
 
-    model = RandomForestRegressor(
-        n_estimators=200, random_state=42, max_depth=20, min_samples_split=2
-    )
-    model.fit(X, y)
 
-    model_path = f"model/registry/model{version}.pkl"
-    model_name = "RandomForestRegressor"
+def _warm_start_estimator(parent, X, add_estimators, n_jobs):
+    """Recharge un modèle enregistré et prépare l'ajout d'arbres (ou d'itérations)."""
+    if not os.path.exists(parent.path):
+        raise FileNotFoundError(f"Le fichier de modèle n'existe pas: {parent.path}")
+
+    # Chargement hors cache : le modèle est modifié par le nouvel entraînement
+    model = joblib.load(parent.path)
+
+    expected = list(getattr(model, "feature_names_in_", X.columns))
+    if expected != list(X.columns):
+        raise ValueError("Les features ne correspondent pas au modèle de départ")
+
+    if isinstance(model, RandomForestRegressor):
+        model.set_params(
+            warm_start=True,
+            n_estimators=model.n_estimators + add_estimators,
+            n_jobs=n_jobs,
+        )
+    elif isinstance(model, HistGradientBoostingRegressor):
+        model.set_params(warm_start=True, max_iter=model.max_iter + add_estimators)
+    else:
+        raise ValueError(f"Modèle non compatible warm start: {type(model).__name__}")
+
+    return model
+
+
+def _backend_name(model):
+    if isinstance(model, HistGradientBoostingRegressor):
+        return "hist_gradient_boosting"
+    return "random_forest"
+
+
+def _n_estimators(model):
+    if isinstance(model, HistGradientBoostingRegressor):
+        return int(model.n_iter_)
+    return len(model.estimators_)
+
+
+def train_model(
+    X,
+    y,
+    version,
+    n_jobs=None,
+    backend=None,
+    warm_start_model_id=None,
+    add_estimators=50,
+    artifact_format=None,
+    inference_engine=None,
+    location=None,
+):
+    """
+    Entraîne et enregistre un modèle.
+
+    Args:
+        n_jobs: nombre de cœurs pour la forêt aléatoire (-1 : tous)
+        backend: "random_forest" (défaut) ou "hist_gradient_boosting"
+        warm_start_model_id: modèle enregistré à compléter par `add_estimators`
+            arbres (ou itérations) entraînés sur les nouvelles données, au lieu
+            d'un entraînement complet
+        artifact_format: format du fichier enregistré (model.artifacts.ARTIFACT_FORMATS)
+        inference_engine: moteur de prédiction du modèle ("sklearn" ou "compiled")
+        location: site (latitude, longitude) des données d'entraînement, enregistré
+            avec le modèle et utilisé par défaut pour ses prédictions
+
+    Returns:
+        str: chemin du modèle enregistré
+    """
+    n_jobs = n_jobs if n_jobs is not None else TRAINING_N_JOBS
+
+    if warm_start_model_id is not None:
+        engine = get_engine()
+        Session = sessionmaker(bind=engine)
+        session = Session()
+        try:
+            parent = (
+                session.query(Model).filter(Model.id == warm_start_model_id).first()
+            )
+        finally:
+            session.close()
+        if parent is None:
+            raise ValueError(f"Modèle de départ non trouvé: {warm_start_model_id}")
+        model = _warm_start_estimator(parent, X, add_estimators, n_jobs)
+    else:
+        model = build_estimator(backend, n_jobs)
+
+    start = time.perf_counter()
+    model.fit(X, y)
+    fit_seconds = time.perf_counter() - start
+    model.set_params(warm_start=False)
+
+    latitude, longitude = location if location is not None else (None, None)
+    if location is not None:
+        # Un fichier par site pour une même version
+        model_path = f"model/registry/model{version}_{latitude}_{longitude}.pkl"
+    else:
+        model_path = f"model/registry/model{version}.pkl"
+    model_name = type(model).__name__
     created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     os.makedirs(os.path.dirname(model_path), exist_ok=True)
-    joblib.dump(model, model_path)
+    artifact_format = save_artifact(model, model_path, artifact_format)
+    artifact = describe_artifact(model_path)
 
     try:
         engine = get_engine()
@@ -105,7 +232,21 @@ def train_model(X, y, version):
         session = Session()
 
         model_entry = Model(
-            name=model_name, version=version, created_at=created_at, path=model_path
+            name=model_name,
+            version=version,
+            created_at=created_at,
+            path=model_path,
+            backend=_backend_name(model),
+            n_jobs=n_jobs if isinstance(model, RandomForestRegressor) else None,
+            n_estimators=_n_estimators(model),
+            parent_model_id=warm_start_model_id,
+            fit_seconds=fit_seconds,
+            training_rows=len(X),
+            artifact_format=artifact_format,
+            inference_engine=inference_engine,
+            latitude=latitude,
+            longitude=longitude,
+            **artifact,
         )
 
         session.add(model_entry)
@@ -114,7 +255,7 @@ def train_model(X, y, version):
         model_id = model_entry.id
         session.close()
 
-        print(f"Modèle enregistré avec ID {model_id}")
+        print(f"Modèle enregistré avec ID {model_id} ({fit_seconds:.1f}s)")
 
     except Exception as e:
         print(f"Erreur lors de l'enregistrement du modèle dans la base de données: {e}")
@@ -125,93 +266,218 @@ def train_model(X, y, version):
     return model_path
 
 
-def predict(path, X_input):
+PREDICTION_COLUMNS = [
+    "relative_humidity",
+    "precipitation",
+    "surface_pressure",
+    "latitude",
+    "longitude",
+    "prediction",
+    "real",
+]
 
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"Le fichier de modèle n'existe pas: {path}")
 
-    model = joblib.load(path)
+def get_model_id(path):
+    engine = get_engine()
+    Session = sessionmaker(bind=engine)
+    session = Session()
 
-    X_processed = X_input.copy()
+    try:
+        # Le dernier enregistrement correspond au fichier actuellement sur disque
+        model_info = (
+            session.query(Model)
+            .filter(Model.path == path)
+            .order_by(Model.id.desc())
+            .first()
+        )
+        return model_info.id if model_info else None
+    finally:
+        session.close()
 
-    X, y = preprocess_data(X_processed)
 
-    y_pred = model.predict(X)
+def build_prediction_records(result_df, model_id):
+    # Conversion vectorisée des colonnes : timestamp en secondes epoch, valeurs en float
+    records = pd.DataFrame(index=result_df.index)
+    records["model_id"] = model_id
+
+    if "timestamp" in result_df.columns:
+        records["timestamp"] = to_epoch_seconds(result_df["timestamp"])
+    else:
+        records["timestamp"] = None
+
+    for col in PREDICTION_COLUMNS:
+        if col in result_df.columns:
+            records[col] = pd.to_numeric(result_df[col], errors="coerce")
+        else:
+            records[col] = None
+
+    return frame_to_records(records)
+
+
+def save_predictions_to_db(result_df, model_id, engine=None):
+    """
+    Enregistre toutes les prédictions d'un appel dans une seule transaction.
+
+    Les doublons sur (timestamp, latitude, longitude, model_id) sont ignorés.
+
+    Returns:
+        dict: nombre de prédictions insérées et ignorées
+    """
+    return save_batch_predictions([(result_df, model_id)], engine=engine)
+
+
+def save_batch_predictions(results, engine=None):
+    """
+    Enregistre les prédictions de plusieurs modèles dans une seule transaction.
+
+    Args:
+        results: liste de couples (DataFrame de résultats, model_id)
+
+    Returns:
+        dict: nombre de prédictions insérées et ignorées
+    """
+    records = []
+    for result_df, model_id in results:
+        if not result_df.empty:
+            records.extend(build_prediction_records(result_df, model_id))
+    if not records:
+        return {"inserted": 0, "skipped": 0}
+
+    engine = engine or get_engine()
+    with engine.begin() as connection:
+        inserted = bulk_insert_ignore(connection, Prediction.__table__, records)
 
-    results = []
+    return {"inserted": inserted, "skipped": len(records) - inserted}
+
+
+def build_prediction_frame(X, y, y_pred, latitude, longitude, created_at=None):
+    """
+    Assemble le DataFrame de résultats colonne par colonne (une ligne par prédiction).
+
+    Toutes les lignes d'un même appel partagent le même `created_at`.
+    """
+    n = len(y_pred)
+    if n == 0:
+        return pd.DataFrame()
+
+    if created_at is None:
+        created_at = pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    columns = {
+        "prediction": np.asarray(y_pred),
+        "timestamp": (
+            X.index.to_numpy()
+            if hasattr(X, "index") and len(X.index) == n
+            else np.full(n, None, dtype=object)
+        ),
+        "created_at": np.full(n, created_at, dtype=object),
+    }
+
+    for col in ["relative_humidity", "precipitation", "surface_pressure"]:
+        if col in X.columns:
+            columns[col] = X[col].to_numpy()
+
+    columns["latitude"] = np.full(
+        n, latitude, dtype=object if latitude is None else None
+    )
+    columns["longitude"] = np.full(
+        n, longitude, dtype=object if longitude is None else None
+    )
+
+    if isinstance(y, pd.Series) or isinstance(y, pd.DataFrame):
+        if len(y) == n:
+            columns["real"] = y.to_numpy()
+
+    return pd.DataFrame(columns)
+
+
+def predict_models(models, X_input, aggregated=False):
+    """
+    Prédit avec plusieurs modèles sur les mêmes relevés.
+
+    Les features sont calculées une seule fois et la même matrice est
+    transmise à chaque modèle ; rien n'est enregistré (save_batch_predictions).
+
+    Args:
+        models: liste de (model_id, path, inference_engine)
+
+    Returns:
+        dict: DataFrame de résultats par model_id
+    """
+    if aggregated:
+        X, y = build_features_from_aggregates(X_input)
+    else:
+        X, y = preprocess_data(X_input.copy())
 
     latitude = X_input["latitude"].iloc[0] if "latitude" in X_input.columns else None
     longitude = X_input["longitude"].iloc[0] if "longitude" in X_input.columns else None
+    created_at = pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    results = {}
+    for model_id, path, inference_engine in models:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Le fichier de modèle n'existe pas: {path}")
+        model = model_cache.get(
+            path,
+            model_id=model_id,
+            compiled=(inference_engine or INFERENCE_ENGINE) == "compiled",
+        )
+        y_pred = model.predict(X) if len(X) else np.array([])
+        results[model_id] = build_prediction_frame(
+            X, y, y_pred, latitude, longitude, created_at
+        )
 
-    # Créer une ligne de résultat pour chaque prédiction
-    for i in range(len(y_pred)):
-        row = {
-            "prediction": y_pred[i],
-            "timestamp": (
-                X.index[i]
-                if hasattr(X, "index") and len(X.index) == len(y_pred)
-                else None
-            ),
-            "created_at": pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S"),
-        }
+    return results
 
-        for col in ["relative_humidity", "precipitation", "surface_pressure"]:
-            if col in X.columns:
-                row[col] = X[col].iloc[i]
 
-        row["latitude"] = latitude
-        row["longitude"] = longitude
+def predict(
+    path,
+    X_input,
+    model_id=None,
+    persist=True,
+    aggregated=False,
+    inference_engine=None,
+):
+    """
+    Prédit la température sur les relevés `X_input`.
 
-        if isinstance(y, pd.Series) or isinstance(y, pd.DataFrame):
-            if len(y) == len(y_pred):
-                row["real"] = y.iloc[i]
+    Avec `aggregated=True`, X_input contient des créneaux de 3h déjà agrégés
+    (data.data_access.load_aggregates_3h) au lieu de relevés horaires.
+    `inference_engine` : "sklearn" ou "compiled" (INFERENCE_ENGINE par défaut).
+    """
 
-        results.append(row)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Le fichier de modèle n'existe pas: {path}")
 
-    result_df = pd.DataFrame(results)
+    model = model_cache.get(
+        path,
+        model_id=model_id,
+        compiled=(inference_engine or INFERENCE_ENGINE) == "compiled",
+    )
 
-    try:
-        engine = get_engine()
-        Session = sessionmaker(bind=engine)
-        session = Session()
+    X_processed = X_input.copy()
 
-        model_info = session.query(Model).filter(Model.path == path).first()
-        model_id = model_info.id if model_info else None
-
-        if model_id:
-            for _, row in result_df.iterrows():
-                prediction_entry = Prediction(
-                    model_id=model_id,
-                    timestamp=str(row["timestamp"]) if "timestamp" in row else None,
-                    relative_humidity=(
-                        str(row["relative_humidity"])
-                        if "relative_humidity" in row
-                        else None
-                    ),
-                    precipitation=(
-                        str(row["precipitation"]) if "precipitation" in row else None
-                    ),
-                    surface_pressure=(
-                        str(row["surface_pressure"])
-                        if "surface_pressure" in row
-                        else None
-                    ),
-                    latitude=str(row["latitude"]) if "latitude" in row else None,
-                    longitude=str(row["longitude"]) if "longitude" in row else None,
-                    prediction=str(row["prediction"]),
-                    real=str(row["real"]) if "real" in row else None,
-                )
-
-                try:
-                    session.add(prediction_entry)
-                    session.commit()
-                except IntegrityError:
-                    # En cas de doublon, faire un rollback et continuer
-                    session.rollback()
+    if aggregated:
+        X, y = build_features_from_aggregates(X_processed)
+    else:
+        X, y = preprocess_data(X_processed)
 
-        session.close()
-    except Exception as e:
-        print(f"Erreur lors de l'enregistrement des prédictions: {e}")
+    y_pred = model.predict(X)
+
+    latitude = X_input["latitude"].iloc[0] if "latitude" in X_input.columns else None
+    longitude = X_input["longitude"].iloc[0] if "longitude" in X_input.columns else None
+
+    result_df = build_prediction_frame(X, y, y_pred, latitude, longitude)
+
+    if persist:
+        try:
+            if model_id is None:
+                model_id = get_model_id(path)
+
+            if model_id:
+                save_predictions_to_db(result_df, model_id)
+        except Exception as e:
+            print(f"Erreur lors de l'enregistrement des prédictions: {e}")
 
     return result_df
 
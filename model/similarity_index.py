@@ -0,0 +1,304 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from model.feature_store import feature_store
+
+SIMILARITY_INDEX_DIR = os.environ.get(
+    "SIMILARITY_INDEX_DIR", "model/registry/similarity"
+)
+
+# Lignes de l'index comparées par bloc (matrice requêtes x bloc en mémoire)
+SIMILARITY_BLOCK_ROWS = int(os.environ.get("SIMILARITY_BLOCK_ROWS", "8192"))
+
+# Index IVF : nombre de listes (racine du nombre de lignes si 0) et de listes
+# parcourues par requête
+SIMILARITY_IVF_LISTS = int(os.environ.get("SIMILARITY_IVF_LISTS", "0"))
+SIMILARITY_IVF_PROBE = int(os.environ.get("SIMILARITY_IVF_PROBE", "8"))
+
+INDEX_KINDS = ("exact", "ivf")
+
+
+# Composantes mises à zéro : leurs produits seraient des float32 dénormalisés,
+# qui ralentissent fortement les produits matriciels (probabilités ~1e-20 des
+# sorties softmax), pour une contribution inférieure à la précision float32
+FLUSH_BELOW = np.sqrt(np.finfo(np.float32).tiny)
+
+
+def normalize(vectors):
+    """Vecteurs float32 de norme 1 (similarité cosinus = produit scalaire)."""
+    vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+    vectors[np.abs(vectors) < FLUSH_BELOW] = 0
+    return vectors
+
+
+def top_k(scores, k):
+    """k meilleurs scores de chaque ligne, triés par score décroissant."""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return scores[:, :0], np.zeros((len(scores), 0), dtype=np.int64)
+    indices = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    best = np.take_along_axis(scores, indices, axis=1)
+    order = np.argsort(-best, axis=1, kind="stable")
+    return np.take_along_axis(best, order, axis=1), np.take_along_axis(
+        indices, order, axis=1
+    )
+
+
+class ExactIndex:
+    """
+    Recherche exacte des plus proches voisins (similarité cosinus).
+
+    Les vecteurs normalisés sont parcourus par blocs de `block_rows` lignes :
+    un produit matriciel requêtes x bloc, puis les k meilleurs du bloc sont
+    fusionnés avec ceux des blocs précédents ; la mémoire utilisée ne dépend
+    pas de la taille de l'index.
+    """
+
+    kind = "exact"
+
+    def __init__(self, vectors, ids):
+        self.vectors = vectors
+        self.ids = np.asarray(ids, dtype=str)
+
+    @classmethod
+    def build(cls, vectors, ids):
+        return cls(normalize(vectors), ids)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def search(self, queries, k=10, block_rows=SIMILARITY_BLOCK_ROWS):
+        """
+        Returns:
+            tuple: (scores (n_requêtes, k), indices des lignes de l'index)
+        """
+        queries = normalize(queries)
+        scores = np.empty((len(queries), 0), dtype=np.float32)
+        indices = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(self.vectors), block_rows):
+            block = queries @ self.vectors[start : start + block_rows].T
+            block_scores, block_indices = top_k(block, k)
+            scores, best = top_k(np.hstack([scores, block_scores]), k)
+            indices = np.take_along_axis(
+                np.hstack([indices, block_indices + start]), best, axis=1
+            )
+        return scores, indices
+
+    def _arrays(self):
+        return {"vectors": self.vectors, "ids": self.ids}
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name, array in self._arrays().items():
+            np.save(os.path.join(directory, f"{name}.npy"), array)
+
+    @classmethod
+    def load(cls, directory):
+        vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        ids = np.load(os.path.join(directory, "ids.npy"))
+        return cls(vectors, ids)
+
+
+def spherical_kmeans(vectors, n_lists, n_iter=10, seed=0):
+    """
+    K-moyennes sur des vecteurs normalisés (affectation par produit scalaire).
+
+    Returns:
+        tuple: (centroïdes normalisés (n_lists, dim), liste de chaque vecteur)
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)]
+    for _ in range(n_iter):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        members = csr_matrix(
+            (
+                np.ones(len(vectors), dtype=np.float32),
+                (assignment, np.arange(len(vectors))),
+            ),
+            shape=(n_lists, len(vectors)),
+        )
+        sums = np.asarray(members @ vectors)
+        # Liste vide : nouveau centroïde tiré parmi les vecteurs
+        empty = np.flatnonzero(~sums.any(axis=1))
+        sums[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+        centroids = normalize(sums)
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+
+class IVFIndex(ExactIndex):
+    """
+    Index à listes inversées (quantification grossière).
+
+    Les vecteurs sont répartis en `n_lists` listes par k-moyennes ; une requête
+    n'est comparée qu'aux vecteurs des `n_probe` listes dont le centroïde est
+    le plus proche. Les vecteurs sont rangés liste par liste : la liste l
+    occupe les lignes offsets[l]:offsets[l + 1].
+    """
+
+    kind = "ivf"
+
+    def __init__(self, vectors, ids, centroids, offsets):
+        super().__init__(vectors, ids)
+        self.centroids = centroids
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, vectors, ids, n_lists=SIMILARITY_IVF_LISTS, n_iter=10, seed=0):
+        vectors = normalize(vectors)
+        n_lists = n_lists or int(np.sqrt(len(vectors)))
+        n_lists = max(1, min(n_lists, len(vectors)))
+        centroids, assignment = spherical_kmeans(vectors, n_lists, n_iter, seed)
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(assignment, minlength=n_lists))]
+        )
+        return cls(vectors[order], np.asarray(ids)[order], centroids, offsets)
+
+    def search(self, queries, k=10, n_probe=SIMILARITY_IVF_PROBE):
+        queries = normalize(queries)
+        n_probe = min(n_probe, len(self.centroids))
+        _, probes = top_k(queries @ self.centroids.T, n_probe)
+
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        for i, (query, lists) in enumerate(zip(queries, probes)):
+            candidates = np.concatenate(
+                [
+                    np.arange(self.offsets[l], self.offsets[l + 1])
+                    for l in np.sort(lists)
+                ]
+            )
+            if not len(candidates):
+                continue
+            block = self.vectors[candidates]
+            best_scores, best = top_k((block @ query)[None], k)
+            scores[i, : best.shape[1]] = best_scores[0]
+            indices[i, : best.shape[1]] = candidates[best[0]]
+        return scores, indices
+
+    def _arrays(self):
+        return {
+            "vectors": self.vectors,
+            "ids": self.ids,
+            "centroids": self.centroids,
+            "offsets": self.offsets,
+        }
+
+    @classmethod
+    def load(cls, directory):
+        exact = ExactIndex.load(directory)
+        return cls(
+            exact.vectors,
+            exact.ids,
+            np.load(os.path.join(directory, "centroids.npy")),
+            np.load(os.path.join(directory, "offsets.npy")),
+        )
+
+
+INDEX_CLASSES = {"exact": ExactIndex, "ivf": IVFIndex}
+
+_indexes = {}
+_build_locks = {}
+_lock = threading.Lock()
+
+
+def index_directory(split, modality, kind):
+    return os.path.join(SIMILARITY_INDEX_DIR, f"{split}_{modality}_{kind}")
+
+
+# Fichier de `directory` contenant le nom de la version en place de l'index
+CURRENT_FILE = "CURRENT"
+
+
+def current_version(directory):
+    """Répertoire de la version en place de l'index, ou None s'il n'y en a pas."""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as f:
+            return os.path.join(directory, f.read().strip())
+    except FileNotFoundError:
+        return None
+
+
+def save_index(index, directory):
+    """
+    Enregistre l'index comme nouvelle version de `directory` puis la met en
+    place en remplaçant le fichier CURRENT (os.replace, atomique) : un
+    chargement concurrent lit toujours une version complète et les fichiers
+    déjà projetés en mémoire ne sont jamais réécrits.
+
+    La version remplacée est conservée (un chargement peut venir de la lire
+    dans CURRENT) ; les plus anciennes sont supprimées.
+    """
+    os.makedirs(directory, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(suffix=".tmp", dir=directory)
+    index.save(tmp_dir)
+    # Noms ordonnés par date de fin d'écriture
+    version = f"{time.time_ns():020d}.{os.getpid()}"
+    os.replace(tmp_dir, os.path.join(directory, version))
+
+    previous = current_version(directory)
+    fd, tmp_pointer = tempfile.mkstemp(suffix=".tmp", dir=directory)
+    with os.fdopen(fd, "w") as f:
+        f.write(version)
+    os.replace(tmp_pointer, os.path.join(directory, CURRENT_FILE))
+
+    if previous is None:
+        return
+    kept = os.path.basename(previous)
+    for name in os.listdir(directory):
+        # Les versions en cours d'écriture (.tmp) ne sont pas touchées
+        if name < kept and not name.endswith(".tmp"):
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+def get_similarity_index(
+    split="train", modality="text", kind="exact", store=feature_store
+):
+    """
+    Index d'un split et d'une modalité, chargé depuis SIMILARITY_INDEX_DIR ou
+    construit puis enregistré s'il est absent ou plus ancien que les features.
+    """
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Index inconnu: {kind} ({', '.join(INDEX_KINDS)})")
+    key = (split, modality, kind)
+    with _lock:
+        if key in _indexes:
+            return _indexes[key]
+        build_lock = _build_locks.setdefault(key, threading.Lock())
+
+    # Un seul chargement ou construction par index, les autres requêtes attendent
+    with build_lock:
+        with _lock:
+            if key in _indexes:
+                return _indexes[key]
+
+        features = store.features(split, modality)
+        directory = index_directory(split, modality, kind)
+        version = current_version(directory)
+        vectors_path = os.path.join(version, "vectors.npy") if version else None
+        source_path = getattr(features, "filename", None)
+        fresh = (
+            vectors_path is not None
+            and os.path.exists(vectors_path)
+            and (
+                source_path is None
+                or os.path.getmtime(vectors_path) >= os.path.getmtime(source_path)
+            )
+        )
+
+        if not fresh:
+            save_index(
+                INDEX_CLASSES[kind].build(features, store.image_ids(split)), directory
+            )
+            version = current_version(directory)
+        index = INDEX_CLASSES[kind].load(version)
+
+        with _lock:
+            return _indexes.setdefault(key, index)
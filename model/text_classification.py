@@ -0,0 +1,208 @@
+import os
+import re
+import threading
+import warnings
+import numpy as np
+import joblib
+from functools import lru_cache
+from scipy.sparse import csr_matrix
+from scipy.special import expit
+from sklearn.linear_model import LogisticRegression
+from sklearn.multiclass import OneVsRestClassifier
+
+from data.image_labels import LABELS
+from model.micro_batch import MicroBatcher
+
+TEXT_MODEL_PATH = os.environ.get(
+    "TEXT_MODEL_PATH", "model/registry/text_classification_model.pkl"
+)
+GLOVE_PATH = os.environ.get("GLOVE_PATH", "data/glove.6B.300d.txt")
+
+# Regroupement des requêtes de /classify/text
+TEXT_BATCH_MAX_SIZE = int(os.environ.get("TEXT_BATCH_MAX_SIZE", "32"))
+TEXT_BATCH_MAX_WAIT_MS = float(os.environ.get("TEXT_BATCH_MAX_WAIT_MS", "5"))
+
+# Étiquettes dans l'ordre des sorties du modèle
+TEXT_LABELS = LABELS
+
+
+@lru_cache(maxsize=1)
+def _nltk_tools():
+    """
+    Mots vides et lemmatiseur nltk utilisés à l'entraînement (notebook).
+
+    Sans nltk ou sans ses corpus (stopwords, wordnet), ces deux étapes sont
+    ignorées avec un avertissement : les probabilités diffèrent alors de
+    celles du modèle entraîné.
+    """
+    try:
+        from nltk.corpus import stopwords
+        from nltk.stem import WordNetLemmatizer
+
+        lemmatizer = WordNetLemmatizer()
+        lemmatizer.lemmatize("test")
+        return set(stopwords.words("english")), lru_cache(maxsize=None)(
+            lemmatizer.lemmatize
+        )
+    except (ImportError, LookupError) as e:
+        warnings.warn(
+            "nltk ou ses corpus sont absents (python -m nltk.downloader stopwords "
+            "wordnet omw-1.4) : légendes classées sans mots vides ni lemmatisation, "
+            f"contrairement à l'entraînement ({type(e).__name__})",
+            RuntimeWarning,
+            stacklevel=2,
+        )
+        return set(), None
+
+
+def preprocess_caption(caption):
+    """Minuscules, lettres uniquement, sans mots vides, lemmatisé (comme le notebook)."""
+    stop_words, lemmatize = _nltk_tools()
+    tokens = re.sub(r"[^a-z\s]", "", caption.lower()).split()
+    tokens = [token for token in tokens if token not in stop_words]
+    if lemmatize is not None:
+        tokens = [lemmatize(token) for token in tokens]
+    return tokens
+
+
+def load_glove(path=GLOVE_PATH):
+    """
+    Vecteurs GloVe et vocabulaire.
+
+    Le fichier texte n'est lu qu'une fois : les vecteurs sont ensuite
+    enregistrés à côté (`.npy`, projeté en mémoire) avec le vocabulaire
+    (`.vocab`, un mot par ligne).
+
+    Returns:
+        tuple: (vocab {mot: ligne}, vecteurs float32 (n_mots, dim))
+    """
+    vectors_path, vocab_path = path + ".npy", path + ".vocab"
+    cached = os.path.exists(vectors_path) and os.path.exists(vocab_path)
+    if cached and os.path.exists(path):
+        cached = os.path.getmtime(vectors_path) >= os.path.getmtime(path)
+
+    if not cached:
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                f"Embeddings GloVe introuvables: {path} (glove.6B.300d.txt de "
+                "https://nlp.stanford.edu/data/glove.6B.zip, chemin dans GLOVE_PATH)"
+            )
+        words, rows = [], []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                word, *values = line.rstrip().split(" ")
+                words.append(word)
+                rows.append(np.asarray(values, dtype=np.float32))
+        np.save(vectors_path, np.vstack(rows))
+        with open(vocab_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(words))
+
+    with open(vocab_path, encoding="utf-8") as f:
+        words = f.read().split("\n")
+    return {word: i for i, word in enumerate(words)}, np.load(
+        vectors_path, mmap_mode="r"
+    )
+
+
+class TextClassifier:
+    """
+    Classifieur multi-étiquettes des légendes d'images.
+
+    Les légendes sont représentées par la moyenne des vecteurs GloVe de leurs
+    mots (mots inconnus comptés comme vecteurs nuls) ; les moyennes d'un lot sont
+    calculées en un produit matrice creuse (comptes par mot) x vecteurs des
+    seuls mots présents dans le lot.
+    Un OneVsRestClassifier de régressions logistiques est évalué en un seul
+    produit matriciel (coefficients empilés) suivi de la sigmoïde, ce qui
+    donne les probabilités de predict_proba sans un appel par étiquette.
+    """
+
+    def __init__(self, model, vocab, vectors, labels=TEXT_LABELS):
+        self.model = model
+        self.vocab = vocab
+        self.vectors = vectors
+        self.labels = list(labels)
+        self.coef = self.intercept = None
+        if isinstance(model, OneVsRestClassifier) and all(
+            isinstance(estimator, LogisticRegression) for estimator in model.estimators_
+        ):
+            self.coef = np.vstack([e.coef_ for e in model.estimators_]).T
+            self.intercept = np.concatenate([e.intercept_ for e in model.estimators_])
+        if len(self.labels) != len(model.estimators_):
+            raise ValueError(
+                f"Le modèle a {len(model.estimators_)} sorties pour {len(self.labels)} étiquettes"
+            )
+
+    @classmethod
+    def load(cls, model_path=TEXT_MODEL_PATH, glove_path=GLOVE_PATH):
+        vocab, vectors = load_glove(glove_path)
+        # Prétraitement vérifié au chargement (avertissement si nltk est absent)
+        _nltk_tools()
+        return cls(joblib.load(model_path), vocab, vectors)
+
+    def embed(self, captions):
+        """Moyennes des vecteurs GloVe, une ligne par légende (zéros si vide)."""
+        rows, cols = [], []
+        lengths = np.zeros(len(captions))
+        for i, caption in enumerate(captions):
+            tokens = preprocess_caption(caption)
+            lengths[i] = len(tokens)
+            known = [self.vocab[t] for t in tokens if t in self.vocab]
+            rows.extend([i] * len(known))
+            cols.extend(known)
+
+        # Seules les lignes des mots présents sont lues (et converties en float64)
+        words, positions = np.unique(
+            np.asarray(cols, dtype=np.int64), return_inverse=True
+        )
+        counts = csr_matrix(
+            (np.ones(len(rows)), (rows, positions)),
+            shape=(len(captions), len(words)),
+        )
+        vectors = np.asarray(self.vectors[words], dtype=np.float64)
+        return (counts @ vectors) / np.maximum(lengths, 1)[:, None]
+
+    def predict_proba_embeddings(self, X):
+        if self.coef is None:
+            return self.model.predict_proba(X)
+        return expit(X @ self.coef + self.intercept)
+
+    def predict_proba(self, captions):
+        """Probabilités (n_légendes, n_étiquettes), dans l'ordre de `labels`."""
+        return self.predict_proba_embeddings(self.embed(captions))
+
+
+_classifier = None
+_batcher = None
+_lock = threading.Lock()
+
+
+def get_text_classifier():
+    """Classifieur chargé une seule fois par processus."""
+    global _classifier
+    with _lock:
+        if _classifier is None:
+            _classifier = TextClassifier.load()
+        return _classifier
+
+
+def get_text_batcher():
+    """Regroupement des requêtes concurrentes en un appel predict_proba par lot."""
+    global _batcher
+    classifier = get_text_classifier()
+    with _lock:
+        if _batcher is None:
+            _batcher = MicroBatcher(
+                classifier.predict_proba,
+                max_batch_size=TEXT_BATCH_MAX_SIZE,
+                max_wait=TEXT_BATCH_MAX_WAIT_MS / 1000,
+            )
+        return _batcher
+
+
+def shutdown_text_batcher():
+    global _batcher
+    with _lock:
+        if _batcher is not None:
+            _batcher.close()
+            _batcher = None
@@ -0,0 +1,269 @@
+import os
+import json
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from threadpoolctl import threadpool_limits
+from sqlalchemy.orm import sessionmaker
+from data.db_init import get_engine
+from data.db_class import TrainingJob
+from data.data_access import load_real_temperature, load_aggregates_3h
+from model.predict_series import (
+    preprocess_data,
+    train_model,
+    get_model_id,
+    TRAINING_N_JOBS,
+)
+from model.feature_engine import build_features_from_aggregates
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# Nombre maximal d'entraînements exécutés en parallèle (un processus par entraînement)
+TRAINING_MAX_WORKERS = int(
+    os.environ.get("TRAINING_MAX_WORKERS", str(min(2, os.cpu_count() or 1)))
+)
+
+# Cœurs disponibles pour chaque entraînement : les TRAINING_MAX_WORKERS
+# processus se partagent la machine (n_jobs de la forêt, threads OpenMP de
+# HistGradientBoosting et BLAS)
+TRAINING_CORES_PER_WORKER = max(1, (os.cpu_count() or 1) // TRAINING_MAX_WORKERS)
+
+# Taille des blocs de lecture des relevés pour l'entraînement
+READ_CHUNKSIZE = int(os.environ.get("READ_CHUNKSIZE", "50000"))
+
+# Source des données d'entraînement : "aggregates" (table RealTemperature3h,
+# sans regroupement) ou "hourly" (relevés horaires + preprocess_data)
+TRAINING_SOURCE = os.environ.get("TRAINING_SOURCE", "aggregates")
+
+_executor = None
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _session():
+    Session = sessionmaker(bind=get_engine())
+    return Session()
+
+
+def limit_n_jobs(n_jobs):
+    """n_jobs d'un entraînement ramené à TRAINING_CORES_PER_WORKER (-1 : tous ces cœurs)."""
+    if n_jobs is None:
+        return None
+    if n_jobs < 0:
+        n_jobs = (os.cpu_count() or 1) + 1 + n_jobs
+    return max(1, min(n_jobs, TRAINING_CORES_PER_WORKER))
+
+
+def _init_worker(cores):
+    # Threads natifs (OpenMP, BLAS) limités aux cœurs du processus
+    os.environ["OMP_NUM_THREADS"] = str(cores)
+    threadpool_limits(limits=cores)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        # "spawn" : les processus d'entraînement ne partagent pas l'état du serveur
+        _executor = ProcessPoolExecutor(
+            max_workers=TRAINING_MAX_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(TRAINING_CORES_PER_WORKER,),
+        )
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def update_training_job(job_id, **fields):
+    session = _session()
+    try:
+        session.query(TrainingJob).filter(TrainingJob.id == job_id).update(fields)
+        session.commit()
+    finally:
+        session.close()
+
+
+def create_training_job(version, start_date=None, end_date=None, options=None):
+    """
+    `options` : paramètres supplémentaires de train_model (backend, n_jobs...) ;
+    avec "location" ([latitude, longitude]), seules les données de ce site sont lues.
+    """
+    session = _session()
+    try:
+        job = TrainingJob(
+            status=JOB_QUEUED,
+            version=version,
+            start_date=start_date,
+            end_date=end_date,
+            options=json.dumps(options) if options else None,
+            message="En attente d'un processus d'entraînement",
+            created_at=_now(),
+        )
+        session.add(job)
+        session.commit()
+        return job.id
+    finally:
+        session.close()
+
+
+def get_training_job(job_id):
+    session = _session()
+    try:
+        job = session.query(TrainingJob).filter(TrainingJob.id == job_id).first()
+        if job is None:
+            return None
+        return {
+            "id": job.id,
+            "status": job.status,
+            "version": job.version,
+            "start_date": job.start_date,
+            "end_date": job.end_date,
+            "options": json.loads(job.options) if job.options else {},
+            "message": job.message,
+            "model_id": job.model_id,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+        }
+    finally:
+        session.close()
+
+
+def build_training_features(df):
+    """
+    (X, y) des relevés chargés pour l'entraînement, calculés site par site.
+
+    Sans `location`, les relevés de tous les sites sont lus, triés par
+    timestamp seulement : les lags et fenêtres glissantes sont calculés sur
+    la série de chaque (latitude, longitude), puis les lignes concaténées.
+    """
+    build = (
+        build_features_from_aggregates
+        if TRAINING_SOURCE == "aggregates"
+        else preprocess_data
+    )
+    if not {"latitude", "longitude"} <= set(df.columns):
+        return build(df)
+
+    sites = [build(site) for _, site in df.groupby(["latitude", "longitude"])]
+    if len(sites) == 1:
+        return sites[0]
+    return (
+        pd.concat([X for X, _ in sites]),
+        pd.concat([y for _, y in sites]),
+    )
+
+
+def run_training_job(job_id):
+    """Exécuté dans un processus du pool : charge les données et entraîne le modèle."""
+    job = get_training_job(job_id)
+    update_training_job(
+        job_id,
+        status=JOB_RUNNING,
+        started_at=_now(),
+        message="Chargement des données",
+    )
+
+    try:
+        if job["start_date"] and job["end_date"]:
+            bounds = (pd.Timestamp(job["start_date"]), pd.Timestamp(job["end_date"]))
+        else:
+            bounds = (None, None)
+
+        location = job["options"].get("location")
+        location = tuple(location) if location else None
+
+        if TRAINING_SOURCE == "aggregates":
+            df = load_aggregates_3h(*bounds, location=location)
+        else:
+            df = load_real_temperature(
+                *bounds, chunksize=READ_CHUNKSIZE, location=location
+            )
+
+        if df.empty:
+            raise ValueError("Aucune donnée disponible pour ces dates")
+
+        update_training_job(job_id, message="Préparation des features")
+        X, y = build_training_features(df)
+
+        update_training_job(job_id, message="Entraînement du modèle")
+        options = dict(job["options"])
+        n_jobs = limit_n_jobs(options.get("n_jobs", TRAINING_N_JOBS))
+        if n_jobs is not None:
+            options["n_jobs"] = n_jobs
+        model_path = train_model(X, y, job["version"], **options)
+
+        update_training_job(
+            job_id,
+            status=JOB_DONE,
+            finished_at=_now(),
+            model_id=get_model_id(model_path),
+            message=f"Model trained and saved at {model_path}",
+        )
+    except Exception as e:
+        update_training_job(
+            job_id, status=JOB_FAILED, finished_at=_now(), message=str(e)
+        )
+
+    return job_id
+
+
+def _on_job_finished(job_id, future):
+    # Le processus a pu s'arrêter brutalement (BrokenProcessPool) sans mettre à jour la tâche
+    if future.cancelled():
+        error = "Entraînement annulé"
+    else:
+        exception = future.exception()
+        if exception is None:
+            return
+        error = f"Le processus d'entraînement s'est arrêté: {exception}"
+
+    update_training_job(job_id, status=JOB_FAILED, finished_at=_now(), message=error)
+
+
+def submit_training_job(job_id):
+    future = get_executor().submit(run_training_job, job_id)
+    future.add_done_callback(lambda f: _on_job_finished(job_id, f))
+    return future
+
+
+def recover_training_jobs():
+    """
+    Au démarrage : relance les tâches restées en file d'attente et marque en échec
+    celles interrompues en cours d'exécution par un arrêt de l'API.
+    """
+    session = _session()
+    try:
+        session.query(TrainingJob).filter(TrainingJob.status == JOB_RUNNING).update(
+            {
+                "status": JOB_FAILED,
+                "finished_at": _now(),
+                "message": "Interrompu par un redémarrage de l'API",
+            }
+        )
+        session.commit()
+        queued = [
+            job.id
+            for job in session.query(TrainingJob).filter(
+                TrainingJob.status == JOB_QUEUED
+            )
+        ]
+    finally:
+        session.close()
+
+    for job_id in queued:
+        submit_training_job(job_id)
+
+    return queued